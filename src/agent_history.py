@@ -0,0 +1,93 @@
+from context_assembly import estimate_tokens, CHARS_PER_TOKEN
+
+# --- CONFIGURATION ---
+HISTORY_TOKEN_BUDGET = 3000 # Max estimated tokens of all previous steps in the prompt
+MAX_OBSERVATION_TOKENS = 1000 # Any single observation is cut to this size when recorded
+COMPACT_OBSERVATION_TOKENS = 60 # Size older observations are reduced to when over budget
+KEEP_RECENT_STEPS = 2 # The most recent steps always keep their full observation
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to about max_tokens by keeping its head and tail, which usually hold
+    the most useful part of command output (headers, totals, errors).
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 3 // 4
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted ...]\n{text[-tail:]}"
+
+def summarize_observation(text: str, max_tokens: int) -> str:
+    """Reduce an older observation to its first line(s), noting how much was dropped."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars].rstrip()} [... earlier output, {len(text) - max_chars} more characters not shown]"
+
+def format_observation(actions: list, results: list) -> str:
+    """
+    Merge the results of a step's actions into one observation. A single action's result is
+    used as is; a batch is numbered in action order, '[i] tool(input):' followed by its result.
+    """
+    if len(results) == 1:
+        return results[0]
+    return "\n\n".join(f"[{i}] {action}({action_input}):\n{result}"
+                       for i, ((action, action_input), result) in enumerate(zip(actions, results), start=1))
+
+class AgentHistory:
+    """
+    Bounded scratchpad of the agent's previous Thought/Action/Observation steps.
+
+    Steps are only ever appended, so the rendered history grows as a stable prefix that the
+    LLM server can keep in its KV cache. Each observation is capped when recorded. When the
+    whole history exceeds its token budget, all but the most recent steps are compacted in one
+    go (rather than a little on every iteration), which invalidates the cached prefix only rarely.
+    """
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, max_observation_tokens: int = MAX_OBSERVATION_TOKENS,
+                 compact_observation_tokens: int = COMPACT_OBSERVATION_TOKENS, keep_recent: int = KEEP_RECENT_STEPS):
+        self.token_budget = token_budget
+        self.max_observation_tokens = max_observation_tokens
+        self.compact_observation_tokens = compact_observation_tokens
+        self.keep_recent = keep_recent
+        self.steps = []
+        self.compactions = 0
+
+    def _render_step(self, step: dict) -> str:
+        actions = "".join(f"Action: {action}\nAction Input: {action_input}\n" for action, action_input in step["actions"])
+        return f"Thought: {step['thought']}\n{actions}Observation: {step['observation']}\n"
+
+    def add_step(self, thought: str, actions: list, results: list):
+        """
+        Record a step, capping its observation and compacting older steps if over budget.
+        Each action's result is capped at an equal share of the observation budget before they
+        are merged, so every result of a batch keeps its head and tail.
+
+        :param actions: The step's (action, action_input) pairs; several for a batched step.
+        :param results: The output of each action, in the same order.
+        """
+        share = max(self.max_observation_tokens // max(len(results), 1), 1)
+        self.steps.append({
+            "thought": thought,
+            "actions": list(actions),
+            "observation": format_observation(actions, [truncate_middle(result, share) for result in results]),
+        })
+        if self.tokens() > self.token_budget:
+            self._compact()
+
+    def _compact(self):
+        compacted = False
+        for step in self.steps[:-self.keep_recent] if self.keep_recent else self.steps:
+            summary = summarize_observation(step["observation"], self.compact_observation_tokens)
+            if summary != step["observation"]:
+                step["observation"] = summary
+                compacted = True
+        if compacted:
+            self.compactions += 1
+
+    def render(self) -> str:
+        return "".join(self._render_step(step) for step in self.steps)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
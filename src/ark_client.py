@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import http.client
+
+from common import load_server_token
+
+# --- CONFIGURATION ---
+DEFAULT_URL = os.environ.get("ARK_SERVER_URL", "http://127.0.0.1:8765")
+DEFAULT_SOCKET = os.environ.get("ARK_SERVER_SOCKET")
+REQUEST_TIMEOUT = 600 # Seconds; agent requests can run several tools
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix socket."""
+    def __init__(self, socket_path: str, timeout: float = REQUEST_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class ArkClient:
+    """
+    Thin client for ark_server.py. Requests are tagged with a client name, which the
+    server uses to share the LLM fairly between users. Over TCP, requests carry the
+    server's access token, read from the owner's token file unless 'token' is given.
+    """
+    def __init__(self, url: str = DEFAULT_URL, socket_path: str = DEFAULT_SOCKET, client_name: str = None,
+                 token: str = None):
+        self.url = url
+        self.socket_path = socket_path
+        self.client_name = client_name or f"{os.environ.get('USER', 'user')}:{os.getpid()}"
+        self.token = token if token is not None or socket_path else load_server_token()
+
+    def _connect(self):
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path)
+        address = self.url.split("://", 1)[-1].rstrip("/")
+        host, _, port = address.partition(":")
+        return http.client.HTTPConnection(host, int(port or 80), timeout=REQUEST_TIMEOUT)
+
+    def _request(self, method: str, path: str, body: dict = None):
+        connection = self._connect()
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"X-ARK-Client": self.client_name}
+        if self.token and not self.socket_path:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        connection.request(method, path, body=data, headers=headers)
+        response = connection.getresponse()
+        if response.status != 200:
+            error = json.loads(response.read() or b"{}").get("error", response.reason)
+            connection.close()
+            raise RuntimeError(f"Server returned {response.status}: {error}")
+        return connection, response
+
+    def ask(self, collection_name: str, question: str, n_results: int = 10):
+        """Yield the server's events for a RAG question: sources, then tokens, then done (or error)."""
+        connection, response = self._request("POST", "/ask", {
+            "collection": collection_name, "question": question, "n_results": n_results})
+        try:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+    def agent(self, question: str, max_iterations: int = 5) -> dict:
+        connection, response = self._request("POST", "/agent", {"question": question, "max_iterations": max_iterations})
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def health(self) -> dict:
+        connection, response = self._request("GET", "/health")
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+def print_answer(client: ArkClient, collection_name: str, question: str):
+    """Stream an /ask answer to the terminal, like ask_ark.py does."""
+    print("\n> ARK: ", end="", flush=True)
+    sources = []
+    for event in client.ask(collection_name, question):
+        if "token" in event:
+            print(event["token"], end="", flush=True)
+        elif event.get("event") == "sources":
+            sources = event["sources"]
+        elif event.get("event") == "error":
+            print(f"\nAn error occurred: {event['error']}")
+        elif event.get("event") == "done":
+            latency = event["latency_ms"]
+            print()
+            if sources:
+                print(f"\n[sources: {', '.join(sources)}]")
+            print(f"[embed {latency['embed']:.1f} ms, search {latency['search']:.1f} ms, "
+                  f"first token {latency['first_token'] or 0:.0f} ms, total {latency['total']:.0f} ms]")
+
+def print_agent_answer(client: ArkClient, question: str):
+    result = client.agent(question)
+    print(f"\n🤖 ARK: {result['answer']}")
+    seconds = sum(iteration["llm_seconds"] for iteration in result["iterations"])
+    print(f"[{len(result['iterations'])} iterations, LLM {seconds:.2f}s]\n")
+
+def main(command: str, question: str, collection_name: str = None, client: ArkClient = None):
+    """
+    Send one question, or run an interactive loop if no question is given.
+
+    :param command: 'ask' (RAG over a collection), 'agent' or 'health'.
+    """
+    client = client or ArkClient()
+    if command == "health":
+        print(json.dumps(client.health(), indent=2))
+        return
+    if command == "ask" and not collection_name:
+        raise SystemExit("Error: 'ask' needs --collection.")
+
+    def answer(text):
+        if command == "ask":
+            print_answer(client, collection_name, text)
+        else:
+            print_agent_answer(client, text)
+
+    if question:
+        answer(question)
+        return
+    print("Type 'exit' or 'quit' to end the session.")
+    while True:
+        try:
+            text = input("\n> You: ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print()
+            break
+        if text.lower() in ["exit", "quit"]:
+            break
+        if text:
+            try:
+                answer(text)
+            except (OSError, RuntimeError) as e:
+                print(f"\nAn error occurred: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a running ARK server (start it with ark_server.py).")
+    parser.add_argument("command", choices=["ask", "agent", "health"], help="'ask' a collection, run the 'agent', or check 'health'.")
+    parser.add_argument("question", nargs="*", help="The question; omit it for an interactive session.")
+    parser.add_argument("--collection", type=str, default=None, help="The collection to query with 'ask'.")
+    parser.add_argument("--url", type=str, default=DEFAULT_URL, help="Server URL (default: $ARK_SERVER_URL or http://127.0.0.1:8765).")
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET, help="Connect over this Unix socket instead (default: $ARK_SERVER_SOCKET).")
+    args = parser.parse_args()
+
+    try:
+        main(args.command, " ".join(args.question), args.collection, ArkClient(args.url, args.socket))
+    except (OSError, RuntimeError) as e:
+        print(f"Error: could not reach the ARK server: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,354 @@
+import os
+import hmac
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from common import load_server_token, SERVER_TOKEN_FILE
+from context_assembly import assemble_context, token_budget_for
+from embedding_cache import MicroBatchEmbedder
+from tracing import tracer
+
+# --- CONFIGURATION ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_LLM_CONCURRENCY = 2 # LLM requests sent to Ollama at once; match OLLAMA_NUM_PARALLEL
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_EMBED_WINDOW_MS = 5.0
+MAX_REQUEST_BYTES = 1 << 20
+
+class FairQueue:
+    """
+    Limits how many LLM requests run at once and, when they have to wait, serves clients
+    round-robin: a client with many queued requests cannot starve one that sends a single
+    question. Within a client, requests are served in arrival order.
+    """
+    def __init__(self, slots: int = DEFAULT_LLM_CONCURRENCY):
+        self.slots = slots
+        self.active = 0
+        self._queues = {} # client -> deque of tickets ([granted] lists)
+        self._rotation = deque() # Clients with waiting tickets, next to be served first
+        self._condition = threading.Condition()
+
+    def _grant_waiting(self):
+        while self.active < self.slots and self._rotation:
+            client = self._rotation.popleft()
+            ticket = self._queues[client].popleft()
+            ticket[0] = True
+            self.active += 1
+            if self._queues[client]:
+                self._rotation.append(client)
+            else:
+                del self._queues[client]
+        self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, client: str):
+        with self._condition:
+            if self.active < self.slots and not self._rotation:
+                self.active += 1
+            else:
+                ticket = [False]
+                if client not in self._queues:
+                    self._queues[client] = deque()
+                    self._rotation.append(client)
+                self._queues[client].append(ticket)
+                while not ticket[0]:
+                    self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._grant_waiting()
+
+    def waiting(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+class FairLLM:
+    """LLM proxy whose invoke() and stream() calls take a slot of a FairQueue on behalf of one client."""
+    def __init__(self, llm, queue: FairQueue, client: str):
+        self.llm = llm
+        self.queue = queue
+        self.client = client
+
+    def invoke(self, prompt, **kwargs):
+        with self.queue.slot(self.client):
+            return self.llm.invoke(prompt, **kwargs)
+
+    def stream(self, prompt, **kwargs):
+        # The slot is held while the caller iterates, and released when the stream is closed early.
+        with self.queue.slot(self.client):
+            yield from self.llm.stream(prompt, **kwargs)
+
+class ArkService:
+    """
+    The warm state shared by all requests: RAGUtils (embedding model, Chroma client, collection
+    handles), the agent's LLM client, a MicroBatchEmbedder that merges concurrent query embeddings
+    into single encode() calls, and the FairQueue in front of Ollama.
+
+    The agent's own reasoning steps and /ask generations go through the FairQueue; the RAG chains
+    called by the agent's knowledge tools run inside the agent request that needs them.
+    The agent cannot run shell commands unless 'allow_shell' is set.
+    """
+    def __init__(self, llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                 embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE, embed_window_ms: float = DEFAULT_EMBED_WINDOW_MS,
+                 allow_shell: bool = False):
+        from rag_utils import get_rag_utils
+        from langchain_ollama import OllamaLLM
+        from run_agent import LLM_MODEL_NAME, LLM_KEEP_ALIVE, TOOLS_MAP
+
+        self.rag = get_rag_utils()
+        self.rag.warm_up()
+        self.embedder = self.rag.wrap_embedding_model(
+            lambda model: MicroBatchEmbedder(model, max_batch_size=embed_batch_size, window_ms=embed_window_ms))
+        self.agent_llm = OllamaLLM(model=LLM_MODEL_NAME, temperature=0, keep_alive=LLM_KEEP_ALIVE)
+        self.llm_queue = FairQueue(llm_concurrency)
+        self.agent_tools = {name: tool for name, tool in TOOLS_MAP.items() if allow_shell or name != "run_shell_command"}
+        self.started = time.time()
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+
+    def count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    def ask(self, collection_name: str, question: str, client: str, n_results: int = 10):
+        """Answer a question with RAG, yielding NDJSON-ready events: sources, tokens, then done."""
+        from ask_ark import get_prompt
+
+        start_time = time.perf_counter()
+        (hits, stats), = self.rag.retrieve_many(collection_name, [question], n_results)
+        context, context_stats = assemble_context(hits, token_budget_for(collection_name))
+        yield {"event": "sources", "sources": context_stats["sources"]}
+
+        prompt_text = get_prompt(collection_name).format(context=context, question=question)
+        generate_start = time.perf_counter()
+        first_token_ms = None
+        for chunk in FairLLM(self.rag.llm, self.llm_queue, client).stream(prompt_text):
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - generate_start) * 1000
+            yield {"token": chunk}
+        yield {"event": "done", "latency_ms": {
+            "embed": round(stats["encode_ms"], 2),
+            "search": round(stats["vector_ms"] + stats.get("lexical_ms", 0.0), 2),
+            "first_token": round(first_token_ms, 2) if first_token_ms is not None else None,
+            "generate": round((time.perf_counter() - generate_start) * 1000, 2),
+            "total": round((time.perf_counter() - start_time) * 1000, 2),
+        }}
+
+    def agent(self, question: str, client: str, max_iterations: int = 5) -> dict:
+        from run_agent import run_agent
+        iterations = []
+        answer, _ = run_agent(FairLLM(self.agent_llm, self.llm_queue, client), question,
+                              max_iterations=max_iterations, verbose=False, stats=iterations, tools=self.agent_tools)
+        return {"answer": answer, "iterations": iterations}
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "llm_active": self.llm_queue.active,
+            "llm_waiting": self.llm_queue.waiting(),
+            "embedding_batches": self.embedder.report(),
+            "embedding_cache": self.rag.embedding_cache.report(),
+        }
+
+class ArkRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health; GET /metrics (span latencies in Prometheus format, with ARK_TRACE=1); POST /ask {"collection", "question", "n_results"?} streamed as NDJSON;
+    POST /agent {"question", "max_iterations"?}. Clients identify themselves for fair
+    queueing with an X-ARK-Client header (default: their address).
+
+    Over TCP, every request must carry 'Authorization: Bearer <token>' with the token from
+    SERVER_TOKEN_FILE, so other local users and web pages cannot drive the agent; the Unix
+    socket is protected by its file mode instead. POST bodies must be application/json,
+    which browsers cannot send cross-origin without a preflight.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Unix socket peers have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _client(self) -> str:
+        return self.headers.get("X-ARK-Client") or self.address_string()
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status >= 400:
+            # A rejected request's body may be unread, so the connection cannot be reused.
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if token is None:
+            # Only the Unix socket, guarded by its file mode, serves without a token.
+            return isinstance(self.server, UnixStreamServer)
+        header = self.headers.get("Authorization", "")
+        return hmac.compare_digest(header.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+    def _reject_unauthorized(self) -> bool:
+        """Send 401 and return True if the request does not carry the server's token."""
+        if self._authorized():
+            return False
+        self._send_json(401, {"error": f"Missing or wrong access token (see {SERVER_TOKEN_FILE})."})
+        return True
+
+    def _read_json(self):
+        """
+        Read and validate a request body: a JSON object with a non-empty string 'question'
+        (and, for /ask, a 'collection'), with integer 'n_results' / 'max_iterations' if given.
+        Raises ValueError with a message for the client.
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_BYTES:
+            raise ValueError("Request body too large.")
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict) or not body.get("question") or not isinstance(body["question"], str):
+            raise ValueError("Expected a JSON object with a 'question' field.")
+        if self.path == "/ask" and (not body.get("collection") or not isinstance(body["collection"], str)):
+            raise ValueError("Expected a 'collection' field.")
+        for field, default in (("n_results", 10), ("max_iterations", 5)):
+            value = body.get(field, default)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError(f"'{field}' must be a positive integer.")
+            body[field] = value
+        return body
+
+    def _write_chunk(self, event: dict):
+        data = (json.dumps(event) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self._reject_unauthorized():
+            return
+        if self.path == "/health":
+            self._send_json(200, self.server.service.health())
+        elif self.path == "/metrics":
+            data = tracer.prometheus_snapshot().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+    def do_POST(self):
+        service = self.server.service
+        if self._reject_unauthorized():
+            return
+        if self.path not in ("/ask", "/agent"):
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(415, {"error": "Expected an application/json request body."})
+            return
+        try:
+            body = self._read_json() # Validated in full before any response is started
+        except ValueError as e: # Includes malformed JSON
+            self._send_json(400, {"error": str(e)})
+            return
+        service.count_request()
+
+        if self.path == "/agent":
+            try:
+                self._send_json(200, service.agent(body["question"], self._client(), body["max_iterations"]))
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = service.ask(body["collection"], body["question"], self._client(), body["n_results"])
+        try:
+            for event in events:
+                self._write_chunk(event)
+        except (BrokenPipeError, ConnectionResetError):
+            return # The client went away
+        except Exception as e:
+            self._write_chunk({"event": "error", "error": str(e)})
+        finally:
+            events.close() # Stops the generation and frees its LLM slot
+        self.wfile.write(b"0\r\n\r\n")
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: str = None,
+          llm_concurrency: int = DEFAULT_LLM_CONCURRENCY, embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+          embed_window_ms: float = DEFAULT_EMBED_WINDOW_MS, allow_shell: bool = False):
+    """
+    Run the ARK server until interrupted, over local HTTP or, if socket_path is given, a Unix socket.
+    Models and clients are loaded before the server starts accepting requests.
+    TCP clients must send the token stored in SERVER_TOKEN_FILE, which is created on first use;
+    the server refuses to start over TCP if that file is empty or unreadable.
+    """
+    token = None
+    if not socket_path:
+        token = load_server_token(create=True)
+        if token is None:
+            raise SystemExit(f"Error: no access token could be read from {SERVER_TOKEN_FILE}. "
+                             "Delete the file to have a new token generated, or use --socket.")
+
+    print("--- Starting ARK server: loading models and clients... ---")
+    start_time = time.perf_counter()
+    service = ArkService(llm_concurrency, embed_batch_size, embed_window_ms, allow_shell)
+    print(f"Ready in {time.perf_counter() - start_time:.2f}s.")
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        old_umask = os.umask(0o177) # The socket is created owner-only (0600): only the owner may talk to the server
+        try:
+            server = ThreadingUnixHTTPServer(socket_path, ArkRequestHandler)
+        finally:
+            os.umask(old_umask)
+        server.token = None
+        print(f"Listening on unix:{socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), ArkRequestHandler)
+        server.daemon_threads = True
+        server.token = token
+        print(f"Listening on http://{host}:{port} (clients authenticate with the token in {SERVER_TOKEN_FILE})")
+    server.service = service
+    if allow_shell:
+        print("Warning: /agent may run shell commands (--allow-shell).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nARK server shutting down.")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ARK as a long-lived local server (use ark_client.py to talk to it).")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Address to listen on (keep it local).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on.")
+    parser.add_argument("--socket", type=str, default=None, help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY, help="LLM requests sent to Ollama at once.")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Most query embeddings per encode call.")
+    parser.add_argument("--embed-window-ms", type=float, default=DEFAULT_EMBED_WINDOW_MS, help="How long a query waits for others to share its encode call.")
+    parser.add_argument("--allow-shell", action="store_true", help="Let the agent behind /agent use run_shell_command.")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.socket, args.llm_concurrency, args.embed_batch_size, args.embed_window_ms, args.allow_shell)
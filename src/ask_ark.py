@@ -1,5 +1,15 @@
+import sys
+import json
+import time
 import argparse
-from rag_utils import _rag_utils_instance
+from concurrent.futures import ThreadPoolExecutor
+
+from context_assembly import assemble_context, token_budget_for
+from rag_utils import get_rag_utils, warm_up_in_background, retrieval_report
+
+# --- CONFIGURATION ---
+DEFAULT_CONCURRENCY = 4 # Concurrent LLM generations in batch mode (see also OLLAMA_NUM_PARALLEL)
+DEFAULT_N_RESULTS = 10
 
 # Define different prompt templates for different knowledge bases
 PROMPT_TEMPLATES = {
@@ -43,8 +53,9 @@ def main(collection_name: str):
     # --- 1. Define the RAG Prompt Template ---
     template = PROMPT_TEMPLATES.get(collection_name, PROMPT_TEMPLATES['ark_project_knowledge'])
 
-    # --- 2. Construct the RAG Chain ---
-    rag_chain = _rag_utils_instance.create_rag_chain(collection_name, template)
+    # --- 2. Load the RAG Components in the Background ---
+    # The prompt is shown right away; the chain is built when the first question arrives.
+    warm_up_in_background()
 
     print(f"\n--- ARK is ready. Querying '{collection_name}'. ---")
     print("Type 'exit' or 'quit' to end the session.")
@@ -54,16 +65,28 @@ def main(collection_name: str):
         try:
             question = input("\n> You: ")
             if question.lower() in ['exit', 'quit']:
-                print("\nARK shutting down. Goodbye.")
+                print(f"\nEmbedding cache: {get_rag_utils().embedding_cache.report()}")
+                print("ARK shutting down. Goodbye.")
                 break
 
+            # Served from the chain registry; rebuilt only if the collection was re-ingested.
+            rag_chain = get_rag_utils().get_rag_chain(collection_name, template)
+
             print("\n> ARK: ", end="", flush=True)
 
             full_response = ""
-            for chunk in rag_chain.stream({"question": question}):
+            start_time = time.perf_counter()
+            first_token_time = None
+            stats = {}
+            for chunk in rag_chain.stream({"question": question, "stats": stats}):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
                 print(chunk, end="", flush=True)
                 full_response += chunk
+            total_time = time.perf_counter() - start_time
             print()
+            print(f"\n[retrieval {retrieval_report(stats)}]")
+            print(f"[LLM: first token after {first_token_time or total_time:.2f}s, total {total_time:.2f}s]")
 
         except KeyboardInterrupt:
             print("\n\nARK shutting down. Goodbye.")
@@ -71,8 +94,115 @@ def main(collection_name: str):
         except Exception as e:
             print(f"\nAn error occurred: {e}")
 
+def get_prompt(collection_name: str):
+    """The PromptTemplate used to answer questions about a collection."""
+    from langchain_core.prompts import PromptTemplate
+    template = PROMPT_TEMPLATES.get(collection_name, PROMPT_TEMPLATES['ark_project_knowledge'])
+    return PromptTemplate(template=template, input_variables=["context", "question"])
+
+def read_questions(stream) -> list:
+    """
+    Read batch questions from JSONL: one object per line with a 'question' and an optional 'id'
+    (any other fields are passed through), or simply a JSON string. Blank lines are skipped.
+    """
+    questions = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg} at column {e.colno}).") from None
+        if isinstance(record, str):
+            record = {"question": record}
+        if not isinstance(record, dict) or not record.get("question"):
+            raise ValueError(f"Line {line_number}: expected a JSON string or an object with a 'question' field.")
+        record.setdefault("id", len(questions) + 1)
+        questions.append(record)
+    return questions
+
+def run_batch(collection_name: str, input_file: str, output_file: str = "-",
+              concurrency: int = DEFAULT_CONCURRENCY, n_results: int = DEFAULT_N_RESULTS):
+    """
+    Answer a JSONL file of questions non-interactively and write one JSON result per line, in input order,
+    with the answer, the retrieved sources and per-stage latencies in milliseconds.
+
+    All questions are embedded in one batched call and searched together; generations are then
+    sent to Ollama with up to 'concurrency' requests in flight. Each result is written as soon as
+    it and every result before it are done. Progress goes to stderr; '-' means stdin/stdout.
+    """
+    try:
+        if input_file == "-":
+            questions = read_questions(sys.stdin)
+        else:
+            with open(input_file, "r", encoding="utf-8") as f:
+                questions = read_questions(f)
+    except ValueError as e:
+        print(f"Error: cannot read questions from {'stdin' if input_file == '-' else input_file}: {e}", file=sys.stderr)
+        return
+    rag = get_rag_utils()
+    prompt = get_prompt(collection_name)
+    token_budget = token_budget_for(collection_name)
+
+    print(f"--- Answering {len(questions)} questions against '{collection_name}' "
+          f"(LLM concurrency {concurrency}) ---", file=sys.stderr)
+    if not questions:
+        return
+
+    start_time = time.perf_counter()
+    retrievals = rag.retrieve_many(collection_name, [record["question"] for record in questions], n_results)
+
+    def generate(prompt_text):
+        started = time.perf_counter()
+        answer = rag.llm.invoke(prompt_text)
+        return answer, (time.perf_counter() - started) * 1000
+
+    out = sys.stdout if output_file == "-" else open(output_file, "w", encoding="utf-8")
+    errors = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = []
+            for record, (hits, stats) in zip(questions, retrievals):
+                context, context_stats = assemble_context(hits, token_budget)
+                prompt_text = prompt.format(context=context, question=record["question"])
+                pending.append((record, stats, context_stats, executor.submit(generate, prompt_text)))
+
+            for done, (record, stats, context_stats, future) in enumerate(pending, start=1):
+                result = dict(record)
+                try:
+                    result["answer"], generate_ms = future.result()
+                except Exception as e:
+                    result["answer"], result["error"], generate_ms = None, str(e), None
+                    errors += 1
+                result["sources"] = context_stats["sources"]
+                result["latency_ms"] = {
+                    "embed": round(stats["encode_ms"], 2),
+                    "search": round(stats["vector_ms"] + stats.get("lexical_ms", 0.0), 2),
+                    "generate": round(generate_ms, 2) if generate_ms is not None else None,
+                }
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                print(f"  - {done}/{len(questions)} answered", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    total_time = time.perf_counter() - start_time
+    print(f"Answered {len(questions)} questions in {total_time:.2f}s "
+          f"({len(questions) / total_time:.2f} questions/s, {errors} errors).", file=sys.stderr)
+    print(f"Embedding cache: {rag.embedding_cache.report()}", file=sys.stderr)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Query ARK's knowledge base.")
     parser.add_argument("--collection", type=str, required=True, help="The name of the ChromaDB collection to query.")
+    parser.add_argument("--batch", type=str, default=None, metavar="FILE",
+                        help="Answer the questions in a JSONL file ('-' for stdin) non-interactively.")
+    parser.add_argument("--output", type=str, default="-", help="Where batch results are written as JSONL (default: stdout).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent LLM generations in batch mode.")
+    parser.add_argument("--n-results", type=int, default=DEFAULT_N_RESULTS, help="Chunks retrieved per question in batch mode.")
     args = parser.parse_args()
-    main(collection_name=args.collection)
+    if args.batch:
+        run_batch(args.collection, args.batch, args.output, concurrency=args.concurrency, n_results=args.n_results)
+    else:
+        main(collection_name=args.collection)
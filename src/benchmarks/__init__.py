@@ -0,0 +1,14 @@
+"""
+Benchmarks for ARK. Each module is a standalone script, run from the project root, e.g.:
+
+    python3 src/benchmarks/startup.py
+    python3 src/benchmarks/embedding_backends.py --threads 8
+    python3 src/benchmarks/chain_overhead.py --collection ark_project_knowledge
+    python3 src/benchmarks/chunking.py --path src
+
+The full suite runs on a synthetic corpus (corpus.py) against a fake Ollama server
+(fake_ollama.py) in a temporary working directory, and writes JSON that can be compared
+with the results of another commit:
+
+    python3 src/benchmarks/suite.py --output bench-new.json --compare bench-old.json
+"""
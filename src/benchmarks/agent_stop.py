@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from langchain_ollama import OllamaLLM
+from context_assembly import estimate_tokens
+from run_agent import LLM_MODEL_NAME, AGENT_PROMPT_STEPS, build_prompt_prefix, generate_step
+
+# --- CONFIGURATION ---
+QUESTIONS = [
+    "What's my current RAM usage?",
+    "What files are in ~/Desktop?",
+    "Explain the files in the 'scripts' folder.",
+    "How big is my Downloads folder?",
+    "What is the current CPU usage?",
+]
+
+def main(model: str, repeats: int, output_path: str = None):
+    """
+    Compare one agent iteration generated in full (the old llm.invoke path) against
+    streaming generation with stop sequences and early termination, per question.
+    """
+    llm = OllamaLLM(model=model, temperature=0)
+    prefix = build_prompt_prefix()
+    llm.invoke("Say OK.") # Load the model before measuring
+
+    results = []
+    for question in QUESTIONS:
+        prompt = prefix + AGENT_PROMPT_STEPS.format(question=question, history="")
+        full_runs, streamed_runs = [], []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            full = llm.invoke(prompt)
+            full_runs.append((estimate_tokens(full), time.perf_counter() - start_time))
+
+            start_time = time.perf_counter()
+            streamed, _ = generate_step(llm, prompt)
+            streamed_runs.append((estimate_tokens(streamed), time.perf_counter() - start_time))
+
+        result = {
+            "question": question,
+            "full_tokens": statistics.mean(t for t, _ in full_runs),
+            "full_seconds": statistics.mean(s for _, s in full_runs),
+            "streamed_tokens": statistics.mean(t for t, _ in streamed_runs),
+            "streamed_seconds": statistics.mean(s for _, s in streamed_runs),
+        }
+        results.append(result)
+        print(f"{question[:45]:<45} tokens {result['full_tokens']:6.0f} -> {result['streamed_tokens']:6.0f}, "
+              f"latency {result['full_seconds']:6.2f}s -> {result['streamed_seconds']:6.2f}s")
+
+    saved_tokens = statistics.mean(r["full_tokens"] - r["streamed_tokens"] for r in results)
+    saved_seconds = statistics.mean(r["full_seconds"] - r["streamed_seconds"] for r in results)
+    print(f"\nMean saved per iteration: ~{saved_tokens:.0f} output tokens, {saved_seconds:.2f}s")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({"model": model, "repeats": repeats, "questions": results,
+                       "mean_saved_tokens": saved_tokens, "mean_saved_seconds": saved_seconds}, f, indent=2)
+        print(f"Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tokens and latency saved by stop sequences and early termination.")
+    parser.add_argument("--model", type=str, default=LLM_MODEL_NAME, help="Ollama model to use.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per question and mode.")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    main(args.model, args.repeats, args.output)
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from rag_utils import RAGUtils
+
+# --- CONFIGURATION ---
+PROMPT_TEMPLATE = """
+Based *only* on the following context, answer the question.
+CONTEXT: {context}
+QUESTION: {question}
+ANSWER:
+"""
+
+def measure(func, calls: int) -> dict:
+    """Call 'func' repeatedly and return per-call latency statistics in microseconds."""
+    samples = []
+    for _ in range(calls):
+        start_time = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start_time) * 1e6)
+    samples.sort()
+    return {
+        "calls": calls,
+        "mean_us": statistics.mean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+def main(collection_name: str, calls: int, output_path: str = None):
+    """
+    Measure the per-call overhead of obtaining a RAG chain (no retrieval or generation):
+    building it from scratch with create_rag_chain() versus the get_rag_chain() registry.
+    """
+    rag_utils = RAGUtils()
+    rag_utils.db_client # Exclude client start-up from the measurement
+    rag_utils.llm
+
+    results = {
+        "create_rag_chain": measure(lambda: rag_utils.create_rag_chain(collection_name, PROMPT_TEMPLATE), calls),
+        "get_rag_chain": measure(lambda: rag_utils.get_rag_chain(collection_name, PROMPT_TEMPLATE), calls),
+    }
+    for name, r in results.items():
+        print(f"{name:>16}: mean {r['mean_us']:9.1f} us, p50 {r['p50_us']:9.1f} us, p99 {r['p99_us']:9.1f} us ({calls} calls)")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-call RAG chain construction overhead.")
+    parser.add_argument("--collection", type=str, default="ark_project_knowledge", help="Existing collection to build chains for.")
+    parser.add_argument("--calls", type=int, default=200, help="Number of calls to measure.")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    main(args.collection, args.calls, args.output)
@@ -0,0 +1,159 @@
+import os
+import re
+import ast
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from embeddings import EmbeddingBackend, EMBEDDING_MODEL_NAME
+from loaders import walk_files, load_text
+from splitters import LanguageAwareSplitter, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP
+from corpus import generate_corpus
+
+# --- CONFIGURATION ---
+TEXT_EXTENSIONS = (".py", ".md", ".rst", ".txt", ".c", ".h", ".cpp", ".hpp", ".v", ".sv", ".svh", ".sh")
+TOP_K = 5
+
+# (extensions, regex) pairs that find a definition and a natural-language description of it
+# in non-Python files: (description, definition header) per match. Python uses docstrings.
+DEFINITION_PATTERNS = [
+    ((".c", ".h", ".cpp", ".hpp"), re.compile(r"^\w[\w \t*]*?\b(\w+)\s*\([^;{)]*\)\s*\{[^}]*?/\*\s*(.+?)\s*\*/", re.M)),
+    ((".v", ".sv", ".svh"), re.compile(r"^\s*module\s+(\w+)[^;]*;[\s\S]*?//\s*(.+)$", re.M)),
+    ((".md",), re.compile(r"^(#{1,6} .+)\n\n([^\n.]+\.)", re.M)),
+]
+
+def load_documents(path: str) -> list:
+    return [load_text(file_path) for file_path, _ in walk_files(path) if file_path.endswith(TEXT_EXTENSIONS)]
+
+def definition_queries(documents: list, count: int, seed: int) -> list:
+    """
+    Build (query, source, target) triples: a description of a definition, the file it is in,
+    and a piece of text (the definition's header) that a useful retrieved chunk must contain.
+    """
+    candidates = []
+    for document in documents:
+        text, source = document.page_content, document.metadata["source"]
+        if source.endswith(".py"):
+            try:
+                tree = ast.parse(text)
+            except (SyntaxError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and ast.get_docstring(node):
+                    header = f"{'class' if isinstance(node, ast.ClassDef) else 'def'} {node.name}"
+                    candidates.append((ast.get_docstring(node).split("\n")[0], source, header))
+            continue
+        for extensions, pattern in DEFINITION_PATTERNS:
+            if source.endswith(extensions):
+                for match in pattern.finditer(text):
+                    if extensions == (".md",):
+                        candidates.append((match.group(2), source, match.group(1)))
+                    else:
+                        candidates.append((match.group(2), source, match.group(1) + ("(" if extensions[0] == ".c" else "")))
+    random.Random(seed).shuffle(candidates)
+    return candidates[:count]
+
+def chunk_stats(documents: list, chunks: list) -> dict:
+    corpus_chars = sum(len(document.page_content) for document in documents)
+    stored_chars = sum(len(chunk.page_content) for chunk in chunks)
+    return {
+        "chunks": len(chunks),
+        "mean_chunk_chars": stored_chars / max(len(chunks), 1),
+        "stored_chars": stored_chars,
+        "overlap_pct": (stored_chars / corpus_chars - 1) * 100 if corpus_chars else 0.0,
+        "chunks_with_symbols": sum(1 for chunk in chunks if chunk.metadata.get("symbols")),
+    }
+
+def retrieval_stats(backend: EmbeddingBackend, chunks: list, queries: list) -> dict:
+    """Hit rate at 1 and TOP_K, and MRR, of finding a chunk with the definition for its description."""
+    vectors = np.asarray(backend.encode([chunk.page_content for chunk in chunks], show_progress_bar=False), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = np.asarray(backend.encode([query for query, _, _ in queries], show_progress_bar=False), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    ranked = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :TOP_K]
+    hits_at_1, hits_at_k, reciprocal_ranks = 0, 0, []
+    for (_, source, target), neighbours in zip(queries, ranked):
+        rank = next((r for r, i in enumerate(neighbours, start=1)
+                     if chunks[i].metadata["source"] == source and target in chunks[i].page_content), None)
+        hits_at_1 += rank == 1
+        hits_at_k += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return {
+        "hit_at_1": hits_at_1 / len(queries),
+        f"hit_at_{TOP_K}": hits_at_k / len(queries),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "embedding_bytes": int(vectors.nbytes),
+    }
+
+def main(path: str = None, files: int = 200, seed: int = 0, queries: int = 200, retrieval: bool = True,
+         output_path: str = None):
+    """
+    Compare the language-aware splitter with the previous character splitter (1200/200) on a
+    tree of files, by default a generated synthetic corpus: chunk count, stored size, overlap
+    and how often a definition's description retrieves the chunk containing the definition.
+    """
+    workdir = None
+    if path is None:
+        workdir = tempfile.mkdtemp(prefix="ark-chunking-")
+        path = os.path.join(workdir, "corpus")
+        generate_corpus(path, files, seed)
+    try:
+        documents = load_documents(path)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if not documents:
+        print(f"No text files found under '{path}'.")
+        return
+    splitters = {
+        "recursive": RecursiveCharacterTextSplitter(chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP, add_start_index=True),
+        "language": LanguageAwareSplitter(),
+    }
+    query_set = definition_queries(documents, queries, seed) if retrieval else []
+    backend = None
+    if query_set:
+        backend = EmbeddingBackend(EMBEDDING_MODEL_NAME)
+        backend.load()
+        print(f"{len(documents)} files, {len(query_set)} definition queries, embedding with {backend.describe()}.")
+
+    results = {}
+    for name, splitter in splitters.items():
+        chunks = splitter.split_documents(documents)
+        results[name] = chunk_stats(documents, chunks)
+        if backend is not None:
+            results[name].update(retrieval_stats(backend, chunks, query_set))
+        r = results[name]
+        line = f"{name:>10}: {r['chunks']:6d} chunks, mean {r['mean_chunk_chars']:.0f} chars, overlap {r['overlap_pct']:.1f}%"
+        if "mrr" in r:
+            line += f", hit@1 {r['hit_at_1']:.1%}, hit@{TOP_K} {r[f'hit_at_{TOP_K}']:.1%}, MRR {r['mrr']:.3f}"
+        print(line)
+
+    before, after = results["recursive"], results["language"]
+    print(f"\nChunks: {(after['chunks'] / before['chunks'] - 1) * 100:+.1f}%, "
+          f"stored text: {(after['stored_chars'] / before['stored_chars'] - 1) * 100:+.1f}%")
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": len(documents), "queries": len(query_set), "results": results}, f, indent=2)
+        print(f"Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the language-aware splitter with the character splitter.")
+    parser.add_argument("--path", type=str, default=None, help="Directory to chunk (default: a generated synthetic corpus).")
+    parser.add_argument("--files", type=int, default=200, help="Files in the synthetic corpus.")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus and query sampling seed.")
+    parser.add_argument("--queries", type=int, default=200, help="Definition queries for the retrieval hit rate.")
+    parser.add_argument("--no-retrieval", action="store_true", help="Only compare chunk counts and sizes (no embedding model needed).")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    main(args.path, args.files, args.seed, args.queries, not args.no_retrieval, args.output)
@@ -0,0 +1,102 @@
+import os
+import random
+import argparse
+
+# --- CONFIGURATION ---
+# (extension, weight) of the generated file types.
+FILE_TYPES = [(".py", 30), (".md", 20), (".txt", 20), (".c", 15), (".v", 15)]
+# (name, min bytes, max bytes, weight) of the generated file sizes.
+SIZE_CLASSES = [("small", 300, 2000, 60), ("medium", 2000, 16000, 30), ("large", 16000, 128000, 10)]
+FILES_PER_DIRECTORY = 25
+
+WORDS = (
+    "system memory kernel process thread buffer cache device driver module signal clock register "
+    "pipeline vector index query embedding document chunk source collection retrieval latency "
+    "throughput storage network socket packet header payload config manifest session agent tool "
+    "parser token stream batch queue worker schedule timeout error retry fallback metric sample"
+).split()
+
+def _identifier(rng: random.Random, parts: int = 2) -> str:
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 16))]
+    return " ".join(words).capitalize() + "."
+
+def _python_block(rng: random.Random) -> str:
+    name = _identifier(rng)
+    args = ", ".join(_identifier(rng, 1) for _ in range(rng.randint(1, 3)))
+    body = "\n".join(f"    {_identifier(rng, 1)} = {rng.randint(0, 999)}  # {_sentence(rng)}" for _ in range(rng.randint(2, 6)))
+    return f'def {name}({args}):\n    """{_sentence(rng)}"""\n{body}\n    return {args.split(",")[0]}\n\n'
+
+def _markdown_block(rng: random.Random) -> str:
+    heading = "#" * rng.randint(1, 3) + " " + " ".join(rng.choice(WORDS) for _ in range(3)).title()
+    paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+    bullets = "\n".join(f"- `{_identifier(rng)}`: {_sentence(rng)}" for _ in range(rng.randint(0, 4)))
+    return f"{heading}\n\n{paragraph}\n\n{bullets}\n\n"
+
+def _text_block(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 8))) + "\n\n"
+
+def _c_block(rng: random.Random) -> str:
+    name = _identifier(rng)
+    lines = "\n".join(f"    {_identifier(rng, 1)} += {rng.randint(1, 64)}; /* {_sentence(rng)} */" for _ in range(rng.randint(2, 6)))
+    return f"static int {name}(int {_identifier(rng, 1)})\n{{\n{lines}\n    return 0;\n}}\n\n"
+
+def _verilog_block(rng: random.Random) -> str:
+    name = _identifier(rng)
+    ports = ",\n".join(f"    input wire [{rng.choice([0, 7, 15, 31])}:0] {_identifier(rng, 1)}" for _ in range(rng.randint(1, 4)))
+    body = "\n".join(f"    assign {_identifier(rng, 1)}_{i} = {rng.randint(0, 255)}; // {_sentence(rng)}" for i in range(rng.randint(1, 5)))
+    return f"module {name} (\n{ports}\n);\n{body}\nendmodule\n\n"
+
+BLOCKS = {".py": _python_block, ".md": _markdown_block, ".txt": _text_block, ".c": _c_block, ".v": _verilog_block}
+
+def generate_file(rng: random.Random, extension: str, size: int) -> str:
+    """Append generated blocks of the file's type until it reaches about 'size' bytes."""
+    parts, length = [], 0
+    while length < size:
+        block = BLOCKS[extension](rng)
+        parts.append(block)
+        length += len(block)
+    return "".join(parts)
+
+def generate_corpus(root: str, files: int = 500, seed: int = 0) -> dict:
+    """
+    Write a deterministic synthetic corpus of mixed code, markdown and text files under 'root',
+    spread over nested directories. The same (files, seed) always produces the same tree.
+    Returns a summary with the number of files and bytes per type and size class.
+    """
+    rng = random.Random(seed)
+    extensions, weights = zip(*FILE_TYPES)
+    summary = {"files": files, "seed": seed, "bytes": 0, "by_type": {}, "by_size": {}}
+    for i in range(files):
+        extension = rng.choices(extensions, weights)[0]
+        size_name, low, high, _ = rng.choices(SIZE_CLASSES, [s[3] for s in SIZE_CLASSES])[0]
+        directory = os.path.join(root, f"part_{i // (FILES_PER_DIRECTORY * 4)}", f"dir_{i // FILES_PER_DIRECTORY}")
+        os.makedirs(directory, exist_ok=True)
+        content = generate_file(rng, extension, rng.randint(low, high))
+        with open(os.path.join(directory, f"{_identifier(rng)}_{i}{extension}"), "w", encoding="utf-8") as f:
+            f.write(content)
+        summary["bytes"] += len(content)
+        summary["by_type"][extension] = summary["by_type"].get(extension, 0) + 1
+        summary["by_size"][size_name] = summary["by_size"].get(size_name, 0) + 1
+    return summary
+
+def sample_queries(count: int = 50, seed: int = 0) -> list:
+    """Deterministic mix of natural-language and identifier queries matching the corpus vocabulary."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for i in range(count):
+        if i % 2:
+            queries.append(f"Where is {_identifier(rng)} defined?")
+        else:
+            queries.append(f"How does the {rng.choice(WORDS)} {rng.choice(WORDS)} handle {rng.choice(WORDS)}?")
+    return queries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus for ARK benchmarks.")
+    parser.add_argument("--output", type=str, required=True, help="Directory to write the corpus to.")
+    parser.add_argument("--files", type=int, default=500, help="Number of files to generate.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same corpus.")
+    args = parser.parse_args()
+    print(generate_corpus(args.output, args.files, args.seed))
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from embeddings import EmbeddingBackend, RUNTIMES, EMBEDDING_MODEL_NAME
+from loaders import walk_files, load_text
+
+# --- CONFIGURATION ---
+CHUNK_SIZE = 1200 # Characters per sample text, roughly the ingest chunk size
+TOP_K = 10 # Neighbours compared when measuring retrieval agreement
+
+def sample_texts(path: str, limit: int) -> list:
+    """Cut the text files under 'path' into chunk-sized samples, up to 'limit' of them."""
+    texts = []
+    for file_path, _ in walk_files(path):
+        if not file_path.endswith((".py", ".md", ".txt", ".rst", ".c", ".h", ".v", ".sv", ".sh")):
+            continue
+        content = load_text(file_path).page_content
+        for i in range(0, len(content), CHUNK_SIZE):
+            if content[i:i + CHUNK_SIZE].strip():
+                texts.append(content[i:i + CHUNK_SIZE])
+            if len(texts) >= limit:
+                return texts
+    return texts
+
+def run_backend(backend: EmbeddingBackend, texts: list) -> dict:
+    """Load a backend, embed all texts once and return normalized vectors with timings."""
+    start_time = time.perf_counter()
+    backend.load()
+    load_s = time.perf_counter() - start_time
+
+    backend.encode(texts[:backend.batch_size]) # Warm-up, excluded from the throughput
+    start_time = time.perf_counter()
+    vectors = np.asarray(backend.encode(texts, show_progress_bar=False), dtype=np.float32)
+    encode_s = time.perf_counter() - start_time
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {"vectors": vectors, "load_s": load_s, "encode_s": encode_s, "texts_per_s": len(texts) / encode_s}
+
+def top_k(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, 1:TOP_K + 1] # Skip the query itself
+
+def main(path: str, runtimes: list, threads: int, limit: int, queries: int, output_path: str = None):
+    """
+    Compare CPU embedding runtimes against the float32 torch baseline.
+
+    Reports load time, throughput and, for accuracy, the mean cosine similarity to the
+    baseline vectors and the overlap of each query's top-k neighbours with the baseline's.
+    """
+    texts = sample_texts(path, limit)
+    if not texts:
+        print(f"No text files found under '{path}'.")
+        return
+    print(f"Embedding {len(texts)} samples from '{path}' with {EMBEDDING_MODEL_NAME} on CPU.")
+
+    baseline_backend = EmbeddingBackend(EMBEDDING_MODEL_NAME, device="cpu", runtime="torch", threads=threads)
+    baseline = run_backend(baseline_backend, texts)
+    baseline_neighbours = top_k(baseline["vectors"], baseline["vectors"][:queries])
+
+    results = {}
+    for runtime in ["torch"] + [r for r in runtimes if r != "torch"]:
+        if runtime == "torch":
+            run = baseline
+        else:
+            try:
+                run = run_backend(EmbeddingBackend(EMBEDDING_MODEL_NAME, device="cpu", runtime=runtime, threads=threads), texts)
+            except Exception as e:
+                print(f"{runtime:>10}: unavailable ({e})")
+                continue
+        neighbours = top_k(run["vectors"], run["vectors"][:queries])
+        overlap = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(neighbours, baseline_neighbours)])
+        results[runtime] = {
+            "load_s": run["load_s"],
+            "encode_s": run["encode_s"],
+            "texts_per_s": run["texts_per_s"],
+            "speedup": run["texts_per_s"] / baseline["texts_per_s"],
+            "mean_cosine_to_baseline": float(np.mean(np.sum(run["vectors"] * baseline["vectors"], axis=1))),
+            f"top{TOP_K}_overlap": float(overlap),
+        }
+        r = results[runtime]
+        print(f"{runtime:>10}: {r['texts_per_s']:7.1f} texts/s ({r['speedup']:.2f}x), load {r['load_s']:.1f}s, "
+              f"cosine to baseline {r['mean_cosine_to_baseline']:.4f}, top-{TOP_K} overlap {overlap:.1%}")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump({"samples": len(texts), "threads": threads, "results": results}, f, indent=2)
+        print(f"Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CPU embedding runtimes for accuracy and throughput.")
+    parser.add_argument("--path", type=str, default=SRC_DIR, help="Directory of text/source files to sample from.")
+    parser.add_argument("--runtime", choices=RUNTIMES, action="append", help="Runtime to compare (repeatable). Defaults to all.")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = default).")
+    parser.add_argument("--limit", type=int, default=512, help="Number of sample texts.")
+    parser.add_argument("--queries", type=int, default=50, help="Number of samples used as retrieval queries.")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    main(args.path, args.runtime or RUNTIMES, args.threads, args.limit, args.queries, args.output)
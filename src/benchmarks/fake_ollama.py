@@ -0,0 +1,159 @@
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIGURATION ---
+DEFAULT_TOKENS_PER_SECOND = 50.0
+DEFAULT_FIRST_TOKEN_MS = 100.0
+DEFAULT_ANSWER_TOKENS = 64
+
+# Agent turns: a tool call (followed by an invented observation, which the stop sequences
+# should cut off), then a final answer once an observation is in the prompt.
+AGENT_ACTION = ("Thought: I need the current memory usage to answer this.\n"
+                "Action: get_ram_usage\nAction Input: \n"
+                "Observation: (invented by the model; should never be read)\nThought: done\n")
+AGENT_FINAL = "Thought: I now have the memory usage.\nFinal Answer: The system has enough free memory for now."
+ANSWER_WORDS = "Based on the context the requested information is available in the listed source files".split()
+
+def response_for(prompt: str, answer_tokens: int) -> str:
+    """The deterministic text the fake model generates for a prompt."""
+    if "Previous steps:" in prompt:
+        history = prompt.rsplit("Previous steps:", 1)[1]
+        return AGENT_FINAL if "Observation:" in history else AGENT_ACTION
+    return " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(answer_tokens)) + "."
+
+def tokenize(text: str) -> list:
+    """Split into word-like tokens that keep their whitespace, so they concatenate back to the text."""
+    tokens, current = [], ""
+    for char in text:
+        current += char
+        if char in " \n":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+    def _send_json(self, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "fake:latest", "model": "fake:latest"}]})
+        else:
+            self._send_json({"status": "fake ollama"})
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/api/generate":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        config = self.server.config
+        stops = [stop for stop in (request.get("options") or {}).get("stop") or [] if stop]
+        stream = request.get("stream", True)
+        started = time.perf_counter()
+        model = request.get("model", "fake")
+
+        def chunk(text, done, count=0):
+            body = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "response": text, "done": done}
+            if done:
+                body.update({"done_reason": "stop", "total_duration": int((time.perf_counter() - started) * 1e9),
+                             "prompt_eval_count": len(request.get("prompt", "")) // 4, "eval_count": count})
+            return body
+
+        # Generate token by token at the configured rate, ending at the first stop sequence.
+        time.sleep(config["first_token_ms"] / 1000)
+        text, emitted = "", []
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+        try:
+            for i, token in enumerate(tokenize(response_for(request.get("prompt", ""), config["answer_tokens"]))):
+                candidate = text + token
+                cut = min((candidate.find(stop) for stop in stops if stop in candidate), default=-1)
+                if cut >= 0:
+                    token = candidate[:cut][len(text):]
+                if i:
+                    time.sleep(1.0 / config["tokens_per_second"])
+                text += token
+                emitted.append(token)
+                if stream and token:
+                    self._write_chunk(chunk(token, False))
+                if cut >= 0:
+                    break
+            if stream:
+                self._write_chunk(chunk("", True, len(emitted)))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self._send_json(chunk(text, True, len(emitted)))
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client stopped reading (early termination)
+
+    def _write_chunk(self, body: dict):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+class FakeOllama:
+    """
+    Deterministic stand-in for the Ollama server's /api/generate, with a configurable
+    first-token latency and generation speed, so LLM-bound code paths can be benchmarked
+    without a GPU. Point clients at it with OLLAMA_HOST=<host>:<port>.
+    """
+    def __init__(self, port: int = 0, tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND,
+                 first_token_ms: float = DEFAULT_FIRST_TOKEN_MS, answer_tokens: int = DEFAULT_ANSWER_TOKENS):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+        self.server.daemon_threads = True
+        self.server.config = {"tokens_per_second": tokens_per_second, "first_token_ms": first_token_ms,
+                              "answer_tokens": answer_tokens}
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarks.")
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on.")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND, help="Generation speed.")
+    parser.add_argument("--first-token-ms", type=float, default=DEFAULT_FIRST_TOKEN_MS, help="Latency before the first token.")
+    parser.add_argument("--answer-tokens", type=int, default=DEFAULT_ANSWER_TOKENS, help="Length of RAG answers in tokens.")
+    args = parser.parse_args()
+    fake = FakeOllama(args.port, args.tokens_per_second, args.first_token_ms, args.answer_tokens)
+    print(f"Fake Ollama listening on {fake.host} (set OLLAMA_HOST={fake.host})")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# --- CONFIGURATION ---
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+DEFAULT_COLLECTION = "ark_project_knowledge"
+
+# Each target is a command ('{collection}' is filled in) and the prompt text that marks "ready for input".
+TARGETS = {
+    "run_agent": ([os.path.join(SRC_DIR, "run_agent.py")], "You: "),
+    "ask_ark": ([os.path.join(SRC_DIR, "ask_ark.py"), "--collection", "{collection}"], "> You: "),
+}
+
+def time_to_first_prompt(args: list, marker: str, timeout: float = 120.0, cwd: str = PROJECT_ROOT) -> float:
+    """
+    Start a script in 'cwd' (where its relative db/ is) and return the seconds until its
+    input prompt appears on stdout, then ask it to exit.
+    """
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", *args],
+        cwd=cwd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    output = b""
+    marker_bytes = marker.encode("utf-8")
+    try:
+        while marker_bytes not in output:
+            if time.perf_counter() - start_time > timeout:
+                raise TimeoutError(f"No prompt after {timeout:.0f}s")
+            data = process.stdout.read1(4096)
+            if not data:
+                raise RuntimeError(f"Process exited before showing a prompt:\n{output.decode('utf-8', 'ignore')[-2000:]}")
+            output += data
+        elapsed = time.perf_counter() - start_time
+        process.stdin.write(b"exit\n")
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+        return elapsed
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+def main(targets: list, runs: int, output_path: str = None, cwd: str = PROJECT_ROOT,
+         collection_name: str = DEFAULT_COLLECTION):
+    """
+    Measure time-to-first-prompt for each target over several runs and print a summary.
+
+    :param targets: Names of the scripts to measure (keys of TARGETS).
+    :param runs: Number of runs per target.
+    :param output_path: Optional path of a JSON file to write the results to.
+    :param cwd: Working directory of the scripts, which determines the db/ they open.
+    :param collection_name: Collection ask_ark.py is started with.
+    """
+    results = {}
+    for name in targets:
+        args, marker = TARGETS[name]
+        args = [arg.format(collection=collection_name) for arg in args]
+        samples = [time_to_first_prompt(args, marker, cwd=cwd) for _ in range(runs)]
+        results[name] = {
+            "runs": runs,
+            "min_s": min(samples),
+            "median_s": statistics.median(samples),
+            "max_s": max(samples),
+        }
+        print(f"{name}: time-to-first-prompt median {results[name]['median_s']:.3f}s "
+              f"(min {results[name]['min_s']:.3f}s, max {results[name]['max_s']:.3f}s, {runs} runs)")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output_path}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-prompt of ARK's interactive scripts.")
+    parser.add_argument("--target", choices=list(TARGETS), action="append", help="Script to measure (repeatable). Defaults to all.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per script.")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file.")
+    parser.add_argument("--cwd", type=str, default=PROJECT_ROOT, help="Working directory of the scripts (default: the project root).")
+    parser.add_argument("--collection", type=str, default=DEFAULT_COLLECTION, help="Collection to start ask_ark.py with.")
+    args = parser.parse_args()
+    main(targets=args.target or list(TARGETS), runs=args.runs, output_path=args.output, cwd=args.cwd,
+         collection_name=args.collection)
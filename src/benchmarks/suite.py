@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+sys.path.insert(0, SRC_DIR)
+
+from corpus import generate_corpus, sample_queries
+from fake_ollama import FakeOllama, DEFAULT_TOKENS_PER_SECOND, DEFAULT_FIRST_TOKEN_MS
+
+# --- CONFIGURATION ---
+SECTIONS = ["ingest", "retrieval", "agent", "delete", "startup"]
+BENCH_COLLECTION = "ark_benchmark"
+SMALL_EMBEDDING_MODEL = "all-MiniLM-L6-v2" # Small enough to embed the corpus quickly on CPU
+AGENT_QUESTIONS = ["What's my current RAM usage?", "How much memory is free?", "Is the system low on memory?"]
+
+def percentiles(samples: list) -> dict:
+    """Mean, p50 and p99 of a list of seconds, in milliseconds."""
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+# --- Sections ---
+
+def bench_ingest(corpus_dir: str) -> dict:
+    """Full ingest of the corpus, then a no-op incremental re-run."""
+    import ingest
+    full = ingest.main(corpus_dir, BENCH_COLLECTION)
+    noop = ingest.main(corpus_dir, BENCH_COLLECTION, incremental=True)
+    return {
+        "files": full["files_processed"],
+        "chunks": full["chunks_written"],
+        "seconds": full["seconds"],
+        "files_per_s": full["files_processed"] / full["seconds"],
+        "chunks_per_s": full["chunks_written"] / full["seconds"],
+        "incremental_noop_seconds": noop["seconds"],
+    }
+
+def bench_retrieval(queries: list, repeats: int) -> dict:
+    """
+    Hybrid retrieval latency. The first pass embeds every query (cold); later passes are served
+    from the embedding cache, like repeated questions in a session.
+    """
+    from rag_utils import RAGUtils
+    rag = RAGUtils(db_path="db")
+    rag.retrieve(BENCH_COLLECTION, "warm up") # Load the model and open the collection first
+
+    cold, warm, stages = [], [], {"encode_ms": [], "vector_ms": [], "lexical_ms": []}
+    for repeat in range(repeats):
+        for query in queries:
+            start_time = time.perf_counter()
+            _, stats = rag.retrieve(BENCH_COLLECTION, query)
+            (warm if repeat else cold).append(time.perf_counter() - start_time)
+            for stage, values in stages.items():
+                if stage in stats:
+                    values.append(stats[stage])
+    return {
+        "cold": percentiles(cold),
+        "warm": percentiles(warm) if warm else None,
+        "mean_stage_ms": {stage: statistics.mean(values) for stage, values in stages.items() if values},
+    }
+
+def bench_delete(corpus_dir: str) -> dict:
+    """Delete the chunks of one top-level directory of the corpus (about a fifth of it at the default size)."""
+    import delete_from_ark
+    target = os.path.join(corpus_dir, "part_0")
+    start_time = time.perf_counter()
+    deleted = delete_from_ark.main(BENCH_COLLECTION, [target])
+    seconds = time.perf_counter() - start_time
+    return {"chunks": deleted, "seconds": seconds, "chunks_per_s": deleted / seconds if seconds else None}
+
+def bench_agent(repeats: int) -> dict:
+    """Agent iterations against the fake LLM: per-iteration LLM time and per-question wall time."""
+    from langchain_ollama import OllamaLLM
+    from run_agent import run_agent, LLM_MODEL_NAME
+    llm = OllamaLLM(model=LLM_MODEL_NAME, temperature=0)
+
+    llm_seconds, iteration_seconds, question_seconds, stopped_early = [], [], [], 0
+    for _ in range(repeats):
+        for question in AGENT_QUESTIONS:
+            stats = []
+            start_time = time.perf_counter()
+            run_agent(llm, question, verbose=False, stats=stats)
+            elapsed = time.perf_counter() - start_time
+            question_seconds.append(elapsed)
+            iteration_seconds.extend([elapsed / len(stats)] * len(stats))
+            llm_seconds.extend(s["llm_seconds"] for s in stats)
+            stopped_early += sum(s["stopped_early"] for s in stats)
+    return {
+        "iterations": len(llm_seconds),
+        "iteration": percentiles(iteration_seconds),
+        "llm": percentiles(llm_seconds),
+        "question": percentiles(question_seconds),
+        "stopped_early": stopped_early,
+    }
+
+def bench_startup(runs: int, workdir: str) -> dict:
+    """Time-to-first-prompt of the interactive scripts, started in the suite's workdir on its collection."""
+    import startup
+    return startup.main(list(startup.TARGETS), runs, cwd=workdir, collection_name=BENCH_COLLECTION)
+
+# --- Comparison ---
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(old: dict, new: dict):
+    """Print every metric present in both result files with its relative change."""
+    old_flat, new_flat = flatten(old.get("results", {})), flatten(new.get("results", {}))
+    print(f"\n--- {old.get('meta', {}).get('commit', '?')} -> {new.get('meta', {}).get('commit', '?')} ---")
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{key:<45} {before:>12.2f} -> {after:>12.2f}  {change}")
+
+def main(sections: list, files: int, seed: int, queries: int, repeats: int, tokens_per_second: float,
+         first_token_ms: float, embedding_model: str, output_path: str = None, compare_path: str = None,
+         workdir: str = None, keep: bool = False):
+    """
+    Run the selected benchmark sections in an isolated working directory (its own db/) against
+    a synthetic corpus and a fake Ollama server, and write the results as JSON.
+    """
+    # Configure the embedding model and the LLM endpoint before any ARK module reads them.
+    os.environ.setdefault("ARK_EMBEDDING_MODEL", embedding_model)
+    os.environ.setdefault("ARK_EMBEDDING_DEVICE", "cpu")
+    fake = FakeOllama(tokens_per_second=tokens_per_second, first_token_ms=first_token_ms).start()
+    os.environ["OLLAMA_HOST"] = fake.host
+
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="ark-bench-"))
+    corpus_dir = os.path.join(workdir, "corpus")
+    previous_dir = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    meta = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"files": files, "seed": seed, "queries": queries, "repeats": repeats,
+                   "tokens_per_second": tokens_per_second, "first_token_ms": first_token_ms,
+                   "embedding_model": os.environ["ARK_EMBEDDING_MODEL"]},
+    }
+    results = {}
+    try:
+        if {"ingest", "retrieval", "delete"} & set(sections):
+            results["corpus"] = generate_corpus(corpus_dir, files, seed)
+        runners = {
+            "ingest": lambda: bench_ingest(corpus_dir),
+            "retrieval": lambda: bench_retrieval(sample_queries(queries, seed), repeats),
+            "agent": lambda: bench_agent(repeats),
+            "delete": lambda: bench_delete(corpus_dir),
+            "startup": lambda: bench_startup(repeats, workdir),
+        }
+        for section in SECTIONS: # Fixed order: retrieval and delete need the ingested corpus
+            if section not in sections:
+                continue
+            print(f"\n=== Benchmark: {section} ===")
+            try:
+                results[section] = runners[section]()
+            except Exception as e:
+                print(f"Section '{section}' failed: {e}")
+                results[section] = {"error": str(e)}
+    finally:
+        os.chdir(previous_dir)
+        fake.stop()
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": meta, "results": results}
+    print("\n" + json.dumps(results, indent=2))
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output_path}")
+    if compare_path:
+        with open(compare_path, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ARK's benchmark suite on a synthetic corpus with a fake LLM.")
+    parser.add_argument("--only", choices=SECTIONS, action="append", help="Section to run (repeatable). Defaults to all.")
+    parser.add_argument("--files", type=int, default=500, help="Files in the synthetic corpus.")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus and query seed.")
+    parser.add_argument("--queries", type=int, default=50, help="Retrieval queries per pass.")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the retrieval queries / agent questions / startup runs.")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND, help="Fake LLM generation speed.")
+    parser.add_argument("--first-token-ms", type=float, default=DEFAULT_FIRST_TOKEN_MS, help="Fake LLM first-token latency.")
+    parser.add_argument("--embedding-model", type=str, default=SMALL_EMBEDDING_MODEL, help="Embedding model (ARK_EMBEDDING_MODEL takes precedence).")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON to this file, e.g. bench/<commit>.json.")
+    parser.add_argument("--compare", type=str, default=None, help="Results JSON of an earlier run to compare against.")
+    parser.add_argument("--workdir", type=str, default=None, help="Working directory for the corpus and db (default: a temp dir).")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory afterwards.")
+    args = parser.parse_args()
+
+    main(args.only or SECTIONS, args.files, args.seed, args.queries, args.repeats, args.tokens_per_second,
+         args.first_token_ms, args.embedding_model, args.output, args.compare, args.workdir, args.keep)
@@ -0,0 +1,243 @@
+import os
+import time
+import hashlib
+import argparse
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import system_metrics
+from path_index import PathIndex, PATH_INDEX_PATH
+from manifest import IngestManifest
+
+# --- CONFIGURATION ---
+SYSTEM_INFO_DIR = os.path.join("data", "system_info")
+SECTIONS_DIR = os.path.join(SYSTEM_INFO_DIR, "sections")
+SYSTEM_COLLECTION = "ark_system_knowledge"
+# The monolithic files written by earlier versions of the collector; their chunks are
+# removed from the collection so the same content is not indexed twice.
+LEGACY_FILES = ["01-hardware_info.txt", "02-storage_info.txt", "03-software_network_info.txt", "04-filesystem_structure.txt"]
+PROBE_WORKERS = 8 # Probes run concurrently; most of them just wait for a command
+PROBE_TIMEOUT = 120 # Seconds before a probe's command is abandoned
+TREE_DEPTH = 3 # Depth of the home directory tree, counted from the home directory
+SECTION_HASH_CHARS = 8 # Hash suffix that keeps the sections of similarly named directories apart
+DPKG_LOG = "/var/log/dpkg.log"
+
+# --- Probes ---
+# Each probe returns the text of one section. Sections are kept stable between runs
+# (no timestamps), so only real changes alter their content hash.
+
+def run_command(command: list) -> str:
+    """Run a command and return its output, or a short note if it is unavailable or fails."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    except FileNotFoundError:
+        return f"Not available: '{command[0]}' is not installed."
+    except subprocess.TimeoutExpired:
+        return f"Not available: '{' '.join(command)}' timed out."
+    if result.returncode != 0 and not result.stdout:
+        return f"Not available: '{' '.join(command)}' failed: {result.stderr.strip()}"
+    return result.stdout
+
+def read_text(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except OSError as e:
+        return f"Not available: {e}"
+
+def installed_packages() -> str:
+    """Packages installed with dpkg, from its log (a partial list of manually installed packages)."""
+    try:
+        with open(DPKG_LOG, "r", encoding="utf-8", errors="ignore") as f:
+            return "".join(line for line in f if " install " in line)
+    except OSError as e:
+        return f"Not available: {e}"
+
+def render_tree(root: str, max_depth: int) -> str:
+    """Indented listing of a directory, like 'tree -a -L max_depth', without following symlinks."""
+    lines = [root]
+
+    def walk(directory, prefix, depth):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name.lower())
+        except OSError:
+            return
+        for i, entry in enumerate(entries):
+            last = i == len(entries) - 1
+            lines.append(f"{prefix}{'└── ' if last else '├── '}{entry.name}")
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir and depth < max_depth:
+                walk(entry.path, prefix + ("    " if last else "│   "), depth + 1)
+
+    walk(root, "", 1)
+    return "\n".join(lines) + "\n"
+
+def memory_sizes() -> str:
+    """Installed RAM and swap sizes; live usage would change the section on every run (get_ram_usage reads it)."""
+    memory = system_metrics.memory_usage()
+    return (f"Total RAM: {system_metrics.format_bytes(memory['total'])}\n"
+            f"Total swap: {system_metrics.format_bytes(memory['swap_total'])}\n")
+
+def filesystem_sizes() -> str:
+    """Mounted filesystems and their sizes, without used/free space (get_disk_usage reads those)."""
+    rows = [f"{'Filesystem':<24}{'Type':<8}{'Size':>8}  Mounted on"]
+    for disk in system_metrics.disk_usage():
+        rows.append(f"{disk['device']:<24}{disk['fs_type']:<8}{system_metrics.format_bytes(disk['total']):>8}  {disk['mount_point']}")
+    return "\n".join(rows) + "\n"
+
+def build_path_index(path_index_path: str, home: str) -> int:
+    index = PathIndex(path_index_path)
+    try:
+        return index.build([home])
+    finally:
+        index.close()
+
+def static_probes() -> list:
+    """(section id, title, probe) for the hardware, storage, software and network sections."""
+    return [
+        ("hardware-cpu", "CPU Information (lscpu)", lambda: run_command(["lscpu"])),
+        ("hardware-memory", "Memory Size (/proc/meminfo)", memory_sizes),
+        ("hardware-lshw", "Detailed Hardware List (lshw -short)", lambda: run_command(["sudo", "-n", "lshw", "-short"])),
+        ("hardware-pci", "PCI Devices (lspci)", lambda: run_command(["lspci"])),
+        ("hardware-usb", "USB Devices (lsusb)", lambda: run_command(["lsusb"])),
+        ("storage-block-devices", "Block Devices (lsblk)", lambda: run_command(["lsblk", "-a"])),
+        ("storage-disk-usage", "Mounted Filesystems and Sizes (df -h)", filesystem_sizes),
+        ("storage-partitions", "Partition Information (parted -l)", lambda: run_command(["sudo", "-n", "parted", "-l"])),
+        ("software-kernel", "Kernel (uname -a)", lambda: " ".join(platform.uname()) + "\n"),
+        ("software-os-release", "OS Release (/etc/os-release)", lambda: read_text("/etc/os-release")),
+        ("software-packages-dpkg", "Installed Packages (dpkg log)", installed_packages),
+        ("software-packages-snap", "Installed Snaps (snap list)", lambda: run_command(["snap", "list"])),
+        ("software-packages-flatpak", "Installed Flatpaks (flatpak list)", lambda: run_command(["flatpak", "list"])),
+        ("network-interfaces", "Network Interfaces (ip a)", lambda: run_command(["ip", "a"])),
+        ("network-listening", "Listening Sockets (ss -tuln)", lambda: run_command(["ss", "-tuln"])),
+    ]
+
+def filesystem_probes(home: str) -> list:
+    """One section per top-level entry of the home directory, so a change in one tree only re-embeds that tree."""
+    probes = [("filesystem-home", f"Home Directory ({home}) top level",
+               lambda: render_tree(home, 1))]
+    used = {section for section, _, _ in probes}
+    try:
+        entries = sorted(os.scandir(home), key=lambda e: e.name.lower())
+    except OSError:
+        return probes
+    for entry in entries:
+        try:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+        except OSError:
+            continue
+        slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in entry.name.lstrip("."))
+        section = "filesystem-" + slug + ("-hidden" if entry.name.startswith(".") else "")
+        # Keep the sections of directories that sanitise alike (e.g. 'a b' and 'a_b', or 'home') apart.
+        suffix = "-" + hashlib.sha1(entry.name.encode("utf-8", "surrogateescape")).hexdigest()[:SECTION_HASH_CHARS]
+        if slug != entry.name:
+            section += suffix
+        while section in used:
+            section += suffix
+        used.add(section)
+        probes.append((section, f"Directory Tree of {entry.path} (depth {TREE_DEPTH - 1})",
+                       lambda path=entry.path: render_tree(path, TREE_DEPTH - 1)))
+    return probes
+
+# --- Collector ---
+
+def write_section(output_dir: str, section: str, title: str, body: str) -> tuple:
+    """
+    Write a section file unless its content is unchanged, leaving unchanged files (and their
+    mtime) untouched so incremental ingestion skips them. Returns (path, content hash, changed).
+    """
+    content = f"--- {title} ---\n{body}"
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    path = os.path.join(output_dir, f"{section}.txt")
+    try:
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).hexdigest() == content_hash:
+                return path, content_hash, False
+    except OSError:
+        pass
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path, content_hash, True
+
+def collect(output_dir: str = SECTIONS_DIR, home: str = "~", path_index_path: str = PATH_INDEX_PATH) -> dict:
+    """
+    Run every probe concurrently (and rebuild the path index alongside them), write one file per
+    section and remove the files of sections that no longer exist.
+    Returns {'changed': [...], 'unchanged': [...], 'removed': [...], 'paths_indexed': n}.
+    """
+    home = os.path.abspath(os.path.expanduser(home))
+    os.makedirs(output_dir, exist_ok=True)
+    probes = static_probes() + filesystem_probes(home)
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+        path_index_future = executor.submit(build_path_index, path_index_path, home)
+        futures = [(section, title, executor.submit(probe)) for section, title, probe in probes]
+        results = {"changed": [], "unchanged": [], "removed": []}
+        for section, title, future in futures:
+            try:
+                body = future.result()
+            except Exception as e:
+                body = f"Not available: {e}"
+            _, content_hash, changed = write_section(output_dir, section, title, body)
+            results["changed" if changed else "unchanged"].append(section)
+            print(f"  - {section:<36} {content_hash[:12]} {'changed' if changed else 'unchanged'}")
+        results["paths_indexed"] = path_index_future.result()
+
+    current = {f"{section}.txt" for section, _, _ in probes}
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".txt") and name not in current:
+            os.remove(os.path.join(output_dir, name))
+            results["removed"].append(name[:-len(".txt")])
+    return results
+
+def main(output_dir: str = SECTIONS_DIR, collection_name: str = SYSTEM_COLLECTION, home: str = "~",
+         ingest: bool = True):
+    """
+    Collect the system information sections and upsert the changed ones into the collection.
+
+    :param output_dir: Directory the section files are written to.
+    :param collection_name: Collection the sections are ingested into.
+    :param home: Home directory whose tree and path index are collected.
+    :param ingest: Ingest the changed sections (incrementally) after collecting.
+    """
+    print(f"--- Collecting system information into '{output_dir}' ---")
+    start_time = time.time()
+    results = collect(output_dir, home)
+    print(f"Collected {len(results['changed']) + len(results['unchanged'])} sections in {time.time() - start_time:.2f}s: "
+          f"{len(results['changed'])} changed, {len(results['unchanged'])} unchanged, {len(results['removed'])} removed. "
+          f"Path index: {results['paths_indexed']} paths.")
+
+    if not ingest:
+        return
+    manifest = IngestManifest(collection_name)
+    legacy = [source for source in (os.path.abspath(os.path.join(SYSTEM_INFO_DIR, name)) for name in LEGACY_FILES)
+              if source in manifest.files]
+    if legacy:
+        # Sections replace the monolithic files; drop those so nothing is indexed twice.
+        import delete_from_ark
+        delete_from_ark.main(collection_name, legacy)
+    elif not results["changed"] and not results["removed"] and manifest.files:
+        print("Nothing changed; the collection is up to date.")
+        return
+
+    # Incremental ingestion skips the unchanged section files (same size and mtime)
+    # and deletes the chunks of removed ones.
+    import ingest as ingest_module
+    ingest_module.main(data_path=output_dir, collection_name=collection_name, incremental=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect system information for ARK, one document per section, and ingest what changed.")
+    parser.add_argument("--output", type=str, default=SECTIONS_DIR, help="Directory to write the section files to.")
+    parser.add_argument("--collection", type=str, default=SYSTEM_COLLECTION, help="The ChromaDB collection to update.")
+    parser.add_argument("--home", type=str, default="~", help="Home directory to describe and index.")
+    parser.add_argument("--no-ingest", action="store_true", help="Only write the section files and the path index.")
+    args = parser.parse_args()
+
+    main(output_dir=args.output, collection_name=args.collection, home=args.home, ingest=not args.no_ingest)
@@ -3,7 +3,8 @@ import os
 def normalize_path(path: str) -> str:
     """
     Normalize a path by expanding ~ and resolving relative paths.
-    Handles common directory names by mapping them to home directory paths.
+    Handles common directory names by mapping them to home directory paths, and
+    resolves other names that do not exist locally through the path index, when built.
     """
     # Map common directory names to home paths
     common_dirs = {
@@ -24,10 +25,94 @@ def normalize_path(path: str) -> str:
         path = common_dirs[lower_path]
 
     # Expand ~ and resolve to absolute path
-    return os.path.abspath(os.path.expanduser(path))
+    resolved = os.path.abspath(os.path.expanduser(path))
+
+    # A bare name or partial path that does not exist here ("scripts", "src/scripts", "thesis notes")
+    # is looked up in the collector's path index, and used if exactly one path ends with it.
+    # Names that merely occur inside other names are not followed (see path_suggestions).
+    if not os.path.exists(resolved) and not path.strip().startswith(("/", "~", ".")):
+        from path_index import get_path_index
+        index = get_path_index()
+        match = index.resolve(path.strip()) if index is not None else None
+        if match:
+            return match
+    return resolved
+
+def path_suggestions(path: str) -> list:
+    """
+    Return indexed paths whose names resemble a path that was not found (e.g. 'notes.txt'
+    for 'note'), for "did you mean" hints, or an empty list if there is no path index.
+    """
+    from path_index import get_path_index
+    index = get_path_index()
+    name = os.path.basename(path.strip().rstrip(os.sep)) if path.strip().startswith(("/", "~", ".")) else path.strip()
+    return index.lookup(name, limit=5) if index is not None and name else []
+
+def suggestion_hint(path: str) -> str:
+    """Return ' Did you mean: ...?' with path_suggestions() for an error message, or ''."""
+    suggestions = path_suggestions(path)
+    return f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
 
 def expand_home_path(path: str) -> str:
     """
     Expand ~ in path to home directory.
     """
     return os.path.expanduser(path)
+
+# Chunks store every directory prefix of their source as 'dir_1'...'dir_N' metadata,
+# so all chunks under a directory can be selected with a single equality filter.
+MAX_INDEXED_PATH_DEPTH = 16
+
+def path_components(path: str) -> list:
+    """
+    Split an absolute path into its non-empty components.
+    """
+    return [part for part in path.split(os.sep) if part]
+
+def path_prefix_metadata(source: str) -> dict:
+    """
+    Return the indexed directory prefixes of a source file, e.g. for '/home/ank/proj/a.py':
+    {'dir_1': '/home', 'dir_2': '/home/ank', 'dir_3': '/home/ank/proj'}.
+    """
+    directories = path_components(os.path.dirname(source))
+    return {
+        f"dir_{depth}": os.sep + os.sep.join(directories[:depth])
+        for depth in range(1, min(len(directories), MAX_INDEXED_PATH_DEPTH) + 1)
+    }
+
+def path_prefix_filter(directory: str):
+    """
+    Return a metadata 'where' filter matching every chunk under 'directory',
+    or None if the directory is too deep (or is the root) to be indexed.
+    """
+    depth = len(path_components(directory))
+    if depth == 0 or depth > MAX_INDEXED_PATH_DEPTH:
+        return None
+    return {f"dir_{depth}": os.sep + os.sep.join(path_components(directory))}
+
+# ark_server.py only answers TCP requests that carry this per-user secret, in a file only its owner can read.
+SERVER_TOKEN_FILE = os.environ.get("ARK_SERVER_TOKEN_FILE", os.path.join(os.path.expanduser("~"), ".ark", "server_token"))
+
+def load_server_token(path: str = SERVER_TOKEN_FILE, create: bool = False):
+    """
+    Return the ARK server's access token stored in 'path', or None if there is none.
+    With create=True, a new random token is written (readable by the owner only) if the file does not exist.
+    """
+    if create and not os.path.exists(path):
+        import secrets
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass # Created by another process in the meantime
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(secrets.token_urlsafe(32) + "\n")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+    except OSError:
+        return None
+    if create and os.stat(path).st_mode & 0o077:
+        os.chmod(path, 0o600) # Never serve with a token other users can read
+    return token or None
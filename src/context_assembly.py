@@ -0,0 +1,149 @@
+import re
+
+# --- CONFIGURATION ---
+CHARS_PER_TOKEN = 4 # Rough estimate for English text and code; avoids loading a tokenizer
+DEFAULT_TOKEN_BUDGET = 2500
+# Context token budget per collection; add entries for new collections as needed.
+CONTEXT_TOKEN_BUDGETS = {
+    "ark_system_knowledge": 1500,
+    "ark_project_knowledge": 3000,
+}
+DUPLICATE_THRESHOLD = 0.8 # Word-shingle similarity above which a chunk counts as a near-duplicate
+MMR_LAMBDA = 0.7 # Trade-off between relevance (1.0) and novelty (0.0) when ordering chunks
+MIN_TRUNCATED_TOKENS = 100 # Don't bother adding a truncated chunk smaller than this
+
+_WORDS = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate used for budgeting and reporting."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def token_budget_for(collection_name: str) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(collection_name, DEFAULT_TOKEN_BUDGET)
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORDS.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _similarity(a: set, b: set) -> float:
+    """Overlap coefficient, so a chunk fully contained in another scores 1.0."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+def select_diverse(hits: list, threshold: float = DUPLICATE_THRESHOLD, mmr_lambda: float = MMR_LAMBDA) -> list:
+    """
+    Order hits by maximal marginal relevance and drop near-duplicates.
+
+    Relevance comes from the input order (best first). Each step picks the hit with the best
+    mmr_lambda * relevance - (1 - mmr_lambda) * similarity-to-already-selected, and hits whose
+    similarity to a selected one exceeds 'threshold' are discarded.
+    Chunks from the same source that overlap by position are kept, since they are merged later.
+    """
+    candidates = [(i, doc, meta, _shingles(doc)) for i, (doc, meta) in enumerate(hits)]
+    selected = []
+    n = max(len(hits), 1)
+    while candidates:
+        best, best_score, remaining = None, None, []
+        for candidate in candidates:
+            i, doc, meta, shingles = candidate
+            max_similarity = max(
+                (_similarity(shingles, s[3]) for s in selected if not _overlaps(meta, s[2])), default=0.0
+            )
+            if max_similarity > threshold:
+                continue # Near-duplicate of something already selected
+            score = mmr_lambda * (1.0 - i / n) - (1.0 - mmr_lambda) * max_similarity
+            if best is None or score > best_score:
+                if best is not None:
+                    remaining.append(best)
+                best, best_score = candidate, score
+            else:
+                remaining.append(candidate)
+        if best is None:
+            break
+        selected.append(best)
+        candidates = remaining
+    return [(doc, meta) for _, doc, meta, _ in selected]
+
+def _span(meta: dict, doc: str):
+    start = meta.get("start_index")
+    return (start, start + len(doc)) if isinstance(start, int) and start >= 0 else None
+
+def _overlaps(meta_a: dict, meta_b: dict) -> bool:
+    """Whether two chunks come from the same source and carry positions (so they can be merged)."""
+    return (meta_a.get("source") is not None and meta_a.get("source") == meta_b.get("source")
+            and isinstance(meta_a.get("start_index"), int) and isinstance(meta_b.get("start_index"), int))
+
+def merge_adjacent(hits: list) -> list:
+    """
+    Merge chunks from the same source whose character ranges overlap or touch, removing the
+    repeated overlap. The merged chunk takes the position of its best-ranked part.
+    Returns a list of (source, text) in relevance order.
+    """
+    groups = {} # source -> list of [start, end, text, best_rank]
+    order = []
+    for rank, (doc, meta) in enumerate(hits):
+        source = meta.get("source", "Unknown source")
+        span = _span(meta, doc)
+        if span is None:
+            order.append((rank, source, doc))
+            continue
+        groups.setdefault(source, []).append([span[0], span[1], doc, rank])
+
+    for source, pieces in groups.items():
+        pieces.sort()
+        merged = [pieces[0]]
+        for start, end, text, rank in pieces[1:]:
+            last = merged[-1]
+            if start <= last[1]:
+                # Append only the part of this chunk that extends past the previous one.
+                if end > last[1]:
+                    last[2] += text[last[1] - start:]
+                    last[1] = end
+                last[3] = min(last[3], rank)
+            else:
+                merged.append([start, end, text, rank])
+        order.extend((rank, source, text) for _, _, text, rank in merged)
+
+    order.sort(key=lambda entry: entry[0])
+    return [(source, text) for _, source, text in order]
+
+def assemble_context(hits: list, token_budget: int = DEFAULT_TOKEN_BUDGET) -> tuple:
+    """
+    Turn retrieved (document, metadata) hits into a compact prompt context:
+    near-duplicates are removed, overlapping chunks of the same file are merged, and
+    the result is packed, best first, into 'token_budget' estimated tokens.
+
+    :return: (context string, stats dict with chunk counts, estimated token sizes and the sources used)
+    """
+    raw_tokens = sum(estimate_tokens(doc) for doc, _ in hits)
+    diverse = select_diverse(hits)
+    pieces = merge_adjacent(diverse)
+
+    context_parts, sources, used = [], [], 0
+    for source, text in pieces:
+        header = f"--- CONTEXT FROM: {source} ---\n"
+        cost = estimate_tokens(header + text)
+        if used + cost > token_budget:
+            remaining = token_budget - used - estimate_tokens(header)
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                context_parts.append(header + text[:remaining * CHARS_PER_TOKEN])
+                sources.append(source)
+                used = token_budget
+            break
+        context_parts.append(header + text)
+        sources.append(source)
+        used += cost
+
+    context = "\n\n".join(context_parts)
+    stats = {
+        "chunks_retrieved": len(hits),
+        "chunks_after_dedup": len(diverse),
+        "context_pieces": len(context_parts),
+        "raw_context_tokens": raw_tokens,
+        "context_tokens": estimate_tokens(context),
+        "sources": list(dict.fromkeys(sources)), # Distinct sources in the context, best first
+    }
+    return context, stats
@@ -1,21 +1,106 @@
 import argparse
 import chromadb
 import os
+from fnmatch import fnmatchcase
+
+from common import path_prefix_filter
+from lexical_index import LexicalIndex
+from manifest import IngestManifest, is_under
+from shards import ShardCatalog, ShardedCollection, SHARD_CATALOG_FILE
 
 # --- CONFIGURATION ---
 DB_PATH = "db"
-BATCH_SIZE = 500 # The number of documents to delete in each batch
+BATCH_SIZE = 500 # The number of documents to fetch and delete in each batch
+GLOB_CHARS = "*?["
 
-def main(collection_name: str, source_path: str):
+def make_target(path: str) -> dict:
+    """
+    Describe what a --path argument selects: a single file, a directory tree or a glob pattern.
+    Returns a dict with the 'kind', a 'where' filter that can be pushed down to the store
+    (None if the path is not indexed) and a 'matches(source)' predicate.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+
+    if any(c in path for c in GLOB_CHARS):
+        # Narrow the scan to the deepest directory before the first wildcard.
+        literal_dir = os.path.dirname(path[:min(path.index(c) for c in GLOB_CHARS if c in path)])
+        return {"kind": "glob", "path": path, "where": path_prefix_filter(literal_dir),
+                "matches": lambda source: fnmatchcase(source, path)}
+
+    if os.path.isfile(path):
+        return {"kind": "file", "path": path, "where": {"source": path},
+                "matches": lambda source: source == path}
+
+    # Sources are stored as absolute paths by ingest.py.
+    directory_filter = path_prefix_filter(path)
+    if os.path.isdir(path):
+        return {"kind": "directory", "path": path, "where": directory_filter,
+                "matches": lambda source: is_under(source, path) and source != path}
+
+    # The path no longer exists on disk, so it may have been a file or a directory.
+    return {"kind": "file or directory", "path": path,
+            "where": {"$or": [{"source": path}, directory_filter]} if directory_filter else None,
+            "matches": lambda source: is_under(source, path)}
+
+def process_target(collection, lexical_index, target: dict, dry_run: bool, force_scan: bool) -> int:
+    """
+    Count (dry run) or delete the chunks selected by one target, holding at most one page of IDs in memory.
+    Deleted chunks are also removed from the lexical index, keeping both indexes consistent.
+    Uses a pure metadata filter when the target is indexed and exact, and otherwise a paginated
+    scan (narrowed by the filter when possible) that checks each chunk's source.
     """
-    Deletes documents from a specified collection that originate from a given source path.
-    This version fetches all metadata, filters in Python, and deletes in batches.
+    where = None if force_scan else target["where"]
+    count = 0
+
+    if where is not None and target["kind"] != "glob":
+        if dry_run:
+            offset = 0
+            while True:
+                ids = collection.get(where=where, limit=BATCH_SIZE, offset=offset, include=[])['ids']
+                if not ids:
+                    return count
+                count += len(ids)
+                offset += len(ids)
+        # Matching chunks leave the result set as they are deleted, so always fetch the first page.
+        while True:
+            ids = collection.get(where=where, limit=BATCH_SIZE, include=[])['ids']
+            if not ids:
+                return count
+            collection.delete(ids=ids)
+            lexical_index.delete(ids)
+            count += len(ids)
+            print(f"  - Deleted {count} chunks so far...")
+
+    offset = 0
+    while True:
+        page = collection.get(where=where, limit=BATCH_SIZE, offset=offset, include=["metadatas"])
+        if not page['ids']:
+            return count
+        ids = [chunk_id for chunk_id, metadata in zip(page['ids'], page['metadatas'])
+               if metadata and 'source' in metadata and target["matches"](metadata['source'])]
+        if ids and not dry_run:
+            collection.delete(ids=ids)
+            lexical_index.delete(ids)
+            print(f"  - Deleted {count + len(ids)} chunks so far...")
+        count += len(ids)
+        # Deleted chunks no longer occupy positions, so only skip past the ones that were kept.
+        offset += len(page['ids']) - (0 if dry_run else len(ids))
+
+def main(collection_name: str, source_paths: list, dry_run: bool = False, force_scan: bool = False):
+    """
+    Deletes documents from a specified collection that originate from the given source paths.
+    Directories and single files are selected with an indexed metadata filter that the store
+    evaluates itself; glob patterns and un-indexed paths fall back to a paginated scan.
+    In a sharded collection, each target is only looked up in the shards that can hold it.
 
     :param collection_name: The name of the collection to modify.
-    :param source_path: The source directory path to delete.
+    :param source_paths: Source directories, files or glob patterns to delete.
+    :param dry_run: Only count the matching chunks.
+    :param force_scan: Match on the 'source' metadata with a full paginated scan, e.g. for
+                       chunks ingested before directory prefixes were indexed.
+    :return: The number of chunks deleted (or that would be deleted), or None on error.
     """
-    print(f"--- Starting Deletion Process for collection: '{collection_name}' ---")
-    print(f"Target source path: '{source_path}'")
+    print(f"--- Starting {'Dry Run' if dry_run else 'Deletion Process'} for collection: '{collection_name}' ---")
 
     # --- 1. Connect to the Vector Database ---
     if not os.path.exists(DB_PATH):
@@ -24,54 +109,65 @@ def main(collection_name: str, source_path: str):
 
     client = chromadb.PersistentClient(path=DB_PATH)
 
-    try:
-        collection = client.get_collection(name=collection_name)
-    except ValueError:
-        print(f"Error: Collection '{collection_name}' not found. Cannot delete.")
-        return
-
-    # --- 2. Fetch all metadata and filter in Python ---
-    print("Fetching all document metadata to filter for deletion...")
-    # Get all documents with their metadata. This can be memory-intensive for huge dbs.
-    all_docs = collection.get(include=["metadatas"])
-
-    # Make sure the path is treated as a directory
-    if not source_path.endswith(os.path.sep):
-        source_path += os.path.sep
-
-    ids_to_delete = []
-    for i, metadata in enumerate(all_docs['metadatas']):
-        # Check if the 'source' key exists and starts with the target path
-        if metadata and 'source' in metadata and metadata['source'].startswith(source_path):
-            ids_to_delete.append(all_docs['ids'][i])
-
-    if not ids_to_delete:
-        print("No documents found matching the specified source path. Nothing to delete.")
-        print("--- Deletion Process Finished ---")
-        return
-
-    total_to_delete = len(ids_to_delete)
-    print(f"Found {total_to_delete} document chunks to delete.")
-
-    # --- 3. Delete the Documents in Batches ---
-    print(f"Deleting documents in batches of {BATCH_SIZE}...")
-
-    deleted_count = 0
-    for i in range(0, total_to_delete, BATCH_SIZE):
-        batch_ids = ids_to_delete[i:i + BATCH_SIZE]
-        collection.delete(ids=batch_ids)
-        deleted_count += len(batch_ids)
-        print(f"  - Deleted batch {i//BATCH_SIZE + 1}/{(total_to_delete + BATCH_SIZE - 1)//BATCH_SIZE}... ({deleted_count}/{total_to_delete})")
-
-    print(f"\nSuccessfully deleted {total_to_delete} documents.")
+    layout = ShardCatalog(os.path.join(DB_PATH, SHARD_CATALOG_FILE)).get(collection_name)
+    if layout is not None:
+        collection = ShardedCollection(client, layout)
+    else:
+        try:
+            collection = client.get_collection(name=collection_name)
+        except ValueError:
+            print(f"Error: Collection '{collection_name}' not found. Cannot delete.")
+            return
+
+    lexical_index = LexicalIndex(collection_name, os.path.join(DB_PATH, "lexical"))
+
+    # --- 2. Count or Delete Matching Chunks for Each Path ---
+    targets = [make_target(path) for path in source_paths]
+    total = 0
+    for target in targets:
+        if force_scan or target["where"] is None:
+            mode = "full scan"
+        elif target["kind"] == "glob":
+            mode = "scan narrowed by indexed filter"
+        else:
+            mode = "indexed filter"
+        print(f"Target {target['kind']}: '{target['path']}' ({mode})")
+        if layout is None:
+            count = process_target(collection, lexical_index, target, dry_run, force_scan)
+        else:
+            shards = collection.collections(layout.shards_for_target(target["kind"], target["path"]))
+            print(f"  Searching {len(shards)} of {len(layout.shards)} shards: {', '.join(name for name, _ in shards) or 'none'}")
+            count = sum(process_target(shard, lexical_index, target, dry_run, force_scan) for _, shard in shards)
+        print(f"  {'Matches' if dry_run else 'Deleted'} {count} document chunks.")
+        total += count
+
+    if dry_run:
+        print(f"\nDry run: {total} document chunks would be deleted.")
+        print("--- Dry Run Finished ---")
+        return total
+
+    # --- 3. Keep the Ingestion Manifest in Sync ---
+    # Otherwise an incremental re-ingest would consider the deleted files unchanged and skip them.
+    manifest = IngestManifest(collection_name)
+    for source in list(manifest.files):
+        if any(target["matches"](source) for target in targets):
+            manifest.forget(source)
+    manifest.save()
+
+    print(f"\nSuccessfully deleted {total} documents.")
     print(f"Current total documents in collection: {collection.count()}")
     print("--- Deletion Process Finished ---")
+    return total
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Delete documents from ARK's knowledge base based on source path.")
-    parser.add_argument("--path", type=str, required=True, help="The source directory path of the documents to delete.")
+    parser.add_argument("--path", type=str, required=True, nargs="+", action="extend",
+                        help="Source directories, files or glob patterns (quote them; '*' also matches '/') of the documents to delete.")
     parser.add_argument("--collection", type=str, required=True, help="The name of the ChromaDB collection to modify.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the matching document chunks.")
+    parser.add_argument("--scan", action="store_true",
+                        help="Match sources with a paginated scan instead of the indexed filter (for data ingested before path indexing).")
 
     args = parser.parse_args()
 
-    main(collection_name=args.collection, source_path=args.path)
+    main(collection_name=args.collection, source_paths=args.path, dry_run=args.dry_run, force_scan=args.scan)
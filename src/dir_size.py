@@ -0,0 +1,201 @@
+import os
+import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from system_metrics import format_bytes
+
+# --- CONFIGURATION ---
+DIR_SIZE_WORKERS = 8 # Directories scanned concurrently (stat calls release the GIL)
+DIR_SIZE_TIME_BUDGET = 20.0 # Seconds before a partial/estimated answer is returned; below the tool timeout
+TOP_FILES_KEPT = 20 # Largest files remembered per directory for the "largest children" view
+TOP_CHILDREN = 10 # Entries shown in the largest children view
+
+def _disk_bytes(st: os.stat_result) -> int:
+    """Allocated size, like du; falls back to the apparent size where st_blocks is unavailable."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+class DirEntry:
+    """What one scandir of a directory found: the bytes of its files and its subdirectories."""
+    __slots__ = ("key", "own_bytes", "subdirs", "top_files", "error")
+
+    def __init__(self, key, own_bytes=0, subdirs=(), top_files=(), error=None):
+        self.key = key # (st_dev, st_ino, st_mtime_ns) of the directory when it was scanned
+        self.own_bytes = own_bytes
+        self.subdirs = list(subdirs)
+        self.top_files = list(top_files) # [(bytes, name)], largest first
+        self.error = error
+
+class DirSizeIndex:
+    """
+    In-memory index of directory sizes, shared by all get_directory_size calls of a session.
+
+    Each directory is scanned once with os.scandir and its entry is keyed by the directory's
+    (device, inode, mtime). Later walks only stat a directory to revalidate it, and rescan it
+    when the key changed (files were added, removed or renamed). Like any mtime-based cache it
+    does not notice a file growing in place until its directory changes. Unlike du, a file with
+    several hard links is counted once per link.
+
+    Walks run on a thread pool and stop at a time budget. Everything scanned so far stays
+    cached, so a walk that ran out of time resumes where it left off on the next call.
+    """
+    def __init__(self, workers: int = DIR_SIZE_WORKERS):
+        self._entries = {} # path -> DirEntry
+        self._totals = {} # path -> total bytes of the last complete walk of that subtree
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ark-du")
+
+    def _scan(self, path: str):
+        """Return (path, entry, reused) for one directory, rescanning it only if it changed."""
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError as e:
+            return path, DirEntry(None, error=str(e)), False
+        key = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached is not None and cached.key == key:
+            return path, cached, True
+
+        own_bytes, subdirs, files = _disk_bytes(st), [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        size = _disk_bytes(entry.stat(follow_symlinks=False))
+                    except OSError:
+                        continue # Vanished or unreadable entry
+                    own_bytes += size
+                    files.append((size, entry.name))
+        except OSError as e:
+            return path, DirEntry(key, error=str(e)), False
+
+        entry = DirEntry(key, own_bytes, subdirs, heapq.nlargest(TOP_FILES_KEPT, files))
+        with self._lock:
+            self._entries[path] = entry
+        return path, entry, False
+
+    def measure(self, path: str, time_budget: float = DIR_SIZE_TIME_BUDGET) -> dict:
+        """
+        Walk 'path' and return its size. When the time budget runs out, the result is partial:
+        'total' only counts the directories reached, and 'estimated_total' fills in the rest from
+        earlier walks or, failing that, from the average size of the directories that were scanned.
+        """
+        path = os.path.abspath(path)
+        if not os.path.isdir(path):
+            raise NotADirectoryError(f"'{path}' is not a directory")
+        started = time.monotonic()
+        deadline = started + time_budget
+
+        walked = {} # path -> DirEntry seen during this walk
+        reused = errors = 0
+        pending = {self._executor.submit(self._scan, path)}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_path, entry, was_reused = future.result()
+                walked[dir_path] = entry
+                reused += was_reused
+                errors += entry.error is not None
+                pending.update(self._executor.submit(self._scan, sub) for sub in entry.subdirs)
+        for future in pending:
+            future.cancel()
+
+        totals, missing = self._sum_totals(path, walked)
+        unscanned_bytes, unscanned_unknown = 0, 0
+        for dir_path in missing:
+            if dir_path in self._totals:
+                unscanned_bytes += self._totals[dir_path]
+            else:
+                unscanned_unknown += 1
+        scanned_bytes = sum(entry.own_bytes for entry in walked.values())
+        average = scanned_bytes / len(walked) if walked else 0
+
+        return {
+            "path": path,
+            "total": totals[path][0],
+            "partial": bool(missing),
+            "estimated_total": int(totals[path][0] + unscanned_bytes + unscanned_unknown * average),
+            "dirs_scanned": len(walked) - reused,
+            "dirs_reused": reused,
+            "dirs_unscanned": len(missing),
+            "errors": errors,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def _sum_totals(self, root: str, walked: dict) -> tuple:
+        """
+        Add up subtree sizes bottom-up (iteratively, so deep trees are fine).
+        Returns ({path: (total, complete)}, [subdirectories the walk did not reach]).
+        Totals of complete subtrees are remembered for estimating later partial walks.
+        """
+        totals, missing = {}, []
+        stack = [(root, False)]
+        while stack:
+            dir_path, children_done = stack.pop()
+            entry = walked.get(dir_path)
+            if entry is None:
+                missing.append(dir_path)
+                totals[dir_path] = (0, False)
+                continue
+            if not children_done:
+                stack.append((dir_path, True))
+                stack.extend((sub, False) for sub in entry.subdirs)
+                continue
+            total, complete = entry.own_bytes, True
+            for sub in entry.subdirs:
+                sub_total, sub_complete = totals[sub]
+                total += sub_total
+                complete = complete and sub_complete
+            totals[dir_path] = (total, complete)
+            if complete:
+                self._totals[dir_path] = total
+        return totals, missing
+
+    def largest_children(self, path: str, n: int = TOP_CHILDREN) -> list:
+        """
+        The n largest files and subdirectories directly inside 'path', as (bytes, name, is_dir),
+        from the index alone. Call measure() first; subdirectories not measured yet are left out.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return []
+        children = [(size, name, False) for size, name in entry.top_files]
+        children += [(self._totals[sub], os.path.basename(sub), True) for sub in entry.subdirs if sub in self._totals]
+        return heapq.nlargest(n, children)
+
+def format_size_report(result: dict, children: list) -> str:
+    """du -sh style line for a measure() result, followed by the largest children."""
+    if result["partial"]:
+        lines = [f"~{format_bytes(result['estimated_total'])}\t{result['path']} "
+                 f"(estimate: time budget reached after {result['seconds']}s; at least {format_bytes(result['total'])} "
+                 f"counted, {result['dirs_unscanned']} directories not reached yet - ask again to continue)"]
+    else:
+        lines = [f"{format_bytes(result['total'])}\t{result['path']}"]
+    if result["errors"]:
+        lines.append(f"({result['errors']} directories could not be read)")
+    if children:
+        lines.append("Largest items:")
+        lines.extend(f"  {format_bytes(size):>8}  {name}{'/' if is_dir else ''}" for size, name, is_dir in children)
+    return "\n".join(lines)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_dir_size_index() -> DirSizeIndex:
+    """Return the process-wide directory-size index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DirSizeIndex()
+        return _index
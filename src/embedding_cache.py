@@ -0,0 +1,237 @@
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+
+# --- CONFIGURATION ---
+CACHE_PATH = os.path.join("db", "embedding_cache.sqlite")
+MAX_ENTRIES = 250000 # ~750 MB of 768-dim float32 vectors
+SQLITE_MAX_VARIABLES = 900 # Stay below SQLite's default bound-parameter limit
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text, used as its cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache backed by SQLite.
+
+    Vectors are keyed by (model name, text hash), so any text that was embedded once
+    (by ingest.py or by a query) is never sent through the same model again.
+    The cache holds at most 'max_entries' vectors; the least recently used are evicted first.
+    Safe to share between threads.
+    """
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_name: str, text_hashes: list) -> dict:
+        """
+        Look up vectors by text hash. Returns {text_hash: vector} for the hashes found
+        and marks them as recently used.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(text_hashes), SQLITE_MAX_VARIABLES):
+                batch = text_hashes[i:i + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array.array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash IN ({placeholders})",
+                        [now, model_name, *batch],
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(text_hashes)) - len(found)
+        return found
+
+    def put_many(self, model_name: str, text_hashes: list, vectors: list):
+        """Store vectors and evict the least recently used entries if the cache is over its size cap."""
+        now = time.time()
+        rows = [(model_name, text_hash, array.array("f", vector).tobytes(), now)
+                for text_hash, vector in zip(text_hashes, vectors)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss statistics for this process and the number of cached vectors."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._count,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (f"{stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} vectors cached")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbedder:
+    """
+    Wraps an embedding model so that every encode() call consults the EmbeddingCache first.
+
+    The model itself is only created (via 'load_model') the first time a text misses the
+    cache, so runs whose texts are all cached never pay the model's startup cost.
+
+    :param model_name: Name of the model, part of the cache key.
+    :param load_model: Zero-argument callable returning an object with a SentenceTransformer-style encode().
+    :param cache: The EmbeddingCache to use.
+    """
+    def __init__(self, model_name: str, load_model, cache: EmbeddingCache):
+        self.model_name = model_name
+        self.cache = cache
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def encode(self, texts, **kwargs):
+        """
+        Embed a string or a list of strings, returning a vector or a list of vectors (as lists of floats).
+        Extra keyword arguments are passed to the model's encode() on a cache miss.
+        """
+        if isinstance(texts, str):
+            return self.encode([texts], **kwargs)[0]
+
+        text_hashes = [hash_text(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, text_hashes)
+
+        # Embed each distinct missing text once, even if it appears several times in the batch.
+        missing = {}
+        for text_hash, text in zip(text_hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        if missing:
+            kwargs.setdefault("show_progress_bar", False)
+            vectors = self.model.encode(list(missing.values()), **kwargs)
+            vectors = vectors.tolist() if hasattr(vectors, "tolist") else [list(vector) for vector in vectors]
+            self.cache.put_many(self.model_name, list(missing.keys()), vectors)
+            cached.update(zip(missing.keys(), vectors))
+
+        return [cached[text_hash] for text_hash in text_hashes]
+
+class MicroBatchEmbedder:
+    """
+    Wraps an embedder (e.g. a CachedEmbedder) shared by many threads, such as the request
+    handlers of ark_server.py: texts submitted by concurrent encode() calls within a short window
+    are embedded together in a single call to the wrapped embedder.
+
+    :param embedder: Object with an encode(list of str) method returning a list of vectors.
+    :param max_batch_size: Most texts embedded in one call.
+    :param window_ms: How long the first waiting text may wait for others to join its batch.
+    """
+    def __init__(self, embedder, max_batch_size: int = 64, window_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self._queue = [] # [text, event, result or exception]
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="ark-embed-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def cache(self):
+        return self.embedder.cache
+
+    @property
+    def model(self):
+        return self.embedder.model
+
+    def encode(self, texts, **kwargs):
+        """Embed a string or a list of strings, joining the next batch. Keyword arguments are ignored."""
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        requests = [[text, threading.Event(), None] for text in texts]
+        with self._condition:
+            self._queue.extend(requests)
+            self._condition.notify()
+        results = []
+        for request in requests:
+            request[1].wait()
+            if isinstance(request[2], BaseException):
+                raise request[2]
+            results.append(request[2])
+        return results
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                # Give concurrent callers a moment to add their texts to this batch.
+                deadline = time.monotonic() + self.window
+                while len(self._queue) < self.max_batch_size and time.monotonic() < deadline:
+                    self._condition.wait(deadline - time.monotonic())
+                batch = self._queue[:self.max_batch_size]
+                del self._queue[:self.max_batch_size]
+            try:
+                vectors = self.embedder.encode([text for text, _, _ in batch])
+            except Exception as e:
+                vectors = [e] * len(batch)
+            self.batches += 1
+            self.texts += len(batch)
+            for request, vector in zip(batch, vectors):
+                request[2] = vector
+                request[1].set()
+
+    def report(self) -> str:
+        average = self.texts / self.batches if self.batches else 0.0
+        return f"{self.texts} texts in {self.batches} encode calls ({average:.1f} per call)"
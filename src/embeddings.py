@@ -0,0 +1,95 @@
+import os
+import importlib.util
+
+# --- CONFIGURATION ---
+# Defaults can be overridden with environment variables so ingest.py and the query side
+# (ask_ark.py, run_agent.py) always pick the same backend on a given machine.
+EMBEDDING_MODEL_NAME = os.getenv("ARK_EMBEDDING_MODEL", "all-mpnet-base-v2")
+EMBEDDING_DEVICE = os.getenv("ARK_EMBEDDING_DEVICE", "auto")     # auto, cuda, mps or cpu
+EMBEDDING_RUNTIME = os.getenv("ARK_EMBEDDING_RUNTIME", "auto")   # auto, torch, torch-int8, onnx or onnx-int8
+EMBEDDING_THREADS = int(os.getenv("ARK_EMBEDDING_THREADS", "0")) # Intra-op threads on CPU, 0 = library default
+
+RUNTIMES = ["torch", "torch-int8", "onnx", "onnx-int8"]
+# Batch sizes passed to encode(): large batches keep a GPU busy, small ones suit CPU caches.
+DEFAULT_BATCH_SIZES = {"cuda": 64, "mps": 32, "cpu": 16}
+# Quantized ONNX export shipped with the sentence-transformers models on the Hugging Face Hub.
+ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+def detect_device() -> str:
+    """Return the best available torch device: 'cuda', then 'mps', then 'cpu'."""
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+class EmbeddingBackend:
+    """
+    Device- and runtime-aware wrapper around a SentenceTransformer model, shared by ingest and query.
+
+    On a GPU the model runs in float32 with torch. On CPU it can run through ONNX Runtime
+    ('onnx', requires the 'optimum' package), an int8-quantized ONNX export ('onnx-int8') or
+    torch dynamic int8 quantization ('torch-int8'); 'auto' uses ONNX when available.
+    Quantized runtimes produce slightly different vectors, so they get their own cache key.
+
+    :param model_name: SentenceTransformer model to load.
+    :param device: 'auto' or an explicit torch device.
+    :param runtime: One of RUNTIMES, or 'auto'.
+    :param threads: Intra-op threads used on CPU (by torch or ONNX Runtime), 0 for the library default.
+    :param batch_size: Batch size passed to encode(), None for a per-device default.
+    """
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, device: str = EMBEDDING_DEVICE,
+                 runtime: str = EMBEDDING_RUNTIME, threads: int = EMBEDDING_THREADS, batch_size: int = None):
+        self.model_name = model_name
+        self.device = detect_device() if device == "auto" else device
+        if runtime == "auto":
+            runtime = "onnx" if self.device == "cpu" and importlib.util.find_spec("optimum") else "torch"
+        if runtime not in RUNTIMES:
+            raise ValueError(f"Unknown embedding runtime '{runtime}'. Choose one of: {', '.join(RUNTIMES)}")
+        if runtime != "torch" and self.device != "cpu":
+            raise ValueError(f"Embedding runtime '{runtime}' is only supported on CPU, not '{self.device}'")
+        self.runtime = runtime
+        self.threads = threads
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZES.get(self.device, 16)
+        self._model = None
+
+    @property
+    def cache_key(self) -> str:
+        """Name under which this backend's vectors are cached; float32 runtimes share the plain model name."""
+        return self.model_name if self.runtime in ("torch", "onnx") else f"{self.model_name}:{self.runtime}"
+
+    def describe(self) -> str:
+        threads = f", {self.threads} threads" if self.device == "cpu" and self.threads else ""
+        return f"'{self.model_name}' on {self.device} ({self.runtime}{threads}, batch size {self.batch_size})"
+
+    def load(self):
+        """Load the model (once) and return the backend itself, ready for encode()."""
+        if self._model is not None:
+            return self
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.device == "cpu" and self.threads:
+            torch.set_num_threads(self.threads)
+
+        if self.runtime in ("onnx", "onnx-int8"):
+            # ONNX Runtime has its own thread pool and ignores torch's thread count.
+            model_kwargs = {"file_name": ONNX_INT8_FILE} if self.runtime == "onnx-int8" else {}
+            if self.threads:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = self.threads
+                model_kwargs["session_options"] = session_options
+            self._model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        else:
+            model = SentenceTransformer(self.model_name, device=self.device)
+            if self.runtime == "torch-int8":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._model = model
+        return self
+
+    def encode(self, texts, **kwargs):
+        """Embed texts with the backend's batch size; accepts the same keyword arguments as SentenceTransformer.encode()."""
+        kwargs.setdefault("batch_size", self.batch_size)
+        return self.load()._model.encode(texts, **kwargs)
@@ -0,0 +1,342 @@
+import os
+import re
+import mmap
+import stat
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from system_metrics import format_bytes
+
+# --- CONFIGURATION ---
+DEFAULT_WINDOW_BYTES = 4000 # What a plain read returns, as before
+MAX_WINDOW_BYTES = 16000 # Upper bound of any window handed back to the agent
+LINE_INDEX_BLOCK = 65536 # Bytes per line-index block; a line lookup scans at most one block
+MAX_OPEN_FILES = 8 # Mapped files (and their line indexes) kept between calls
+SNIFF_BYTES = 8192 # Bytes inspected to decide whether a file is binary
+MAX_CONTROL_RATIO = 0.1 # Share of control bytes above which undecodable content counts as binary
+MAX_SEARCH_MATCHES = 50
+MAX_MATCH_LINE_CHARS = 300 # Long matching lines (minified files, JSON logs) are cut to this
+
+# Leading bytes of common binary formats, to name them in the error message.
+MAGIC_NUMBERS = [
+    (b"%PDF", "PDF document"),
+    (b"\x89PNG", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"GIF8", "GIF image"),
+    (b"\x7fELF", "ELF executable"),
+    (b"PK\x03\x04", "ZIP archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"SQLite format 3\x00", "SQLite database"),
+]
+READ_OPTIONS = ("offset", "length", "lines", "search", "context")
+_TEXT_CONTROLS = set(b"\t\n\r\f\b\x1b")
+
+def sniff_binary(sample: bytes):
+    """
+    Decide from a file's first bytes whether it is binary. Returns None for text, or a short
+    description of the content ("PNG image", "binary data") otherwise.
+    NUL bytes and known magic numbers mean binary; UTF-8 text is accepted as is (a multi-byte
+    character cut at the end of the sample is fine); anything else is binary when more than
+    MAX_CONTROL_RATIO of it are control bytes, so Latin-1 text still reads.
+    """
+    for magic, kind in MAGIC_NUMBERS:
+        if sample.startswith(magic):
+            return kind
+    if b"\x00" in sample:
+        return "binary data"
+    try:
+        sample.decode("utf-8")
+        return None
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+            return None
+    controls = sum(1 for byte in sample if byte < 32 and byte not in _TEXT_CONTROLS)
+    return "binary data" if controls > len(sample) * MAX_CONTROL_RATIO else None
+
+def parse_read_request(text: str):
+    """
+    Split an agent's read_file input into the path and its options, e.g.
+    '~/logs/app.log | lines=120-180' -> ('~/logs/app.log', {'lines': '120-180'}).
+    A ' | ' that does not start a known option belongs to the previous value, so a search
+    pattern may contain one.
+    """
+    parts = text.split(" | ")
+    path, options, key = parts[0].strip(), {}, None
+    for part in parts[1:]:
+        name, _, value = part.partition("=")
+        if name.strip() in READ_OPTIONS and _:
+            key = name.strip()
+            options[key] = value.strip()
+        elif key is not None:
+            options[key] += " | " + part
+        else:
+            path += " | " + part
+    return path, options
+
+def parse_line_range(value: str, line_count: int):
+    """'120-180' -> (120, 180); '120' -> (120, None); '-50' -> the last 50 lines. Lines are 1-based."""
+    value = value.replace(" ", "")
+    if value.startswith("-"):
+        return max(1, line_count - int(value[1:]) + 1), line_count
+    start, _, end = value.partition("-")
+    return max(1, int(start)), int(end) if end else None
+
+class MappedFile:
+    """
+    A read-only memory map of one file with a block-level line index.
+
+    The index stores, for every LINE_INDEX_BLOCK bytes, how many newlines precede the block.
+    Building it is one pass of bytes.count over the file; afterwards finding a line scans at
+    most one block, so reading a window of a multi-GB log costs O(window), not O(offset).
+    """
+    def __init__(self, path: str, st: os.stat_result):
+        self.path = path
+        self.key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        self.size = st.st_size
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._block_lines = None
+        self._newlines = 0
+        self._index_lock = threading.Lock()
+        # Readers holding the map; a retired map (evicted or stale) is closed when the last one releases it.
+        self._readers = 0
+        self._retired = False
+        self._ref_lock = threading.Lock()
+
+    def acquire(self):
+        with self._ref_lock:
+            self._readers += 1
+
+    def release(self):
+        with self._ref_lock:
+            self._readers -= 1
+            close = self._retired and self._readers == 0
+        if close:
+            self.close()
+
+    def retire(self):
+        """Close the map as soon as no reader holds it."""
+        with self._ref_lock:
+            self._retired = True
+            close = self._readers == 0
+        if close:
+            self.close()
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+
+    def _index(self):
+        if self._block_lines is None:
+            with self._index_lock:
+                if self._block_lines is None:
+                    blocks, total = array("Q"), 0
+                    for start in range(0, self.size, LINE_INDEX_BLOCK):
+                        blocks.append(total)
+                        total += self.mm[start:start + LINE_INDEX_BLOCK].count(b"\n")
+                    self._newlines = total
+                    self._block_lines = blocks
+        return self._block_lines
+
+    @property
+    def line_count(self) -> int:
+        self._index()
+        return self._newlines + (1 if self.size and self.mm[self.size - 1:self.size] != b"\n" else 0)
+
+    def line_start(self, line: int) -> int:
+        """Byte offset where 0-based 'line' starts (the file size past the last line)."""
+        blocks = self._index()
+        if line <= 0:
+            return 0
+        if line > self._newlines:
+            return self.size
+        # The line starts after newline number 'line', which lies in the last block preceded by fewer newlines.
+        block = bisect.bisect_right(blocks, line - 1) - 1
+        position = block * LINE_INDEX_BLOCK
+        for _ in range(line - blocks[block]):
+            position = self.mm.find(b"\n", position) + 1
+        return position
+
+    def line_of(self, offset: int) -> int:
+        """0-based line containing byte 'offset'."""
+        blocks = self._index()
+        block = min(offset // LINE_INDEX_BLOCK, len(blocks) - 1)
+        start = block * LINE_INDEX_BLOCK
+        return blocks[block] + self.mm[start:offset].count(b"\n")
+
+    def read(self, offset: int, length: int) -> str:
+        return self.mm[offset:offset + length].decode("utf-8", errors="ignore")
+
+    def read_lines(self, first: int, last: int, max_bytes: int = MAX_WINDOW_BYTES):
+        """
+        Return [(line number, text)] for the 1-based lines first..last (inclusive), stopping
+        early at max_bytes, and the number of the last line returned.
+        """
+        start, end = self.line_start(first - 1), self.line_start(last)
+        text = self.mm[start:min(end, start + max_bytes)].decode("utf-8", errors="ignore")
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines.pop()
+        elif end > start + max_bytes and len(lines) > 1:
+            lines.pop() # Cut off in the middle; it is read in full by the next window
+        numbered = list(enumerate(lines, start=first))
+        return numbered, numbered[-1][0] if numbered else first - 1
+
+    def search(self, pattern: str, start: int = 0, end: int = None, context: int = 0,
+               max_matches: int = MAX_SEARCH_MATCHES):
+        """
+        Regex search over the mapped bytes. Returns ([(line number, text)] of the matching lines
+        and their context lines, in order, and the number of matching lines found, which is
+        capped at max_matches + 1 to tell that there are more).
+        """
+        regex = re.compile(pattern.encode("utf-8"), re.MULTILINE)
+        matched, last_line = [], -1
+        for match in regex.finditer(self.mm, start, self.size if end is None else end):
+            line = self.line_of(match.start())
+            if line == last_line:
+                continue
+            last_line = line
+            matched.append(line)
+            if len(matched) > max_matches:
+                break
+        wanted = sorted({n for line in matched[:max_matches]
+                         for n in range(max(0, line - context), line + context + 1)})
+        lines = []
+        for line in wanted:
+            line_start = self.line_start(line)
+            if line_start >= self.size:
+                break
+            line_end = self.mm.find(b"\n", line_start)
+            line_end = self.size if line_end < 0 else line_end
+            text = self.mm[line_start:min(line_end, line_start + MAX_MATCH_LINE_CHARS * 4)].decode("utf-8", errors="ignore")
+            lines.append((line + 1, text[:MAX_MATCH_LINE_CHARS]))
+        return lines, len(matched)
+
+class FileWindowCache:
+    """
+    The most recently read files, kept mapped with their line indexes so that paging through a
+    file or searching it again does not re-scan it. A file is re-mapped when its size or mtime
+    changed (e.g. a log that was appended to).
+
+    open() hands out a file for the duration of a 'with' block. Evicted or outdated files are
+    only unmapped once every thread reading them has left its block.
+    """
+    def __init__(self, max_files: int = MAX_OPEN_FILES):
+        self.max_files = max_files
+        self._files = OrderedDict() # path -> MappedFile, least recently used first
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, path: str):
+        st = os.stat(path)
+        if stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise OSError(f"'{path}' is not a regular file.")
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            mapped = self._files.get(path)
+            if mapped is not None and mapped.key == key:
+                self._files.move_to_end(path)
+                mapped.acquire() # Under the cache lock, so it cannot be retired in between
+            else:
+                mapped = None
+        if mapped is None:
+            mapped = MappedFile(path, st)
+            retired = []
+            with self._lock:
+                mapped.acquire()
+                stale = self._files.pop(path, None)
+                if stale is not None:
+                    retired.append(stale)
+                self._files[path] = mapped
+                while len(self._files) > self.max_files:
+                    retired.append(self._files.popitem(last=False)[1])
+            for old in retired:
+                old.retire()
+        try:
+            yield mapped
+        finally:
+            mapped.release()
+
+def _numbered(lines: list) -> str:
+    width = len(str(lines[-1][0])) if lines else 1
+    return "\n".join(f"{number:>{width}}| {text}" for number, text in lines)
+
+def read_window(path: str, offset: int = None, length: int = None, lines: str = None,
+                search: str = None, context: int = 0, cache: FileWindowCache = None) -> str:
+    """
+    Read part of a text file for the agent:
+    - by bytes: offset (default 0) and length (default DEFAULT_WINDOW_BYTES);
+    - by lines: lines='120-180', '120' (a window from line 120) or '-50' (the last 50 lines);
+    - by regex: search='pattern', with 'context' lines around each match, optionally limited
+      to the given line range.
+    Every answer starts with a header saying which part of the file it is, and ends with a
+    hint on how to read on when it was cut short.
+    """
+    with (cache or get_file_window_cache()).open(path) as mapped:
+        return _read_mapped(mapped, path, offset, length, lines, search, context)
+
+def _read_mapped(mapped: MappedFile, path: str, offset, length, lines, search, context) -> str:
+    if mapped.size == 0:
+        return "File is empty."
+    kind = sniff_binary(mapped.mm[:SNIFF_BYTES])
+    if kind:
+        raise ValueError(f"It appears to be a binary file ({kind}).")
+    name = os.path.basename(path)
+    length = min(int(length), MAX_WINDOW_BYTES) if length else None
+
+    if search:
+        start, end, scope = 0, None, ""
+        if lines:
+            first, last = parse_line_range(lines, mapped.line_count)
+            start, end = mapped.line_start(first - 1), mapped.line_start(last) if last else None
+            scope = f" in lines {first}-{last or mapped.line_count}"
+        found, count = mapped.search(search, start, end, int(context or 0))
+        if not found:
+            return f"[{name}: no match for /{search}/{scope}]"
+        more = count > MAX_SEARCH_MATCHES
+        header = f"[{name}: {min(count, MAX_SEARCH_MATCHES)}{'+' if more else ''} matching lines for /{search}/{scope}]"
+        footer = "\n[... more matches; narrow the pattern or add 'lines=' to search a range]" if more else ""
+        return f"{header}\n{_numbered(found)}{footer}"
+
+    if lines:
+        line_count = mapped.line_count
+        first, last = parse_line_range(lines, line_count)
+        if first > line_count:
+            return f"[{name}: has only {line_count} lines]"
+        # An explicit range may fill the largest window; an open-ended one gets the default.
+        max_bytes = length or (MAX_WINDOW_BYTES if last else DEFAULT_WINDOW_BYTES)
+        last = min(last or line_count, line_count)
+        numbered, shown_last = mapped.read_lines(first, last, max_bytes)
+        header = f"[{name}: lines {first}-{shown_last} of {line_count}]"
+        footer = f"\n[... continue with 'lines={shown_last + 1}-{last}']" if shown_last < last else ""
+        return f"{header}\n{_numbered(numbered)}{footer}"
+
+    offset = max(0, int(offset or 0))
+    length = length or DEFAULT_WINDOW_BYTES
+    if offset >= mapped.size:
+        return f"[{name}: offset {offset} is past the end of the file ({mapped.size} bytes)]"
+    content = mapped.read(offset, length)
+    end = min(offset + length, mapped.size)
+    if offset == 0 and end == mapped.size:
+        return content # The whole file fits; no header needed
+    header = f"[{name}: bytes {offset}-{end} of {mapped.size} ({format_bytes(mapped.size)})]"
+    footer = (f"\n[... continue with 'offset={end}', jump with 'lines=', or find text with 'search=']"
+              if end < mapped.size else "")
+    return f"{header}\n{content}{footer}"
+
+# Global instance, created on first use by get_file_window_cache()
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_file_window_cache() -> FileWindowCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FileWindowCache()
+    return _cache
@@ -1,129 +1,308 @@
 import os
 import time
 import argparse
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import chromadb
 
+from embedding_cache import EmbeddingCache, CachedEmbedder
+from embeddings import EmbeddingBackend, RUNTIMES, EMBEDDING_MODEL_NAME, EMBEDDING_DEVICE, EMBEDDING_RUNTIME, EMBEDDING_THREADS
+from common import path_prefix_metadata
+from lexical_index import LexicalIndex
+from tracing import span
+from manifest import IngestManifest, hash_file, make_chunk_id
+from loaders import walk_files, get_loader, POOLED_LOADERS
+from parse_pool import ParsePool, ParseCache, ParseError, PARSE_CACHE_PATH, DEFAULT_PARSE_WORKERS, DEFAULT_PARSE_TIMEOUT
+from shards import ShardCatalog, ShardLayout, ShardedCollection, SHARD_CATALOG_FILE, SHARD_STRATEGIES, DEFAULT_HASH_SHARDS
+from splitters import LanguageAwareSplitter, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP
+from ingest_pipeline import (
+    IngestPipeline,
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_LOADER_THREADS,
+    DEFAULT_EMBED_BATCH_SIZE,
+    DEFAULT_WRITE_BATCH_SIZE,
+)
+
 # --- CONFIGURATION ---
 # We no longer hardcode paths here, they will come from command-line arguments.
 DB_PATH = "db"
-EMBEDDING_MODEL_NAME = "all-mpnet-base-v2"
+EMBEDDING_CACHE_PATH = os.path.join(DB_PATH, "embedding_cache.sqlite")
+DELETE_BATCH_SIZE = 500 # The number of stale chunks to delete in each batch
+
+def load_file(path: str, file_hash: str = None, parse_pool: ParsePool = None):
+    """
+    Load a single file as one document using the loader registered for its type.
+    Heavy formats (PDFs, images) go through 'parse_pool', when given, which parses them in
+    worker processes and caches the result by 'file_hash'.
+    Returns None if the file cannot be parsed.
+    """
+    loader = get_loader(path)
+    try:
+        if parse_pool is not None and loader in POOLED_LOADERS:
+            document = parse_pool.load(path, file_hash)
+        else:
+            document = loader(path)
+    except ParseError as e:
+        print(f"  - Warning: could not parse '{path}': {e}")
+        return None
+    except Exception as e:
+        print(f"  - Warning: could not load '{path}': {e}")
+        return None
+    if document is not None:
+        # Indexed directory prefixes let delete_from_ark.py select chunks with a metadata filter.
+        document.metadata.update(path_prefix_metadata(path))
+    return document
+
+def delete_ids(collection, lexical_index, ids: list, source: str = None):
+    """
+    Delete chunks by ID in batches, from both the collection and its lexical index.
+    If all the chunks come from 'source', a sharded collection only deletes from its shard.
+    """
+    if source is not None and isinstance(collection, ShardedCollection):
+        collection = collection.for_source(source)
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        if collection is not None:
+            collection.delete(ids=ids[i:i + DELETE_BATCH_SIZE])
+        lexical_index.delete(ids[i:i + DELETE_BATCH_SIZE])
 
-def main(data_path: str, collection_name: str):
+def main(data_path: str, collection_name: str, incremental: bool = False,
+         ignore_patterns: list = None, use_gitignore: bool = True,
+         device: str = EMBEDDING_DEVICE, runtime: str = EMBEDDING_RUNTIME, threads: int = EMBEDDING_THREADS,
+         queue_depth: int = DEFAULT_QUEUE_DEPTH, loader_threads: int = DEFAULT_LOADER_THREADS,
+         embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE, write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+         parse_workers: int = DEFAULT_PARSE_WORKERS, parse_timeout: float = DEFAULT_PARSE_TIMEOUT,
+         retry_parse_failures: bool = False, shard_by: str = None, shards: int = DEFAULT_HASH_SHARDS):
     """
     Main function to handle the ingestion process for a given path and collection.
+    Files are streamed through a bounded load -> split -> embed -> write pipeline,
+    so memory use does not depend on the size of the tree being ingested.
 
     :param data_path: Path to the directory containing data to ingest.
     :param collection_name: Name of the ChromaDB collection to use.
+    :param incremental: Only embed new or changed files, based on the collection's manifest.
+    :param ignore_patterns: File and directory names (glob patterns) to skip. Defaults to DEFAULT_IGNORE_PATTERNS.
+    :param use_gitignore: Also skip files excluded by .gitignore files in the tree.
+    :param device: Device for the embedding model ('auto', 'cuda', 'mps' or 'cpu').
+    :param runtime: Embedding runtime ('auto' or one of embeddings.RUNTIMES).
+    :param threads: Intra-op threads for the embedding model on CPU, 0 for the default.
+    :param queue_depth: Max number of items buffered between two pipeline stages.
+    :param loader_threads: Number of files parsed concurrently.
+    :param embed_batch_size: Number of chunks per embedding model call.
+    :param write_batch_size: Number of chunks per collection write.
+    :param parse_workers: Worker processes parsing PDFs and images.
+    :param parse_timeout: Seconds before parsing a single PDF or image is abandoned.
+    :param retry_parse_failures: Parse files again whose earlier failure is in the parse cache.
+    :param shard_by: Split a new collection into physical collections by 'directory' or 'hash'
+                     (see shards.py). A sharded collection keeps its layout on later ingests.
+    :param shards: Number of shards for shard_by='hash'.
+    :return: Summary of the run (files seen/processed/removed, chunks written, seconds), or None on error.
     """
     print(f"--- Starting ARK Knowledge Ingestion for collection: '{collection_name}' ---")
+    start_time = time.time()
 
-    # --- 1. Load Documents ---
-    print(f"Step 1: Loading documents from '{data_path}'...")
+    # --- 1. Scan Files ---
+    print(f"Step 1: Scanning '{data_path}' and comparing files against the ingestion manifest...")
     if not os.path.exists(data_path):
         print(f"Error: Data path '{data_path}' not found.")
         return
+    data_root = os.path.abspath(data_path)
+    manifest = IngestManifest(collection_name)
 
-    # Define a list of file extensions that are likely to contain useful text.
-    # Add or remove extensions based on your project's needs.
-    # This list now includes source code, markup, and Verilog/SystemVerilog files.
-    included_extensions = [
-        "*.txt", "*.md", "*.rst",          # Documentation
-        "*.py", "*.js", "*.html", "*.css",  # Web & Python
-        "*.c", "*.h", "*.cpp", "*.hpp",     # C/C++
-        "*.v", "*.sv", "*.svh",             # Verilog/SystemVerilog
-        "*.pdf", "*.png", "*.jpg",          # Documents & Images (with Tesseract)
-        "Makefile", "*.sh", "*.yml", "*.toml" # Config & Scripts
-    ]
-
-    documents = []
-    print("Scanning for relevant file types...")
-    # Loop through each extension and load the files
-    for ext in included_extensions:
-        try:
-            loader = DirectoryLoader(
-                data_path,
-                glob=f"**/{ext}",
-                recursive=True,
-                show_progress=True,
-                use_multithreading=True,
-                silent_errors=True, # Suppress warnings for individual broken files 
-                loader_cls=lambda p: UnstructuredFileLoader(p, mode="single", strategy="fast"),
-            )
-            documents.extend(loader.load())
-        except Exception as e:
-            print(f"Error loading files with extension {ext}: {e}")
+    # A single walk of the tree; only files with a registered loader are returned.
+    files = []
+    to_process = []
+    for path, stat in walk_files(data_root, ignore_patterns=ignore_patterns, use_gitignore=use_gitignore):
+        files.append(path)
+        if incremental and manifest.is_unchanged(path, stat):
             continue
+        to_process.append({"path": path, "stat": stat})
+
+    current = set(files)
+    removed = [source for source in manifest.sources_under(data_root) if source not in current]
+    print(f"Found {len(files)} candidate files: {len(to_process)} new or changed (by size/mtime), {len(files) - len(to_process)} unchanged, {len(removed)} removed.")
 
-    if not documents:
-        print("No documents found to ingest. Exiting.")
+    # --- 2. Initialize Vector Database ---
+    print(f"Step 2: Initializing vector database at '{DB_PATH}'...")
+    client = chromadb.PersistentClient(path=DB_PATH)
+
+    # The shard catalog maps the logical collection name to its physical collections.
+    catalog = ShardCatalog(os.path.join(DB_PATH, SHARD_CATALOG_FILE))
+    layout = catalog.get(collection_name)
+    if layout is None and shard_by:
+        if manifest.files:
+            print(f"Error: Collection '{collection_name}' already holds unsharded data. "
+                  "Delete it or ingest into a new collection to shard it.")
+            return
+        try:
+            layout = ShardLayout(collection_name, shard_by, count=shards, root=data_root)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    elif layout is not None and shard_by and (layout.strategy, layout.count) != (shard_by, shards if shard_by == "hash" else None):
+        print(f"Error: Collection '{collection_name}' is already sharded by {layout.describe()}; its layout cannot change.")
         return
-    print(f"Successfully loaded {len(documents)} documents.")
 
-    # --- 2. Split Documents into Chunks ---
-    print("Step 2: Splitting documents into smaller chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1200,
-        chunk_overlap=200
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Documents split into {len(chunks)} chunks.")
+    if layout is None:
+        # Now using the collection name passed as an argument
+        collection = client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+    else:
+        collection = ShardedCollection(client, layout, create=True)
+        catalog.put(layout)
+        catalog.save()
+    # The BM25 index used for hybrid retrieval is kept next to the collection.
+    lexical_index = LexicalIndex(collection_name, os.path.join(DB_PATH, "lexical"))
+    print(f"Collection '{collection_name}' is ready" + (f", sharded by {layout.describe()}." if layout else "."))
 
-    # --- 3. Initialize Embedding Model ---
-    print(f"Step 3: Initializing embedding model '{EMBEDDING_MODEL_NAME}'...")
-    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device='cuda')
-    print("Embedding model loaded onto GPU.")
+    # --- 3. Delete Chunks of Removed Files ---
+    stale = {source: manifest.forget(source) for source in removed}
+    stale_count = sum(len(ids) for ids in stale.values())
+    if stale_count:
+        print(f"Step 3: Deleting {stale_count} chunks of removed files...")
+        for source, ids in stale.items():
+            delete_ids(collection, lexical_index, ids, source)
 
-    # --- 4. Initialize Vector Database ---
-    print(f"Step 4: Initializing vector database at '{DB_PATH}'...")
-    client = chromadb.PersistentClient(path=DB_PATH)
+    if not to_process:
+        manifest.save()
+        lexical_index.close()
+        print("\nNothing new to ingest.")
+        print(f"--- ARK Knowledge Ingestion for '{collection_name}' Finished ---")
+        return {"files": len(files), "files_processed": 0, "files_removed": len(removed),
+                "chunks_written": 0, "seconds": time.time() - start_time}
 
-    # Now using the collection name passed as an argument
-    collection = client.get_or_create_collection(
-        name=collection_name,
-        metadata={"hnsw:space": "cosine"}
-    )
-    print(f"Collection '{collection_name}' is ready.")
+    # --- 4. Initialize Embedding Model ---
+    # Embeddings are looked up in the shared cache first; the model is only loaded on the first miss.
+    backend = EmbeddingBackend(EMBEDDING_MODEL_NAME, device=device, runtime=runtime, threads=threads)
+    print(f"Step 4: Preparing embedding model {backend.describe()} with cache at '{EMBEDDING_CACHE_PATH}'...")
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
 
-    # --- 5. Generate Embeddings and Ingest into DB ---
-    print("Step 5: Generating embeddings and ingesting into the database...")
-    start_time = time.time()
+    def load_embedding_model():
+        backend.load()
+        print(f"Embedding model loaded on {backend.device}.")
+        return backend
+
+    embedding_model = CachedEmbedder(backend.cache_key, load_embedding_model, embedding_cache)
+
+    # --- 5. Stream Files Through the Pipeline ---
+    print("Step 5: Loading, splitting, embedding and ingesting documents...")
+    # Code and documentation are cut at function/module/section boundaries (see splitters.py);
+    # every chunk records its start_index, which lets retrieval merge neighbouring chunks.
+    text_splitter = LanguageAwareSplitter(chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP)
 
-    # Ingest in batches
-    batch_size = 100
-    total_chunks = len(chunks)
-    for i in range(0, total_chunks, batch_size):
-        batch = chunks[i:i+batch_size]
+    def load(item):
+        path = item["path"]
+        with span("ingest.load", path=path) as load_span:
+            try:
+                item["hash"] = hash_file(path)
+            except OSError as e:
+                print(f"  - Warning: could not read '{path}': {e}")
+                return None
+            if incremental and manifest.get_hash(path) == item["hash"]:
+                # Only the mtime changed; the content (and so the chunks) are the same.
+                manifest.touch(path, item["stat"])
+                load_span.set("unchanged", True)
+                return None
+            return load_file(path, item["hash"], parse_pool)
 
-        batch_texts = [doc.page_content for doc in batch]
+    def split(item, document):
+        with span("ingest.split", path=item["path"]) as split_span:
+            file_chunks = text_splitter.split_documents([document])
+            split_span.set("chunks", len(file_chunks))
+        return file_chunks, [make_chunk_id(item["path"], item["hash"], j) for j in range(len(file_chunks))]
+
+    def embed(texts):
+        with span("ingest.encode", texts=len(texts)):
+            return embedding_model.encode(texts)
+
+    def write(ids, embeddings, texts, metadatas):
+        # Upsert, so chunks re-written after an interrupted run simply overwrite themselves.
         # Langchain's loader adds 'source' to metadata, which is excellent for citation.
-        metadatas = [doc.metadata for doc in batch]
-        ids = [f"{collection_name}_{i+j}" for j in range(len(batch))]
+        with span("ingest.add", chunks=len(ids)):
+            collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+            lexical_index.upsert(ids, texts, metadatas)
+        print(f"  - Ingested {len(ids)} chunks ({pipeline.chunks_written + len(ids)} so far)")
 
-        embeddings = embedding_model.encode(batch_texts, show_progress_bar=False).tolist()
+    def file_done(item, ids):
+        # Drop chunks the previous version of this file had but the new one does not.
+        new_ids = set(ids)
+        delete_ids(collection, lexical_index, [chunk_id for chunk_id in manifest.get_chunk_ids(item["path"]) if chunk_id not in new_ids],
+                   item["path"])
+        manifest.record(item["path"], item["stat"], item["hash"], ids)
 
-        collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=batch_texts,
-            metadatas=metadatas
-        )
-        print(f"  - Ingested batch {i//batch_size + 1}/{(total_chunks + batch_size - 1)//batch_size}")
+    # PDFs and images are parsed in worker processes, started only if such a file comes up.
+    parse_pool = ParsePool(ParseCache(PARSE_CACHE_PATH), workers=parse_workers, timeout=parse_timeout,
+                           retry_failed=retry_parse_failures)
+
+    pipeline = IngestPipeline(
+        load, split, embed, write, on_file_done=file_done,
+        queue_depth=queue_depth, loader_threads=loader_threads,
+        embed_batch_size=embed_batch_size, write_batch_size=write_batch_size,
+    )
+    try:
+        pipeline.run(to_process)
+    finally:
+        # Save progress even if a stage failed; files that did not finish are retried next run.
+        if layout is not None:
+            catalog.put(layout) # Records shards created for new top-level directories
+            catalog.save()
+        manifest.save()
+        parse_pool.close()
 
     end_time = time.time()
-    print(f"\nIngestion complete. Took {end_time - start_time:.2f} seconds.")
+    print(f"\nPipeline throughput: {pipeline.report()}")
+    print(f"Embedding cache: {embedding_cache.report()}")
+    print(f"Parse cache: {parse_pool.cache.report()}, {parse_pool.parsed} files parsed; {parse_pool.failure_report()}")
+    parse_pool.cache.close()
+    embedding_cache.close()
+    print(f"Lexical index: {lexical_index.count()} chunks")
+    lexical_index.close()
+    print(f"Ingestion complete. Took {end_time - start_time:.2f} seconds.")
     print(f"Total documents in collection '{collection_name}': {collection.count()}")
     print(f"--- ARK Knowledge Ingestion for '{collection_name}' Finished ---")
+    return {"files": len(files), "files_processed": pipeline.files_loaded, "files_removed": len(removed),
+            "chunks_written": pipeline.chunks_written, "parse_failures": len(parse_pool.failures),
+            "seconds": end_time - start_time}
 
 if __name__ == "__main__":
     # Set up the command-line argument parser
     parser = argparse.ArgumentParser(description="Ingest data into ARK's knowledge base.")
     parser.add_argument("--path", type=str, required=True, help="The path to the directory of data to ingest.")
     parser.add_argument("--collection", type=str, required=True, help="The name of the ChromaDB collection to use.")
+    parser.add_argument("--incremental", action="store_true", help="Only embed new or changed files and drop chunks of removed files.")
+    parser.add_argument("--ignore", type=str, action="append", default=None, help="File or directory name pattern to skip (repeatable). Replaces the default ignore list.")
+    parser.add_argument("--no-gitignore", action="store_true", help="Do not honour .gitignore files in the tree.")
+    parser.add_argument("--device", type=str, default=EMBEDDING_DEVICE, help="Embedding device: auto, cuda, mps or cpu.")
+    parser.add_argument("--runtime", type=str, default=EMBEDDING_RUNTIME, choices=["auto"] + RUNTIMES, help="Embedding runtime; the int8 variants are CPU-only.")
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS, help="Intra-op threads for CPU embedding (0 = default).")
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH, help="Max items buffered between pipeline stages.")
+    parser.add_argument("--loader-threads", type=int, default=DEFAULT_LOADER_THREADS, help="Number of files parsed concurrently.")
+    parser.add_argument("--embed-batch-size", type=int, default=DEFAULT_EMBED_BATCH_SIZE, help="Chunks per embedding model call.")
+    parser.add_argument("--write-batch-size", type=int, default=DEFAULT_WRITE_BATCH_SIZE, help="Chunks per collection write.")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Worker processes parsing PDFs and images.")
+    parser.add_argument("--parse-timeout", type=float, default=DEFAULT_PARSE_TIMEOUT, help="Seconds before parsing one PDF or image is abandoned.")
+    parser.add_argument("--retry-parse-failures", action="store_true", help="Parse files again whose earlier failure is cached.")
+    parser.add_argument("--shard-by", type=str, default=None, choices=SHARD_STRATEGIES, help="Split a new collection into physical collections by top-level directory or by hash of the path.")
+    parser.add_argument("--shards", type=int, default=DEFAULT_HASH_SHARDS, help="Number of shards for --shard-by hash.")
 
     args = parser.parse_args()
 
     # Call the main function with the provided arguments
-    main(data_path=args.path, collection_name=args.collection)
+    main(
+        data_path=args.path,
+        collection_name=args.collection,
+        incremental=args.incremental,
+        ignore_patterns=args.ignore,
+        use_gitignore=not args.no_gitignore,
+        device=args.device,
+        runtime=args.runtime,
+        threads=args.threads,
+        queue_depth=args.queue_depth,
+        loader_threads=args.loader_threads,
+        embed_batch_size=args.embed_batch_size,
+        write_batch_size=args.write_batch_size,
+        parse_workers=args.parse_workers,
+        parse_timeout=args.parse_timeout,
+        retry_parse_failures=args.retry_parse_failures,
+        shard_by=args.shard_by,
+        shards=args.shards,
+    )
@@ -0,0 +1,204 @@
+import time
+import queue
+import threading
+
+# --- CONFIGURATION ---
+DEFAULT_QUEUE_DEPTH = 8 # Max items buffered between two stages
+DEFAULT_LOADER_THREADS = 8 # Number of files parsed concurrently
+DEFAULT_EMBED_BATCH_SIZE = 64 # Chunks per embedding model call
+DEFAULT_WRITE_BATCH_SIZE = 256 # Chunks per collection write
+
+_DONE = object() # Sentinel marking the end of a stage's output
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+class IngestPipeline:
+    """
+    Streaming ingestion pipeline: loader -> splitter -> embedder -> writer.
+
+    Each stage runs in its own thread(s) and stages are connected by bounded queues,
+    so at most 'queue_depth' items are in flight between two stages and peak memory
+    does not grow with the size of the corpus. Loading, embedding and writing overlap.
+
+    The caller supplies the stage functions:
+      load_fn(item) -> document, or None to skip the item
+      split_fn(item, document) -> (chunks, ids)
+      embed_fn(texts) -> list of embeddings
+      write_fn(ids, embeddings, texts, metadatas)
+      on_file_done(item, ids) - called once every chunk of 'item' has been written
+    """
+    def __init__(self, load_fn, split_fn, embed_fn, write_fn, on_file_done=None,
+                 queue_depth=DEFAULT_QUEUE_DEPTH, loader_threads=DEFAULT_LOADER_THREADS,
+                 embed_batch_size=DEFAULT_EMBED_BATCH_SIZE, write_batch_size=DEFAULT_WRITE_BATCH_SIZE):
+        self.load_fn = load_fn
+        self.split_fn = split_fn
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.on_file_done = on_file_done or (lambda item, ids: None)
+        self.queue_depth = queue_depth
+        self.loader_threads = loader_threads
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+
+        self.files_loaded = 0
+        self.files_skipped = 0
+        self.chunks_written = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._error = None
+        self._lock = threading.Lock()
+
+    # --- Queue helpers that give up when another stage failed ---
+    def _put(self, q, item):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._stop.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _run_stage(self, target, *args):
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._stop.set()
+
+    # --- Stages ---
+    def _loader(self, items, items_lock, out_q, remaining):
+        while True:
+            with items_lock:
+                item = next(items, _DONE)
+            if item is _DONE:
+                break
+            document = self.load_fn(item)
+            with self._lock:
+                if document is None:
+                    self.files_skipped += 1
+                else:
+                    self.files_loaded += 1
+            if document is not None:
+                self._put(out_q, (item, document))
+        # The last loader thread to finish closes the stream.
+        with self._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._put(out_q, _DONE)
+
+    def _splitter(self, in_q, out_q):
+        while True:
+            entry = self._get(in_q)
+            if entry is _DONE:
+                break
+            item, document = entry
+            chunks, ids = self.split_fn(item, document)
+            self._put(out_q, (item, chunks, ids))
+        self._put(out_q, _DONE)
+
+    def _embedder(self, in_q, out_q):
+        # Buffer of (id, text, metadata) plus the files whose last chunk is in the buffer.
+        buffer, finished = [], []
+
+        def flush(n):
+            nonlocal buffer, finished
+            batch, buffer = buffer[:n], buffer[n:]
+            # A file is complete once its last chunk is part of the flushed batch.
+            done = [(item, ids) for item, ids, end in finished if end <= n]
+            finished = [(item, ids, end - n) for item, ids, end in finished if end > n]
+            texts = [text for _, text, _ in batch]
+            embeddings = self.embed_fn(texts) if texts else []
+            self._put(out_q, ([i for i, _, _ in batch], embeddings, texts, [m for _, _, m in batch], done))
+
+        while True:
+            entry = self._get(in_q)
+            if entry is _DONE:
+                break
+            item, chunks, ids = entry
+            buffer.extend((chunk_id, chunk.page_content, chunk.metadata) for chunk_id, chunk in zip(ids, chunks))
+            finished.append((item, ids, len(buffer)))
+            while len(buffer) >= self.embed_batch_size:
+                flush(self.embed_batch_size)
+        if buffer or finished:
+            flush(len(buffer))
+        self._put(out_q, _DONE)
+
+    def _writer(self, in_q):
+        ids, embeddings, texts, metadatas, done = [], [], [], [], []
+
+        def flush():
+            if ids:
+                self.write_fn(ids, embeddings, texts, metadatas)
+                self.chunks_written += len(ids)
+            for item, file_ids in done:
+                self.on_file_done(item, file_ids)
+            for buf in (ids, embeddings, texts, metadatas, done):
+                buf.clear()
+
+        while True:
+            entry = self._get(in_q)
+            if entry is _DONE:
+                break
+            batch_ids, batch_embeddings, batch_texts, batch_metadatas, batch_done = entry
+            ids.extend(batch_ids)
+            embeddings.extend(batch_embeddings)
+            texts.extend(batch_texts)
+            metadatas.extend(batch_metadatas)
+            done.extend(batch_done)
+            if len(ids) >= self.write_batch_size:
+                flush()
+        flush()
+
+    def run(self, items):
+        """
+        Push every item through the pipeline and block until all stages are finished.
+        Re-raises the first exception raised by any stage.
+        """
+        start_time = time.time()
+        load_q = queue.Queue(maxsize=self.queue_depth)
+        split_q = queue.Queue(maxsize=self.queue_depth)
+        embed_q = queue.Queue(maxsize=self.queue_depth)
+
+        items_iter, items_lock = iter(items), threading.Lock()
+        remaining = [self.loader_threads]
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._loader, items_iter, items_lock, load_q, remaining),
+                             name=f"ingest-loader-{n}", daemon=True)
+            for n in range(self.loader_threads)
+        ]
+        threads += [
+            threading.Thread(target=self._run_stage, args=(self._splitter, load_q, split_q), name="ingest-splitter", daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._embedder, split_q, embed_q), name="ingest-embedder", daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._writer, embed_q), name="ingest-writer", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.time() - start_time
+
+        if self._error is not None:
+            raise self._error
+
+    def report(self) -> str:
+        """Return a one-line throughput summary of the last run."""
+        elapsed = max(self.elapsed, 1e-9)
+        return (f"{self.files_loaded} files ({self.files_skipped} skipped), {self.chunks_written} chunks "
+                f"in {self.elapsed:.2f}s: {self.files_loaded / elapsed:.1f} files/s, "
+                f"{self.chunks_written / elapsed:.1f} chunks/s")
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+import threading
+
+# --- CONFIGURATION ---
+LEXICAL_INDEX_DIR = os.path.join("db", "lexical")
+SQLITE_MAX_VARIABLES = 900 # Stay below SQLite's default bound-parameter limit
+REBUILD_BATCH_SIZE = 500 # Chunks fetched per page when rebuilding from a collection
+
+_IDENTIFIER_PARTS = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_QUERY_TOKENS = re.compile(r"\w+")
+
+def split_identifiers(text: str) -> str:
+    """
+    Break code identifiers into their words, so 'parse_thought_and_action' and
+    'parseThoughtAndAction' can also be found by searching for 'thought'.
+    """
+    return " ".join(_IDENTIFIER_PARTS.findall(text))
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word becomes a quoted term, OR-ed together,
+    so punctuation in questions or error strings cannot break the query syntax.
+    """
+    tokens = [token for token in _QUERY_TOKENS.findall(query) if len(token) > 1]
+    return " OR ".join(f'"{token}"' for token in dict.fromkeys(tokens))
+
+class LexicalIndex:
+    """
+    Persisted BM25 inverted index over a collection's chunks, kept next to the Chroma collection.
+
+    Backed by SQLite FTS5 (which ranks with BM25). Each chunk is indexed twice: verbatim, with '_'
+    kept inside tokens so exact identifiers, Verilog module names and error strings match as a
+    whole, and split into identifier words. Chunks are addressed by the same IDs as in Chroma,
+    so ingest.py and delete_from_ark.py keep both indexes consistent. Safe to share between threads.
+    """
+    def __init__(self, collection_name: str, index_dir: str = LEXICAL_INDEX_DIR):
+        self.collection_name = collection_name
+        self.path = os.path.join(index_dir, f"{collection_name}.sqlite")
+        self._lock = threading.Lock()
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                metadata TEXT NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, identifiers, tokenize = "unicode61 tokenchars '_'"
+            )""")
+        self._conn.commit()
+
+    def _delete_locked(self, ids: list):
+        for i in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            batch = ids[i:i + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            rowids = [row[0] for row in self._conn.execute(
+                f"SELECT rowid FROM chunks WHERE chunk_id IN ({placeholders})", batch)]
+            if rowids:
+                marks = ",".join("?" * len(rowids))
+                self._conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({marks})", rowids)
+                self._conn.execute(f"DELETE FROM chunks WHERE rowid IN ({marks})", rowids)
+
+    def upsert(self, ids: list, texts: list, metadatas: list):
+        """Add chunks to the index, replacing any existing chunks with the same IDs."""
+        with self._lock:
+            self._delete_locked(ids)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, metadata) VALUES (?, ?)", (chunk_id, json.dumps(metadata or {}))
+                )
+                self._conn.execute(
+                    "INSERT INTO chunks_fts (rowid, content, identifiers) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, text, split_identifiers(text)),
+                )
+            self._conn.commit()
+
+    def delete(self, ids: list):
+        """Remove chunks by ID. Unknown IDs are ignored."""
+        with self._lock:
+            self._delete_locked(ids)
+            self._conn.commit()
+
+    def search(self, query: str, n_results: int = 10) -> list:
+        """
+        Return up to n_results (chunk_id, text, metadata, score) tuples, best first.
+        Lower BM25 scores are better, as reported by FTS5.
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT chunks.chunk_id, chunks_fts.content, chunks.metadata, bm25(chunks_fts, 2.0, 1.0) AS score
+                FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid
+                WHERE chunks_fts MATCH ?
+                ORDER BY score
+                LIMIT ?""", (match_query, n_results)).fetchall()
+        return [(chunk_id, text, json.loads(metadata), score) for chunk_id, text, metadata, score in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks_fts")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def rebuild(collection_name: str, db_path: str = "db"):
+    """
+    Rebuild a collection's lexical index from the documents stored in Chroma,
+    e.g. for collections ingested before the index existed. A sharded collection
+    has one lexical index, built from all of its shards.
+    """
+    import chromadb
+    from shards import open_collection, physical_collections, SHARD_CATALOG_FILE
+    collection = open_collection(chromadb.PersistentClient(path=db_path), collection_name,
+                                 os.path.join(db_path, SHARD_CATALOG_FILE))
+    index = LexicalIndex(collection_name, os.path.join(db_path, "lexical"))
+    index.clear()
+
+    indexed = 0
+    for shard in physical_collections(collection):
+        offset = 0
+        while True:
+            page = shard.get(limit=REBUILD_BATCH_SIZE, offset=offset, include=["documents", "metadatas"])
+            if not page['ids']:
+                break
+            index.upsert(page['ids'], page['documents'], page['metadatas'])
+            offset += len(page['ids'])
+            indexed += len(page['ids'])
+            print(f"  - Indexed {indexed} chunks...")
+    print(f"Lexical index for '{collection_name}' rebuilt with {index.count()} chunks.")
+    index.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the lexical (BM25) index of an ARK collection from ChromaDB.")
+    parser.add_argument("--collection", type=str, required=True, help="The name of the ChromaDB collection to index.")
+    args = parser.parse_args()
+    rebuild(args.collection)
@@ -0,0 +1,152 @@
+import os
+from fnmatch import fnmatchcase
+from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+# Directories and files skipped during the walk, matched against the entry's name.
+DEFAULT_IGNORE_PATTERNS = [
+    ".git", ".hg", ".svn",                        # Version control
+    "node_modules", "__pycache__", "*.egg-info",  # Dependencies & caches
+    ".venv", "venv", ".tox", ".nox",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache",
+    "build", "dist",                              # Build output
+]
+
+# --- Loaders ---
+
+def load_text(path: str) -> Document:
+    """
+    Read a plain-text or source file directly as UTF-8.
+    Undecodable bytes are dropped, matching the behaviour of the read_file tool.
+    """
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    return Document(page_content=content, metadata={"source": path})
+
+def load_unstructured(path: str) -> Document:
+    """
+    Parse a rich document (PDF, image) with Unstructured, using Tesseract for OCR.
+    Imported lazily so plain-text ingests never pay for loading Unstructured.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader
+    documents = UnstructuredFileLoader(path, mode="single", strategy="fast").load()
+    if not documents:
+        return None
+    documents[0].metadata["source"] = path
+    return documents[0]
+
+# Map of file extension (or exact file name) to the loader used for it.
+# Add or remove entries based on your project's needs.
+LOADER_REGISTRY = {
+    ".txt": load_text, ".md": load_text, ".rst": load_text,             # Documentation
+    ".py": load_text, ".js": load_text, ".html": load_text, ".css": load_text,  # Web & Python
+    ".c": load_text, ".h": load_text, ".cpp": load_text, ".hpp": load_text,     # C/C++
+    ".v": load_text, ".sv": load_text, ".svh": load_text,               # Verilog/SystemVerilog
+    ".pdf": load_unstructured, ".png": load_unstructured, ".jpg": load_unstructured,  # Documents & Images (with Tesseract)
+    "Makefile": load_text, ".sh": load_text, ".yml": load_text, ".toml": load_text,   # Config & Scripts
+}
+
+# Loaders that are CPU-bound and may hang on a malformed file. ingest.py runs them in a
+# ParsePool of worker processes, with a per-file timeout and a parse cache.
+POOLED_LOADERS = {load_unstructured}
+
+def get_loader(path: str):
+    """
+    Return the loader registered for a file, or None if the file type is not ingested.
+    Exact file names (e.g. 'Makefile') take precedence over extensions.
+    """
+    name = os.path.basename(path)
+    if name in LOADER_REGISTRY:
+        return LOADER_REGISTRY[name]
+    return LOADER_REGISTRY.get(os.path.splitext(name)[1].lower())
+
+# --- Directory Walk ---
+
+def _parse_gitignore(directory: str) -> list:
+    """
+    Parse the .gitignore in 'directory' (if any) into (base, pattern, negate, dir_only, anchored) rules.
+    Supports the common subset of the format: comments, '!' negation, trailing '/' and anchored patterns.
+    """
+    rules = []
+    try:
+        with open(os.path.join(directory, ".gitignore"), 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line.startswith("**/"):
+            line = line[3:]
+        # A pattern containing a slash is relative to the .gitignore's directory.
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line:
+            rules.append((directory, line, negate, dir_only, anchored))
+    return rules
+
+def _is_ignored(path: str, name: str, is_dir: bool, rules: list) -> bool:
+    """Apply gitignore rules in order; the last matching rule wins."""
+    ignored = False
+    for base, pattern, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if anchored:
+            matched = fnmatchcase(os.path.relpath(path, base).replace(os.path.sep, "/"), pattern)
+        else:
+            matched = fnmatchcase(name, pattern)
+        if matched:
+            ignored = not negate
+    return ignored
+
+def walk_files(root: str, ignore_patterns=None, use_gitignore: bool = True):
+    """
+    Walk 'root' once with os.scandir and yield (path, stat) for every file that has a registered loader.
+
+    :param root: Directory to walk.
+    :param ignore_patterns: Names (glob patterns) of files and directories to skip. Defaults to DEFAULT_IGNORE_PATTERNS.
+    :param use_gitignore: Also honour .gitignore files found during the walk.
+    """
+    if ignore_patterns is None:
+        ignore_patterns = DEFAULT_IGNORE_PATTERNS
+
+    # Depth-first walk with an explicit stack of (directory, inherited gitignore rules).
+    stack = [(os.path.abspath(root), [])]
+    while stack:
+        directory, rules = stack.pop()
+        if use_gitignore:
+            rules = rules + _parse_gitignore(directory)
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as e:
+            print(f"  - Warning: could not scan '{directory}': {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if any(fnmatchcase(entry.name, pattern) for pattern in ignore_patterns):
+                continue
+            try:
+                # Do not follow symlinked directories, to avoid cycles.
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and (not entry.is_file() or get_loader(entry.name) is None):
+                    continue
+                if rules and _is_ignored(entry.path, entry.name, is_dir, rules):
+                    continue
+                if is_dir:
+                    subdirs.append(entry.path)
+                else:
+                    yield entry.path, entry.stat()
+            except OSError as e:
+                print(f"  - Warning: could not stat '{entry.path}': {e}")
+
+        # Push in reverse so directories are visited in sorted order.
+        for subdir in reversed(subdirs):
+            stack.append((subdir, rules))
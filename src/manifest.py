@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+
+# --- CONFIGURATION ---
+MANIFEST_DIR = os.path.join("db", "manifests")
+HASH_BLOCK_SIZE = 1 << 20 # Read files in 1 MiB blocks when hashing
+
+def hash_file(path: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_chunk_id(source: str, content_hash: str, index: int) -> str:
+    """
+    Derive a stable chunk ID from the source path, the file's content hash and the chunk index.
+    The same file content always produces the same IDs, so re-ingesting is idempotent.
+    """
+    key = f"{source}\0{content_hash}\0{index}".encode("utf-8")
+    return hashlib.sha1(key).hexdigest()
+
+def is_under(path: str, root: str) -> bool:
+    """
+    Check whether 'path' is 'root' itself or lies inside the directory 'root'.
+    """
+    root = root.rstrip(os.path.sep)
+    return path == root or path.startswith(root + os.path.sep)
+
+class IngestManifest:
+    """
+    Records, for every source file ingested into a collection, its size, mtime,
+    content hash and the IDs of the chunks generated from it.
+    Stored as one JSON file per collection under MANIFEST_DIR.
+    """
+    def __init__(self, collection_name: str, manifest_dir: str = MANIFEST_DIR):
+        self.collection_name = collection_name
+        self.path = os.path.join(manifest_dir, f"{collection_name}.json")
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get("files", {})
+
+    def save(self):
+        """Write the manifest atomically so an interrupted run never leaves it half-written."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"collection": self.collection_name, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def is_unchanged(self, source: str, stat: os.stat_result) -> bool:
+        """
+        Cheap check: a file whose size and mtime match the manifest is assumed unchanged.
+        """
+        entry = self.files.get(source)
+        return bool(entry) and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def get_hash(self, source: str):
+        entry = self.files.get(source)
+        return entry["hash"] if entry else None
+
+    def get_chunk_ids(self, source: str) -> list:
+        entry = self.files.get(source)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def touch(self, source: str, stat: os.stat_result):
+        """Refresh size/mtime of a file whose content hash did not change."""
+        self.files[source]["size"] = stat.st_size
+        self.files[source]["mtime_ns"] = stat.st_mtime_ns
+
+    def record(self, source: str, stat: os.stat_result, content_hash: str, chunk_ids: list):
+        self.files[source] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash,
+            "chunk_ids": list(chunk_ids),
+        }
+
+    def forget(self, source: str) -> list:
+        """Remove a file from the manifest and return the chunk IDs it owned."""
+        entry = self.files.pop(source, None)
+        return entry["chunk_ids"] if entry else []
+
+    def sources_under(self, root: str) -> list:
+        """Return every recorded source that lies under the directory 'root'."""
+        return [source for source in self.files if is_under(source, root)]
+
+def manifest_generation(collection_name: str, manifest_dir: str = MANIFEST_DIR) -> tuple:
+    """
+    Return a cheap token that changes whenever the collection's manifest is rewritten,
+    i.e. after every ingest.py or delete_from_ark.py run on that collection.
+    Used by long-running processes to notice that cached collection handles are stale.
+    """
+    try:
+        stat = os.stat(os.path.join(manifest_dir, f"{collection_name}.json"))
+    except OSError:
+        return (0, 0)
+    # save() replaces the file, so the inode changes even if the mtime resolution is coarse.
+    return (stat.st_ino, stat.st_mtime_ns)
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import zlib
+import queue
+import sqlite3
+import threading
+import multiprocessing
+
+# --- CONFIGURATION ---
+PARSE_CACHE_PATH = os.path.join("db", "parse_cache.sqlite")
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 2 # PDF parsing and OCR are CPU-bound: one process per core
+DEFAULT_PARSE_TIMEOUT = 120 # Seconds before a file's parser process is killed
+PARSER_VERSION = "unstructured-fast-1" # Part of the cache key; bump it when the parsing settings change
+
+class ParseError(Exception):
+    """A file could not be parsed (the parser failed, timed out or was cached as failing)."""
+
+class ParseCache:
+    """
+    Extracted text of parsed documents, keyed by (file content hash, parser version), so an
+    unchanged PDF or scan is never parsed or OCR'd again, wherever it moved. Failures are cached
+    too, so a file that always breaks the parser only costs its timeout once per version.
+    Safe to share between threads.
+    """
+    def __init__(self, path: str = PARSE_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS parsed (
+                file_hash TEXT NOT NULL,
+                parser TEXT NOT NULL,
+                content BLOB,
+                metadata TEXT,
+                error TEXT,
+                parse_seconds REAL NOT NULL,
+                PRIMARY KEY (file_hash, parser)
+            )""")
+        self._conn.commit()
+
+    def get(self, file_hash: str, parser: str = PARSER_VERSION):
+        """Return (text, metadata, error) for a parsed file, or None if it was never parsed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, metadata, error FROM parsed WHERE file_hash = ? AND parser = ?", (file_hash, parser)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        content, metadata, error = row
+        return (zlib.decompress(content).decode("utf-8") if content is not None else None,
+                json.loads(metadata) if metadata else {}, error)
+
+    def put(self, file_hash: str, text: str, metadata: dict, error: str, parse_seconds: float,
+            parser: str = PARSER_VERSION):
+        content = zlib.compress(text.encode("utf-8")) if text is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed (file_hash, parser, content, metadata, error, parse_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                (file_hash, parser, content, json.dumps(metadata, default=str) if metadata is not None else None, error, parse_seconds),
+            )
+            self._conn.commit()
+
+    def report(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _worker_main(conn):
+    """
+    Parser process: imports the parser and reports ('ready',), then receives paths and sends
+    back ('ok', text, metadata), ('empty',) or ('error', message) for each.
+    """
+    from loaders import load_unstructured
+    try:
+        # Import the parser up front, so the first file's timeout does not include it.
+        from langchain_community.document_loaders import UnstructuredFileLoader # noqa: F401
+    except Exception:
+        pass # Reported per file by load_unstructured
+    conn.send(("ready",))
+    while True:
+        path = conn.recv()
+        if path is None:
+            return
+        try:
+            document = load_unstructured(path)
+            if document is None:
+                conn.send(("empty",))
+            else:
+                conn.send(("ok", document.page_content, dict(document.metadata)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+class ParsePool:
+    """
+    Parses heavy documents (PDFs, images with OCR) in separate processes, so they use every
+    core instead of serializing on the GIL, and so a pathological file can be stopped: a parser
+    that runs past 'timeout' seconds is killed and replaced, and the file is reported as failed.
+
+    Any number of loader threads may call load() at once; each waits for an idle worker process.
+    Workers are started on first use and reused across files. Results and parser errors are cached
+    by file hash in a ParseCache ('retry_failed' re-parses files whose failure was cached); timeouts
+    and dead workers are only reported for the current run.
+    """
+    def __init__(self, cache: ParseCache = None, workers: int = DEFAULT_PARSE_WORKERS,
+                 timeout: float = DEFAULT_PARSE_TIMEOUT, retry_failed: bool = False):
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_failed = retry_failed
+        self.failures = [] # [(path, reason)] of this run
+        self.parsed = 0
+        self._context = multiprocessing.get_context("spawn") # Never fork the threaded ingest process
+        self._idle = queue.Queue()
+        self._started = 0
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and self._started < self.workers:
+                self._started += 1
+                worker = _Worker(self._context)
+                self._all.append(worker)
+                return worker
+        return self._idle.get()
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self._all.remove(worker)
+            replacement = _Worker(self._context)
+            self._all.append(replacement)
+        self._idle.put(replacement)
+
+    def _fail(self, path: str, reason: str):
+        with self._lock:
+            self.failures.append((path, reason))
+        raise ParseError(reason)
+
+    def _parse(self, path: str):
+        """
+        Parse a file in a worker: (text, metadata, error, seconds, transient). A transient
+        error (a timeout or a dead worker) may not recur, so it is not cached.
+        """
+        worker = self._acquire()
+        try:
+            if not worker.ready:
+                worker.conn.recv() # Wait for a new worker's imports, outside the file's timeout
+                worker.ready = True
+            start_time = time.perf_counter()
+            worker.conn.send(path)
+            if not worker.conn.poll(self.timeout):
+                self._replace(worker)
+                return None, None, f"timed out after {self.timeout:g}s", time.perf_counter() - start_time, True
+            result = worker.conn.recv()
+        except (OSError, EOFError) as e:
+            # The parser process died (e.g. killed by the OOM killer).
+            self._replace(worker)
+            return None, None, f"parser process died: {e or 'no result'}", 0.0, True
+        self._idle.put(worker)
+        seconds = time.perf_counter() - start_time
+        with self._lock:
+            self.parsed += 1
+        if result[0] == "ok":
+            return result[1], result[2], None, seconds, False
+        return None, None, (result[1] if result[0] == "error" else None), seconds, False
+
+    def load(self, path: str, file_hash: str):
+        """
+        Return the document for a heavy file, from the cache or a worker process, or None if
+        the parser found no content. Raises ParseError if the file cannot be parsed.
+        """
+        from langchain_core.documents import Document
+        cached = self.cache.get(file_hash) if self.cache is not None else None
+        if cached is not None and (cached[2] is None or not self.retry_failed):
+            text, metadata, error = cached
+            if error:
+                error += " (cached failure; parse again with --retry-parse-failures)"
+        else:
+            text, metadata, error, seconds, transient = self._parse(path)
+            if self.cache is not None and not transient:
+                self.cache.put(file_hash, text, metadata, error, seconds)
+        if error:
+            self._fail(path, error)
+        if text is None:
+            return None
+        # The cache is keyed by content, so the document may have been parsed under another path.
+        return Document(page_content=text, metadata=dict(metadata or {}, source=path))
+
+    def failure_report(self) -> str:
+        if not self.failures:
+            return "no parse failures"
+        lines = [f"{len(self.failures)} files could not be parsed:"]
+        lines += [f"  - {path}: {reason}" for path, reason in sorted(self.failures)]
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
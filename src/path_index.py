@@ -0,0 +1,210 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from fnmatch import fnmatchcase
+
+# --- CONFIGURATION ---
+PATH_INDEX_PATH = os.path.join("db", "path_index.sqlite")
+PATH_INDEX_MAX_DEPTH = 8 # Levels below each root that are indexed
+PATH_INDEX_MAX_ENTRIES = 1000000 # Safety limit on the number of indexed paths
+# Directories that are indexed themselves but never descended into.
+PATH_INDEX_PRUNE = [
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", "*.egg-info", ".venv", "venv",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".cache", ".npm", ".cargo",
+    ".rustup", ".local/share/Trash",
+]
+TRIE_SUFFIX_DEPTH = 2 # Trailing path components stored in the in-memory trie
+MAX_CANDIDATES = 10
+INSERT_BATCH_SIZE = 5000
+
+# Words around the name in questions like "where is the application documents folder?"
+_FILLER = re.compile(
+    r"\b(where\s+is|where\s+are|path\s+to|find|locate|directory\s+of|folder\s+of|the|my|a|an|"
+    r"folder|directory|dir|file|located|stored|kept|on\s+this\s+(?:computer|system|machine))\b",
+    re.IGNORECASE,
+)
+
+def extract_path_query(text: str) -> str:
+    """Strip question words and punctuation, leaving the name (or partial path) being looked for."""
+    text = text.strip().strip("?!.'\"`")
+    return " ".join(_FILLER.sub(" ", text).split()).strip("'\"`")
+
+class PathTrie:
+    """
+    Trie over the trailing components of directory paths, read from the leaf upwards, so the
+    directories named 'scripts' (or ending in 'src/scripts') are found with one or two dict lookups.
+    Components are compared case-insensitively.
+    """
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, path: str):
+        node = self.root
+        for part in reversed(path.rstrip(os.sep).split(os.sep)[-TRIE_SUFFIX_DEPTH:]):
+            node = node.setdefault(part.lower(), {})
+            node.setdefault(None, []).append(path)
+
+    def lookup(self, components: list) -> list:
+        """Return every indexed directory whose path ends with 'components'."""
+        node = self.root
+        for part in reversed(components[-TRIE_SUFFIX_DEPTH:]):
+            node = node.get(part.lower())
+            if node is None:
+                return []
+        paths = node.get(None, [])
+        if len(components) > TRIE_SUFFIX_DEPTH:
+            suffix = os.sep + os.sep.join(components).lower()
+            paths = [path for path in paths if path.lower().endswith(suffix)]
+        return paths
+
+class PathIndex:
+    """
+    Persisted index of the paths under the user's home directory, built by the system-info collector.
+
+    Stored in SQLite: one row per path, plus an FTS5 trigram index over basenames for
+    substring and fuzzy lookups. Directory suffixes are also loaded into an in-memory PathTrie
+    on first use, so exact lookups such as 'APPLICATION DOCUMENTS' or 'src/scripts' take
+    microseconds. A rebuilt index is picked up automatically by long-running processes.
+    """
+    def __init__(self, path: str = PATH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._trie = None
+        self._trie_generation = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS paths (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                is_dir INTEGER NOT NULL,
+                depth INTEGER NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS paths_name ON paths (name COLLATE NOCASE)")
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS paths_fts USING fts5(name, tokenize = 'trigram')")
+        self._conn.commit()
+
+    def _generation(self):
+        # Changes whenever another connection (e.g. the collector rebuilding the index) commits.
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def build(self, roots: list, max_depth: int = PATH_INDEX_MAX_DEPTH, max_entries: int = PATH_INDEX_MAX_ENTRIES,
+              prune=None) -> int:
+        """Replace the index with the files and directories under 'roots'. Returns the number of paths."""
+        prune = PATH_INDEX_PRUNE if prune is None else prune
+        rows, count = [], 0
+        with self._lock:
+            self._conn.execute("DELETE FROM paths")
+            self._conn.execute("DELETE FROM paths_fts")
+            for root in roots:
+                root = os.path.abspath(os.path.expanduser(root))
+                stack = [(root, 0)]
+                while stack and count < max_entries:
+                    directory, depth = stack.pop()
+                    try:
+                        entries = list(os.scandir(directory))
+                    except OSError:
+                        continue
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        count += 1
+                        rows.append((count, entry.path, entry.name, int(is_dir), depth + 1))
+                        relative = os.path.relpath(entry.path, root)
+                        if (is_dir and depth + 1 < max_depth
+                                and not any(fnmatchcase(entry.name, p) or fnmatchcase(relative, p) for p in prune)):
+                            stack.append((entry.path, depth + 1))
+                    if len(rows) >= INSERT_BATCH_SIZE:
+                        self._insert(rows)
+                        rows = []
+            self._insert(rows)
+            self._conn.commit()
+            self._trie = None
+        return count
+
+    def _insert(self, rows: list):
+        self._conn.executemany("INSERT OR IGNORE INTO paths (id, path, name, is_dir, depth) VALUES (?, ?, ?, ?, ?)", rows)
+        self._conn.executemany("INSERT INTO paths_fts (rowid, name) VALUES (?, ?)", [(row[0], row[2]) for row in rows])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM paths").fetchone()[0]
+
+    def _get_trie(self) -> PathTrie:
+        generation = self._generation()
+        if self._trie is None or generation != self._trie_generation:
+            trie = PathTrie()
+            for (path,) in self._conn.execute("SELECT path FROM paths WHERE is_dir = 1"):
+                trie.insert(path)
+            self._trie, self._trie_generation = trie, generation
+        return self._trie
+
+    def lookup(self, query: str, dirs_only: bool = False, limit: int = MAX_CANDIDATES, substring: bool = True) -> list:
+        """
+        Return up to 'limit' candidate paths for a name or partial path, best first:
+        exact (case-insensitive) matches of the trailing components, shallowest first,
+        or, if there are none and 'substring' is set, substring matches of the basename
+        from the trigram index. Substring matches are only suggestions, never a resolution.
+        """
+        components = [part for part in query.strip().strip(os.sep).split(os.sep) if part]
+        if not components:
+            return []
+        with self._lock:
+            exact = sorted(self._get_trie().lookup(components), key=lambda p: (p.count(os.sep), p))
+            if not dirs_only:
+                suffix = (os.sep + os.sep.join(components)).lower()
+                exact += sorted((path for (path,) in self._conn.execute(
+                    "SELECT path FROM paths WHERE is_dir = 0 AND name = ? COLLATE NOCASE", (components[-1],))
+                    if path.lower().endswith(suffix)), key=lambda p: (p.count(os.sep), p))
+            if exact or not substring or len(components[-1]) < 3:
+                return exact[:limit]
+            # Substring matches: the trigram tokenizer matches any basename containing the text.
+            phrase = '"' + components[-1].replace('"', '""') + '"'
+            rows = self._conn.execute(f"""
+                SELECT paths.path FROM paths_fts JOIN paths ON paths.id = paths_fts.rowid
+                WHERE paths_fts MATCH ? {'AND paths.is_dir = 1' if dirs_only else ''}
+                ORDER BY paths.depth, length(paths.name) LIMIT ?""", (phrase, limit)).fetchall()
+        return [path for (path,) in rows]
+
+    def resolve(self, query: str, dirs_only: bool = False):
+        """
+        Return the single path whose basename or trailing components are exactly 'query',
+        or None if there is no such path or several.
+        """
+        candidates = self.lookup(query, dirs_only=dirs_only, limit=2, substring=False)
+        return candidates[0] if len(candidates) == 1 else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_path_index(path: str = PATH_INDEX_PATH):
+    """Return the process-wide path index, or None if the collector has not built one yet."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            if not os.path.exists(path):
+                return None
+            _index = PathIndex(path)
+        return _index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build ARK's path index used to resolve file and folder names.")
+    parser.add_argument("--root", type=str, nargs="+", default=["~"], help="Directories to index (default: home directory).")
+    parser.add_argument("--output", type=str, default=PATH_INDEX_PATH, help="Path of the SQLite index file.")
+    parser.add_argument("--max-depth", type=int, default=PATH_INDEX_MAX_DEPTH, help="Levels below each root to index.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = PathIndex(args.output).build(args.root, max_depth=args.max_depth)
+    print(f"Indexed {count} paths into '{args.output}' in {time.perf_counter() - start:.1f}s.")
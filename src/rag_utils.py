@@ -1,42 +1,297 @@
-import chromadb
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from sentence_transformers import SentenceTransformer
+import os
+import time
+import threading
+
+from embedding_cache import EmbeddingCache, CachedEmbedder
+from embeddings import EmbeddingBackend, EMBEDDING_MODEL_NAME
+from context_assembly import assemble_context, estimate_tokens, token_budget_for
+from lexical_index import LexicalIndex
+from manifest import manifest_generation
+from shards import open_collection, SHARD_CATALOG_FILE
+from tracing import span, llm_callbacks
+
+# --- CONFIGURATION ---
+RRF_K = 60 # Reciprocal rank fusion constant; larger values flatten the influence of top ranks
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """
+    Merge several ranked lists of IDs into one, scoring each ID by sum(1 / (k + rank)).
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def retrieval_report(stats: dict) -> str:
+    """
+    Return a one-line summary of a retrieval from its stats (as returned by RAGUtils.retrieve(),
+    or filled in by a RAG chain): per-mode latencies and context/prompt sizes.
+    """
+    if not stats:
+        return "no retrieval yet"
+    report = (f"{stats['mode']}: encode {stats['encode_ms']:.1f} ms, "
+              f"vector {stats['vector_ms']:.1f} ms ({stats['vector_hits']} hits)")
+    if "lexical_ms" in stats:
+        report += f", lexical {stats['lexical_ms']:.1f} ms ({stats['lexical_hits']} hits)"
+    if "context_tokens" in stats:
+        report += (f"; context {stats['context_tokens']} tokens from {stats['raw_context_tokens']} "
+                   f"({stats['chunks_retrieved']} chunks -> {stats['context_pieces']} pieces)")
+    if "prompt_tokens" in stats:
+        report += f", prompt ~{stats['prompt_tokens']} tokens"
+    return report
+
+# Heavy dependencies (chromadb, torch via embeddings.py, langchain) are imported lazily,
+# so importing this module (e.g. through tools.py) costs nothing until RAG is actually used.
 
 class RAGUtils:
-    def __init__(self, db_path="db", llm_model="mistral", embedding_model="all-mpnet-base-v2"):
-        print("Initializing RAG utilities...")
-        self.llm = OllamaLLM(model=llm_model)
-        self.embedding_model = SentenceTransformer(embedding_model, device='cuda')
-        self.db_client = chromadb.PersistentClient(path=db_path)
-        print("RAG utilities initialized.")
+    """
+    Shared RAG utilities. The LLM client, the embedding model and the vector database client
+    are created on first use, each exactly once even when several threads need them at the same time.
+    """
+    def __init__(self, db_path="db", llm_model="mistral", embedding_model=EMBEDDING_MODEL_NAME, retrieval_mode="hybrid"):
+        self.db_path = db_path
+        self.retrieval_mode = retrieval_mode # 'hybrid' (vector + BM25) or 'vector'
+        self.llm_model_name = llm_model
+        self.embedding_model_name = embedding_model
+        self._llm = None
+        self._embedding_model = None
+        self._db_client = None
+        self._llm_lock = threading.Lock()
+        self._embedding_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # Registry of collection handles and compiled chains, each stored with the
+        # manifest generation it was built at: {name: (generation, collection)}
+        # and {(name, template): (generation, chain)}.
+        self._collections = {}
+        self._lexical_indexes = {}
+        self._chains = {}
+        self._registry_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    from langchain_ollama import OllamaLLM
+                    # Traces each generation with its time to first token when tracing is on.
+                    self._llm = OllamaLLM(model=self.llm_model_name, callbacks=llm_callbacks())
+        return self._llm
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            with self._embedding_lock:
+                if self._embedding_model is None:
+                    # Same device/runtime selection and on-disk cache as ingest.py.
+                    backend = EmbeddingBackend(self.embedding_model_name)
+                    cache = EmbeddingCache(os.path.join(self.db_path, "embedding_cache.sqlite"))
+                    self._embedding_model = CachedEmbedder(backend.cache_key, backend.load, cache)
+        return self._embedding_model
+
+    def wrap_embedding_model(self, wrapper):
+        """
+        Replace the embedding model with wrapper(current model), e.g. a MicroBatchEmbedder in
+        ark_server.py, so every user of this instance (tools included) goes through the wrapper.
+        """
+        model = self.embedding_model
+        with self._embedding_lock:
+            self._embedding_model = wrapper(model)
+        return self._embedding_model
+
+    @property
+    def embedding_cache(self):
+        return self.embedding_model.cache
+
+    @property
+    def db_client(self):
+        if self._db_client is None:
+            with self._db_lock:
+                if self._db_client is None:
+                    import chromadb
+                    self._db_client = chromadb.PersistentClient(path=self.db_path)
+        return self._db_client
+
+    def warm_up(self):
+        """Create the DB client, the LLM client and the embedding model ahead of their first use."""
+        import langchain_core.prompts # Imported by create_rag_chain
+        self.db_client
+        self.llm
+        self.embedding_model.model
+
+    def _generation(self, collection_name):
+        return manifest_generation(collection_name, os.path.join(self.db_path, "manifests"))
+
+    def invalidate(self, collection_name=None):
+        """Drop cached collection handles and chains for one collection, or for all of them."""
+        with self._registry_lock:
+            if collection_name is None:
+                self._collections.clear()
+                self._lexical_indexes.clear()
+                self._chains.clear()
+                return
+            self._collections.pop(collection_name, None)
+            self._lexical_indexes.pop(collection_name, None)
+            for key in [key for key in self._chains if key[0] == collection_name]:
+                del self._chains[key]
+
+    def get_collection(self, collection_name):
+        """
+        Return the collection handle, fetching it again only if the collection was
+        re-ingested or modified since it was cached. A sharded collection (see shards.py)
+        is returned as a ShardedCollection, whose queries fan out to all of its shards.
+        """
+        generation = self._generation(collection_name)
+        cached = self._collections.get(collection_name)
+        if cached and cached[0] == generation:
+            return cached[1]
 
-    def create_rag_chain(self, collection_name, prompt_template):
-        """Create a RAG chain for a specific collection."""
         try:
-            collection = self.db_client.get_collection(name=collection_name)
+            collection = open_collection(self.db_client, collection_name, os.path.join(self.db_path, SHARD_CATALOG_FILE))
         except ValueError:
             raise ValueError(f"Collection '{collection_name}' does not exist. Please ingest data first using ingest.py")
+        with self._registry_lock:
+            self._collections[collection_name] = (generation, collection)
+            # Re-open the lexical index too: it may have been created by the ingest that changed the generation.
+            self._lexical_indexes.pop(collection_name, None)
+        return collection
+
+    def get_lexical_index(self, collection_name):
+        """
+        Return the collection's BM25 index, or None if it was never built
+        (vector-only retrieval is used in that case).
+        """
+        if collection_name not in self._lexical_indexes:
+            index_dir = os.path.join(self.db_path, "lexical")
+            index = None
+            if os.path.exists(os.path.join(index_dir, f"{collection_name}.sqlite")):
+                index = LexicalIndex(collection_name, index_dir)
+            with self._registry_lock:
+                self._lexical_indexes.setdefault(collection_name, index)
+        return self._lexical_indexes[collection_name]
 
-        def retrieve_context(query_text, n_results=10):
-            query_embedding = self.embedding_model.encode(query_text).tolist()
-            results = collection.query(query_embeddings=[query_embedding], n_results=n_results)
-            context_with_metadata = []
-            for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
-                source = meta.get('source', 'Unknown source')
-                context_with_metadata.append(f"--- CONTEXT FROM: {source} ---\n{doc}")
-            return "\n\n".join(context_with_metadata)
+    def retrieve(self, collection_name, query_text, n_results=10):
+        """
+        Retrieve the best chunks for a query as a list of (document, metadata) pairs.
+        In hybrid mode, dense vector search and BM25 lexical search are merged with
+        reciprocal rank fusion, so exact identifiers and error strings are not missed.
+        Returns (hits, stats): the hits and this retrieval's hit counts and per-mode latencies.
+        The stats are returned rather than stored, as the instance is shared between threads.
+        """
+        return self.retrieve_many(collection_name, [query_text], n_results)[0]
 
+    def retrieve_many(self, collection_name, query_texts, n_results=10):
+        """
+        Retrieve for several queries at once: all queries are embedded in one batched call
+        and sent to the vector store in one query; lexical search runs per query.
+        Returns a list of (hits, stats) in query order; the batched stages' latencies are
+        reported per query (total divided by the number of queries).
+        """
+        collection = self.get_collection(collection_name)
+        lexical_index = self.get_lexical_index(collection_name) if self.retrieval_mode == "hybrid" else None
+        count = len(query_texts)
+
+        start_time = time.perf_counter()
+        with span("rag.encode", queries=count):
+            query_embeddings = self.embedding_model.encode(list(query_texts))
+        encode_ms = (time.perf_counter() - start_time) * 1000 / count
+
+        start_time = time.perf_counter()
+        with span("rag.query", collection=collection_name, queries=count, n_results=n_results):
+            results = collection.query(query_embeddings=query_embeddings, n_results=n_results)
+        vector_ms = (time.perf_counter() - start_time) * 1000 / count
+
+        retrievals = []
+        for i, query_text in enumerate(query_texts):
+            stats = {"mode": "hybrid" if lexical_index else "vector", "encode_ms": encode_ms, "vector_ms": vector_ms}
+            ids = results['ids'][i]
+            hits = dict(zip(ids, zip(results['documents'][i], results['metadatas'][i])))
+            rankings = [ids]
+            stats["vector_hits"] = len(ids)
+
+            if lexical_index is not None:
+                start_time = time.perf_counter()
+                with span("rag.lexical", collection=collection_name):
+                    lexical_hits = lexical_index.search(query_text, n_results)
+                stats["lexical_ms"] = (time.perf_counter() - start_time) * 1000
+                for chunk_id, doc, meta, _ in lexical_hits:
+                    hits.setdefault(chunk_id, (doc, meta))
+                rankings.append([chunk_id for chunk_id, _, _, _ in lexical_hits])
+                stats["lexical_hits"] = len(lexical_hits)
+
+            retrievals.append(([hits[chunk_id] for chunk_id in reciprocal_rank_fusion(rankings)[:n_results]], stats))
+        return retrievals
+
+    def get_rag_chain(self, collection_name, prompt_template):
+        """
+        Return a compiled RAG chain for (collection, template) from the registry,
+        building it only on first use or after the collection changed.
+        """
+        key = (collection_name, prompt_template)
+        generation = self._generation(collection_name)
+        cached = self._chains.get(key)
+        if cached and cached[0] == generation:
+            return cached[1]
+
+        chain = self.create_rag_chain(collection_name, prompt_template)
+        with self._registry_lock:
+            self._chains[key] = (generation, chain)
+        return chain
+
+    def create_rag_chain(self, collection_name, prompt_template):
+        """
+        Create a RAG chain for a specific collection. Use get_rag_chain() to reuse compiled chains.
+        The chain takes {"question": ..., "stats": {}}; the optional 'stats' dict is filled with
+        the retrieval's latencies and the context and prompt sizes (see retrieval_report()).
+        """
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+
+        # Fail early if the collection does not exist.
+        self.get_collection(collection_name)
+        token_budget = token_budget_for(collection_name)
         prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
 
+        def retrieve_context(inputs):
+            hits, stats = self.retrieve(collection_name, inputs["question"], n_results=10)
+            # Deduplicate, merge overlapping chunks and pack them into the collection's token budget.
+            context, context_stats = assemble_context(hits, token_budget)
+            if inputs.get("stats") is not None:
+                inputs["stats"].update(stats, **context_stats)
+                inputs["stats"]["prompt_tokens"] = estimate_tokens(prompt.format(context=context, question=inputs["question"]))
+            return context
+
         return (
-            {"context": (lambda x: retrieve_context(x["question"])), "question": RunnablePassthrough()}
+            {"context": retrieve_context, "question": (lambda x: x["question"])}
             | prompt
             | self.llm
             | StrOutputParser()
         )
 
-# Global instance
-_rag_utils_instance = RAGUtils()
+# Global instance, created on first use by get_rag_utils()
+_rag_utils_instance = None
+_rag_utils_lock = threading.Lock()
+
+def get_rag_utils() -> RAGUtils:
+    """Return the shared RAGUtils instance, creating it on first call. Thread-safe."""
+    global _rag_utils_instance
+    if _rag_utils_instance is None:
+        with _rag_utils_lock:
+            if _rag_utils_instance is None:
+                _rag_utils_instance = RAGUtils()
+    return _rag_utils_instance
+
+def warm_up_in_background() -> threading.Thread:
+    """
+    Start loading the RAG components in a daemon thread, so the caller can already accept input.
+    Callers that need RAG before the warm-up finishes simply block on the same locks.
+    """
+    def _warm_up():
+        try:
+            get_rag_utils().warm_up()
+        except Exception as e:
+            print(f"\nWarning: RAG warm-up failed: {e}")
+
+    thread = threading.Thread(target=_warm_up, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -3,6 +3,10 @@ from langchain_core.prompts import PromptTemplate
 import os
 import re
 import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # Import all tools
 from tools import (
@@ -16,9 +20,36 @@ from tools import (
     query_system_knowledge,
     query_project_knowledge
 )
+from agent_history import AgentHistory, format_observation
+from context_assembly import estimate_tokens
+from tracing import span, tracer
 
 # --- CONFIGURATION ---
 LLM_MODEL_NAME = "mistral-openorca"
+LLM_KEEP_ALIVE = "30m" # Keep the model (and its prompt cache) loaded in Ollama between questions
+# Generation stops as soon as the model starts inventing the next step on its own.
+STOP_SEQUENCES = ["\nObservation:", "\nThought:", "\nQuestion:"]
+MAX_ACTIONS_PER_STEP = 5 # Independent actions the agent may batch into one step
+MAX_TOOL_WORKERS = MAX_ACTIONS_PER_STEP # Tools run concurrently on this many threads: a whole batch at once
+DEFAULT_TOOL_TIMEOUT = 60 # Seconds before a tool's result is given up on
+TOOL_TIMEOUTS = {
+    "query_system_knowledge": 120,
+    "query_project_knowledge": 120,
+    "get_directory_size": 120,
+}
+
+# Shared pool for tool batches. A tool that times out keeps its thread until it returns, so
+# the pool it ran in is then retired (shut down without waiting) and replaced by a fresh one.
+_tool_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="ark-tool")
+_tool_executor_lock = threading.Lock()
+
+def _retire_tool_executor(executor):
+    """Replace a pool that has a thread stuck in a timed-out tool; its other tasks still finish."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is executor:
+            _tool_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="ark-tool")
+            executor.shutdown(wait=False)
 
 # Create a mapping of tool names to functions
 TOOLS_MAP = {
@@ -33,80 +64,173 @@ TOOLS_MAP = {
     "query_project_knowledge": query_project_knowledge,
 }
 
-def get_tool_descriptions():
+def get_tool_descriptions(tools=TOOLS_MAP):
     """Generate tool descriptions for the prompt."""
     descriptions = []
-    for name, tool in TOOLS_MAP.items():
+    for name, tool in tools.items():
         descriptions.append(f"- {name}: {tool.description}")
     return "\n".join(descriptions)
 
 def parse_thought_and_action(text):
     """
-    Parse ONLY Thought and Action from the response.
-    Ignore anything after Action Input (like fake Observations or Final Answers).
+    Parse ONLY Thought and Action(s) from the response.
+    A step may contain several Action / Action Input pairs, which are run as one batch.
+    Ignore anything after the last Action Input (like fake Observations or Final Answers).
+
+    :return: (thought, [(action, action_input), ...], final_answer)
     """
     # Find the Thought
     thought_match = re.search(r'Thought:\s*(.+?)(?=\nAction:|Final Answer:|$)', text, re.IGNORECASE | re.DOTALL)
-    
-    # Find Action and Action Input (but stop at any fake Observation or Final Answer)
-    action_match = re.search(r'Action:\s*(\w+)', text, re.IGNORECASE)
-    input_match = re.search(r'Action Input:\s*(.+?)(?=\n|$)', text, re.IGNORECASE)
-    
+    thought = thought_match.group(1).strip() if thought_match else ""
+
+    # Collect Action / Action Input pairs (but stop at any fake Observation or Final Answer)
+    actions = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        lowered = stripped.lower()
+        if lowered.startswith("action input:"):
+            if actions:
+                action_input = stripped[len("action input:"):].strip().strip('"\'[]')
+                actions[-1] = (actions[-1][0], action_input)
+        elif lowered.startswith("action:"):
+            name_match = re.match(r'\s*(\w+)', stripped[len("action:"):])
+            if name_match:
+                actions.append((name_match.group(1), ""))
+        elif actions and (lowered.startswith("observation") or lowered.startswith("final answer")):
+            break
+
+    if actions:
+        return thought, actions[:MAX_ACTIONS_PER_STEP], None
+
     # Check for a final answer
     final_answer_match = re.search(r'Final Answer:\s*(.*)', text, re.IGNORECASE | re.DOTALL)
-
-    thought = thought_match.group(1).strip() if thought_match else ""
-    
-    if action_match:
-        action = action_match.group(1).strip()
-        action_input = input_match.group(1).strip() if input_match else ""
-        action_input = action_input.strip('"\'[]')
-        return thought, action, action_input, None
-    
     if final_answer_match:
         final_answer = final_answer_match.group(1).strip()
-        return thought, None, None, final_answer
+        return thought, [], final_answer
 
     # If no action or final answer, return the thought or the whole text
-    return thought, None, None, text.strip()
+    return thought, [], text.strip()
+
+# A complete "Action Input:" line: everything the parser needs to run a tool is there.
+_ACTION_INPUT_LINE = re.compile(r'Action Input:[^\n]*\n', re.IGNORECASE)
 
-def execute_tool(tool_name, tool_input):
-    """Execute a tool and return its output."""
-    if tool_name not in TOOLS_MAP:
-        return f"Error: Tool '{tool_name}' not found. Available tools: {', '.join(TOOLS_MAP.keys())}"
+def step_is_complete(text):
+    """
+    Whether a partial response already contains its complete batch of actions: at least one
+    complete Action Input line, followed by a line that does not start another Action
+    (or the maximum number of actions per step).
+    """
+    matches = list(_ACTION_INPUT_LINE.finditer(text))
+    if not matches:
+        return False
+    if len(matches) >= MAX_ACTIONS_PER_STEP:
+        return True
+    rest = text[matches[-1].end():].lstrip()
+    if not rest:
+        return False
+    # Still possibly the beginning of another "Action:" line.
+    prefix = rest[:len("action")].lower()
+    return not "action".startswith(prefix)
+
+def generate_step(llm, prompt):
+    """
+    Stream one agent step from the LLM, with stop sequences, and stop reading as soon as the
+    step's Action / Action Input batch is complete. Closing the stream makes Ollama abort the
+    generation, so tokens the parser would discard (fake Observations, premature Final
+    Answers) are never generated.
+
+    :return: (response text, True if generation was cut short by the parser)
+    """
+    text = ""
+    with span("agent.llm", prompt_chars=len(prompt)) as llm_span:
+        stream = llm.stream(prompt, stop=STOP_SEQUENCES)
+        try:
+            for chunk in stream:
+                if not text:
+                    llm_span.set("ttft_ms", round(llm_span.elapsed() * 1000, 3))
+                text += chunk
+                if step_is_complete(text):
+                    llm_span.set("stopped_early", True)
+                    return text, True
+        finally:
+            stream.close()
+            llm_span.set("output_chars", len(text))
+    return text, False
+
+def execute_tool(tool_name, tool_input, tools=TOOLS_MAP):
+    """Execute a tool (one of 'tools') and return its output."""
+    if tool_name not in tools:
+        return f"Error: Tool '{tool_name}' not found. Available tools: {', '.join(tools.keys())}"
 
     try:
-        tool = TOOLS_MAP[tool_name]
+        tool = tools[tool_name]
         kwargs = {}
 
         # Prepare arguments based on the tool being called
         if tool_name in ["get_disk_usage", "get_ram_usage", "get_cpu_usage"]:
-            pass # No arguments needed
-        elif tool_name in ["list_directory", "get_directory_size", "read_file"]:
+            # The only option is the output format; any other input means the default text view.
+            if tool_input.strip().lower() == "json":
+                kwargs["output_format"] = "json"
+        elif tool_name in ["list_directory", "get_directory_size"]:
             from common import normalize_path
             kwargs["path"] = normalize_path(tool_input)
+        elif tool_name == "read_file":
+            # 'path | lines=120-180' and similar: the path plus optional window/search options.
+            from common import normalize_path
+            from file_window import parse_read_request
+            path, options = parse_read_request(tool_input)
+            kwargs["path"] = normalize_path(path)
+            kwargs.update({key: int(value) if key in ("offset", "length", "context") else value
+                           for key, value in options.items()})
         elif tool_name == "run_shell_command":
             kwargs["command"] = tool_input
         else:
             kwargs["query"] = tool_input
 
         # Invoke the tool with the prepared arguments
-        result = tool.invoke(kwargs)
+        with span("agent.tool", tool=tool_name, input=tool_input):
+            result = tool.invoke(kwargs)
         return result
     except Exception as e:
         return f"Error executing tool: {str(e)}"
 
-def run_agent(llm, question, max_iterations=5, verbose=True):
+def execute_tools(actions, tools=TOOLS_MAP):
     """
-    Run a simplified ReAct agent with strict observation enforcement.
+    Execute a batch of independent actions concurrently, each with its own timeout
+    (a single action too), and return their outputs in action order.
+    A tool's timeout runs from when it starts; a tool still waiting for a worker after
+    that long is not started at all.
     """
-    tool_descriptions = get_tool_descriptions()
-    
-    # Get current user and working directory for context
-    current_user = os.getenv("USER", "unknown_user")
-    current_dir = os.getcwd()
-    
-    prompt_template = """You are ARK, a helpful assistant. Answer the user's question.
+    start_times = [None] * len(actions)
+    started = [threading.Event() for _ in actions]
+
+    def run(index, tool_name, tool_input):
+        start_times[index] = time.monotonic()
+        started[index].set()
+        return execute_tool(tool_name, tool_input, tools)
+
+    run = tracer.wrap(run)
+    submitted = time.monotonic()
+    with _tool_executor_lock:
+        executor = _tool_executor
+        futures = [executor.submit(run, i, tool_name, tool_input) for i, (tool_name, tool_input) in enumerate(actions)]
+
+    results = []
+    for i, (tool_name, _) in enumerate(actions):
+        timeout = TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+        if not started[i].wait(timeout=max(0.0, submitted + timeout - time.monotonic())) and futures[i].cancel():
+            results.append(f"Error: Tool '{tool_name}' was not started (no free worker within {timeout} seconds).")
+            continue
+        started[i].wait() # Cancelling failed: a worker has just picked it up
+        try:
+            result = futures[i].result(timeout=max(0.0, start_times[i] + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            _retire_tool_executor(executor)
+            result = f"Error: Tool '{tool_name}' timed out after {timeout} seconds."
+        results.append(str(result))
+    return results
+
+AGENT_PROMPT_PREFIX = """You are ARK, a helpful assistant. Answer the user's question.
 
 System Context:
 - Current User: {current_user}
@@ -126,98 +250,141 @@ INSTRUCTIONS:
    - **IMPORTANT**: A "collection" is a database, NOT a file directory. You CANNOT create it with `mkdir`. You MUST use the `run_shell_command` tool to execute the provided scripts (`gather_system_info.sh`, `ingest.py`). Do NOT invent your own commands.
    - If you need more information and there is no actionable error, use the most appropriate tool. Respond with `Thought`, `Action`, `Action Input`.
    - **Path Recovery Strategy**: If a file or directory operation fails with an error like "No such file or directory" or "not found", DO NOT repeat the same command. Your next action MUST be to use `list_directory` on the parent directory to investigate the correct spelling or path. Analyze the output to find the correct name, then retry your original goal.
-   - **For summarization requests**: If asked to summarize or explain files in a directory, your process MUST be: 1. Use `list_directory` to see the files. 2. Use the `read_file` tool on each relevant file in a loop. 3. Once you have the content, provide a `Final Answer` summarizing the information.
+   - **Batch independent actions**: When you need several tool calls that do not depend on each other (e.g. reading several files), put them all in the same step as consecutive `Action`/`Action Input` pairs (at most {max_actions}). They run in parallel and their results come back together in one `Observation`, numbered in the same order.
+   - **For summarization requests**: If asked to summarize or explain files in a directory, your process MUST be: 1. Use `list_directory` to see the files. 2. Use `read_file` on all relevant files at once, with one `Action`/`Action Input` pair per file in a single step. 3. Once you have the content, provide a `Final Answer` summarizing the information.
    - If you have enough information to answer, respond with `Thought` and `Final Answer`.
 3. **Use one of the following formats**:
 
-Format 1 (Use a tool):
+Format 1 (Use one or more tools):
 Thought: [Your reasoning]
 Action: [one of: {tool_names}]
 Action Input: [The input for the tool]
+(optionally more independent Action / Action Input pairs)
 
 Format 2 (Provide the final answer):
 Thought: [Your reasoning for the final answer]
 Final Answer: [The complete answer to the user's question]
 
+"""
+
+# Appended after the fixed prefix. The question comes first and the history is only ever
+# appended to, so consecutive iterations share as long a prompt prefix as possible.
+AGENT_PROMPT_STEPS = """Question: {question}
+
 Previous steps:
 {history}
-
-Question: {question}
 Thought:"""
 
-    tool_names = ", ".join(TOOLS_MAP.keys())
-    history = ""
-    
+def build_prompt_prefix(tools=TOOLS_MAP):
+    """
+    Build the fixed instruction/tool-description block of the agent prompt.
+    It is identical for every iteration and every question of a session, so Ollama
+    can reuse its KV cache for it instead of re-processing it on each call.
+    """
+    return AGENT_PROMPT_PREFIX.format(
+        tool_descriptions=get_tool_descriptions(tools),
+        current_user=os.getenv("USER", "unknown_user"),
+        current_dir=os.getcwd(),
+        tool_names=", ".join(tools.keys()),
+        max_actions=MAX_ACTIONS_PER_STEP,
+    )
+
+def run_agent(llm, question, max_iterations=5, verbose=True, stats=None, tools=None):
+    """
+    Run a simplified ReAct agent with strict observation enforcement.
+
+    :param stats: Optional list; one dict per iteration with the estimated prompt tokens,
+                  the history tokens and the LLM latency is appended to it.
+    :param tools: The tools the agent may use, {name: tool}; defaults to TOOLS_MAP.
+    """
+    tools = TOOLS_MAP if tools is None else tools
+    prompt_prefix = build_prompt_prefix(tools)
+    history = AgentHistory()
+
     # Check if it's a capability question first
     capability_keywords = ["what can you do", "who are you", "what are you", "your capabilities", "introduce yourself"]
     if any(kw in question.lower() for kw in capability_keywords):
         return "I am ARK, a helpful AI assistant. I can help you with:\n• Checking disk usage (get_disk_usage)\n• Checking RAM usage (get_ram_usage)\n• Checking CPU usage (get_cpu_usage)\n• Listing directory contents (list_directory)\n• Answering questions about your system configuration (query_system_knowledge)\n• Answering questions about your project code (query_project_knowledge)", []
     
-    for iteration in range(max_iterations):
-        if verbose:
-            print(f"\n{'─'*70}")
-            print(f"🔄 Iteration {iteration + 1}")
-            print(f"{'─'*70}")
+    # One trace per question: LLM steps, parsing and tool calls (and the retrievals they run) are its children.
+    with span("agent.run", question=question):
+        for iteration in range(max_iterations):
+            if verbose:
+                print(f"\n{'─'*70}")
+                print(f"🔄 Iteration {iteration + 1}")
+                print(f"{'─'*70}")
         
-        # Build prompt
-        current_prompt = prompt_template.format(
-            tool_descriptions=tool_descriptions,
-            current_user=current_user,
-            current_dir=current_dir,
-            tool_names=tool_names,
-            history=history,
-            question=question
-        )
+            # Build prompt: fixed prefix + question + bounded history
+            current_prompt = prompt_prefix + AGENT_PROMPT_STEPS.format(question=question, history=history.render())
         
-        # Get LLM response
-        response = llm.invoke(current_prompt)
+            # Get LLM response (streamed, stopping early once an action is complete)
+            start_time = time.perf_counter()
+            response, stopped_early = generate_step(llm, current_prompt)
+            iteration_stats = {
+                "iteration": iteration + 1,
+                "prompt_tokens": estimate_tokens(current_prompt),
+                "history_tokens": history.tokens(),
+                "output_tokens": estimate_tokens(response),
+                "stopped_early": stopped_early,
+                "llm_seconds": time.perf_counter() - start_time,
+            }
+            if stats is not None:
+                stats.append(iteration_stats)
         
-        if verbose:
-            print(f"\n💭 LLM Output:")
-            print(response)
+            if verbose:
+                print(f"\n💭 LLM Output:")
+                print(response)
+                print(f"\n📊 Prompt ~{iteration_stats['prompt_tokens']} tokens "
+                      f"(history ~{iteration_stats['history_tokens']}), output ~{iteration_stats['output_tokens']} tokens"
+                      f"{' (stopped early)' if stopped_early else ''}, LLM {iteration_stats['llm_seconds']:.2f}s")
         
-        # Parse thought and action (ignore everything else)
-        thought, action_name, action_input, final_answer = parse_thought_and_action(response)
+            # Parse thought and action (ignore everything else)
+            with span("agent.parse"):
+                thought, actions, final_answer = parse_thought_and_action(response)
         
-        if final_answer:
-            if verbose:
-                print("\n✅ Agent decided to provide a final answer.")
-            return final_answer, [response]
+            if final_answer:
+                if verbose:
+                    print("\n✅ Agent decided to provide a final answer.")
+                return final_answer, [response]
 
-        if not action_name:
-            if verbose:
-                print("\n⚠️ No action or final answer found. Returning last thought.")
-            return thought or "I'm not sure how to proceed.", [response]
+            if not actions:
+                if verbose:
+                    print("\n⚠️ No action or final answer found. Returning last thought.")
+                return thought or "I'm not sure how to proceed.", [response]
         
-        if verbose:
-            print(f"\n🔧 Executing Tool: {action_name}")
-            print(f"📥 Input: {action_input if action_input else '(none)'}")
+            if verbose:
+                for action_name, action_input in actions:
+                    print(f"\n🔧 Executing Tool: {action_name}")
+                    print(f"📥 Input: {action_input if action_input else '(none)'}")
         
-        # Execute the tool
-        observation = execute_tool(action_name, action_input)
+            # Execute the tool(s); a batch runs concurrently, its results are merged into one observation
+            results = execute_tools(actions, tools)
+            observation = format_observation(actions, results)
         
-        if verbose:
-            print(f"\n📤 Tool Output:")
-            print(observation[:500] + "..." if len(observation) > 500 else observation)
+            if verbose:
+                print(f"\n📤 Tool Output:")
+                print(observation[:500] + "..." if len(observation) > 500 else observation)
         
-        # Append the observation to the history for the next iteration
-        history += f"""Thought: {thought}
-Action: {action_name}
-Action Input: {action_input}
-Observation: {observation}\n"""
+            # Append the observation to the history for the next iteration (capped and compacted as needed)
+            history.add_step(thought, actions, results)
     
-    return "I wasn't able to complete this task within the iteration limit.", []
+        return "I wasn't able to complete this task within the iteration limit.", []
 
-def main():
+def main(warmup: bool = False, sample_metrics: bool = False):
     """
     Main function to run the Unified ARK Agent.
+
+    :param warmup: Load the RAG components in a background thread once the prompt is shown,
+                   instead of on the first knowledge-base query.
+    :param sample_metrics: Sample CPU usage in a background thread, so get_cpu_usage reports
+                           an average over the last seconds without blocking.
     """
     print("\n" + "="*70)
     print(" "*20 + "🤖 ARK AGENT v2.2")
     print("="*70)
     print("\nInitializing...")
 
-    llm = OllamaLLM(model=LLM_MODEL_NAME, temperature=0)
+    llm = OllamaLLM(model=LLM_MODEL_NAME, temperature=0, keep_alive=LLM_KEEP_ALIVE)
     
     print(f"✓ LLM Model: {LLM_MODEL_NAME}")
     print(f"✓ Tools loaded: {', '.join(TOOLS_MAP.keys())}")
@@ -237,6 +404,13 @@ def main():
     print("  • What can you do?")
     print("="*70 + "\n")
 
+    if warmup:
+        from rag_utils import warm_up_in_background
+        warm_up_in_background()
+    if sample_metrics:
+        from system_metrics import start_sampler
+        start_sampler()
+
     verbose = True
 
     while True:
@@ -293,4 +467,8 @@ def main():
     print("="*70 + "\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the ARK agent.")
+    parser.add_argument("--warmup", action="store_true", help="Preload the RAG model and database in the background after startup.")
+    parser.add_argument("--sample-metrics", action="store_true", help="Sample CPU usage in the background for averaged, instant readings.")
+    args = parser.parse_args()
+    main(warmup=args.warmup, sample_metrics=args.sample_metrics)
\ No newline at end of file
@@ -0,0 +1,272 @@
+import os
+import re
+import json
+import heapq
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import is_under
+from tracing import span, tracer
+
+# --- CONFIGURATION ---
+SHARD_CATALOG_FILE = "shards.json" # Kept in the database directory
+SHARD_CATALOG_PATH = os.path.join("db", SHARD_CATALOG_FILE)
+SHARD_STRATEGIES = ["directory", "hash"]
+DEFAULT_HASH_SHARDS = 8 # Physical collections of a logical collection sharded by hash
+SHARD_QUERY_WORKERS = 8 # Shards searched at the same time
+MAX_COLLECTION_NAME = 63 # Chroma's limit on collection names
+SHARD_KEY_HASH_CHARS = 8 # Hash suffix that keeps slugged shard keys distinct
+FILES_SHARD_KEY = "files" # Directory strategy: files directly in the root, or outside it
+
+# Shared pool for shard queries: created once, never shut down.
+_query_executor = ThreadPoolExecutor(max_workers=SHARD_QUERY_WORKERS, thread_name_prefix="ark-shard")
+
+# Chroma collection names: 3-63 characters from [A-Za-z0-9._-], alphanumeric at both ends, no '..'.
+_VALID_COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{1,%d}[A-Za-z0-9]" % (MAX_COLLECTION_NAME - 2))
+
+def is_valid_collection_name(name: str) -> bool:
+    return bool(_VALID_COLLECTION_NAME.fullmatch(name)) and ".." not in name
+
+def _shard_name(collection_name: str, key: str) -> str:
+    """
+    Physical collection name for a shard key, e.g. 'ark_project_knowledge__d-src'.
+    Keys that are not valid in a Chroma name, or too long, are slugged and given a hash suffix.
+    Raises ValueError if no valid name can be made (the collection name itself is too long).
+    """
+    slug = re.sub(r"\.{2,}", ".", re.sub(r"[^A-Za-z0-9._-]+", "-", key)).strip("._-")
+    room = MAX_COLLECTION_NAME - len(collection_name) - 2
+    if slug != key or len(slug) > room:
+        suffix = hashlib.sha1(key.encode("utf-8")).hexdigest()[:SHARD_KEY_HASH_CHARS]
+        slug = f"{slug[:max(room - SHARD_KEY_HASH_CHARS - 1, 0)].rstrip('._-')}-{suffix}".lstrip("-")
+    name = f"{collection_name}__{slug}"
+    if not is_valid_collection_name(name):
+        raise ValueError(f"Cannot name a shard of collection '{collection_name}' validly for Chroma: '{name}'.")
+    return name
+
+class ShardLayout:
+    """
+    How a logical collection is split into physical Chroma collections:
+    - 'directory': one shard per top-level directory under 'root' (the path of the first
+      sharded ingest), plus one for files directly in it or outside it. Shards are added
+      as new top-level directories are ingested.
+    - 'hash': 'count' shards, chosen by a hash of the source path.
+    Every chunk of a file lives in the same shard, so a file is updated or deleted in one shard.
+    """
+    def __init__(self, collection_name: str, strategy: str, count: int = DEFAULT_HASH_SHARDS,
+                 root: str = None, shards: list = None):
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy '{strategy}'. Choose one of: {', '.join(SHARD_STRATEGIES)}")
+        if len(collection_name) + 2 + SHARD_KEY_HASH_CHARS > MAX_COLLECTION_NAME:
+            raise ValueError(f"Collection name '{collection_name}' is too long to shard "
+                             f"(at most {MAX_COLLECTION_NAME - 2 - SHARD_KEY_HASH_CHARS} characters).")
+        self.collection_name = collection_name
+        self.strategy = strategy
+        self.count = count if strategy == "hash" else None
+        self.root = root
+        if shards is None:
+            shards = [self._hash_shard(i) for i in range(count)] if strategy == "hash" else []
+        self.shards = list(shards)
+
+    @classmethod
+    def from_dict(cls, collection_name: str, data: dict):
+        return cls(collection_name, data["strategy"], count=data.get("count"), root=data.get("root"),
+                   shards=data.get("shards"))
+
+    def to_dict(self) -> dict:
+        data = {"strategy": self.strategy, "shards": self.shards}
+        if self.strategy == "hash":
+            data["count"] = self.count
+        else:
+            data["root"] = self.root
+        return data
+
+    def describe(self) -> str:
+        if self.strategy == "hash":
+            return f"hash of the source path into {self.count} shards"
+        return f"top-level directory under '{self.root}' ({len(self.shards)} shards so far)"
+
+    def _hash_shard(self, index: int) -> str:
+        return _shard_name(self.collection_name, f"h{index:02d}")
+
+    def _directory_shard(self, top_level: str) -> str:
+        return _shard_name(self.collection_name, f"d-{top_level}" if top_level else FILES_SHARD_KEY)
+
+    def _top_level(self, path: str) -> str:
+        """The top-level directory under the root that 'path' is in, or '' if there is none."""
+        if not is_under(path, self.root) or path == self.root:
+            return ""
+        parts = os.path.relpath(path, self.root).split(os.sep)
+        return parts[0] if len(parts) > 1 else ""
+
+    def shard_for(self, source: str) -> str:
+        """Return the physical collection name holding the chunks of 'source', registering new shards."""
+        if self.strategy == "hash":
+            digest = hashlib.sha1(source.encode("utf-8")).digest()
+            return self.shards[int.from_bytes(digest[:8], "big") % self.count]
+        name = self._directory_shard(self._top_level(source))
+        if name not in self.shards:
+            self.shards.append(name)
+        return name
+
+    def shards_for_target(self, kind: str, path: str) -> list:
+        """
+        Return the shards that can hold chunks selected by a delete_from_ark.py target
+        ('file', 'directory', 'file or directory' or 'glob' of an absolute path or pattern).
+        """
+        if self.strategy == "hash":
+            # A hash spreads every directory over all shards; only a single file has a known home.
+            return [self.shard_for(path)] if kind == "file" else list(self.shards)
+
+        if kind == "glob":
+            literal = path[:min(path.index(c) for c in "*?[" if c in path)]
+            root = self.root.rstrip(os.sep) + os.sep
+            if literal.startswith(root) and os.sep in literal[len(root):]:
+                candidates = [self._directory_shard(literal[len(root):].split(os.sep)[0])]
+            elif literal.startswith(root) or root.startswith(literal):
+                return list(self.shards) # The wildcard can match any top-level directory
+            else:
+                candidates = [self._directory_shard("")]
+        elif is_under(self.root, path):
+            return list(self.shards) # The root itself or one of its parents
+        elif not is_under(path, self.root):
+            candidates = [self._directory_shard("")]
+        elif os.sep in os.path.relpath(path, self.root) or kind == "directory":
+            candidates = [self._directory_shard(os.path.relpath(path, self.root).split(os.sep)[0])]
+        elif kind == "file":
+            candidates = [self._directory_shard("")]
+        else:
+            # A deleted entry directly under the root may have been a top-level directory or a file.
+            candidates = [self._directory_shard(os.path.relpath(path, self.root)), self._directory_shard("")]
+        return [name for name in candidates if name in self.shards]
+
+class ShardCatalog:
+    """
+    The shard layouts of all sharded collections, stored as one small JSON file
+    ({collection name: layout}) next to the Chroma database. Collections missing
+    from the catalog are ordinary, unsharded collections.
+    """
+    def __init__(self, path: str = SHARD_CATALOG_PATH):
+        self.path = path
+        self.layouts = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.layouts = json.load(f).get("collections", {})
+
+    def get(self, collection_name: str):
+        """Return the collection's ShardLayout, or None if it is not sharded."""
+        data = self.layouts.get(collection_name)
+        return ShardLayout.from_dict(collection_name, data) if data else None
+
+    def put(self, layout: ShardLayout):
+        self.layouts[layout.collection_name] = layout.to_dict()
+
+    def save(self):
+        """Write the catalog atomically, like the ingestion manifests."""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"collections": self.layouts}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+class ShardedCollection:
+    """
+    The physical shards of a logical collection, used like a single Chroma collection:
+    upsert() sends each chunk to the shard of its 'source', query() searches the shards
+    concurrently and merges their results by distance, count() adds up the shards.
+    With create=True (ingest.py), missing shards are created on first write; otherwise
+    shards that do not exist (yet) are treated as empty.
+    """
+    def __init__(self, client, layout: ShardLayout, create: bool = False):
+        self.client = client
+        self.layout = layout
+        self.name = layout.collection_name
+        self.create = create
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def shard(self, shard_name: str):
+        """Return the Chroma collection of one shard, or None if it does not exist."""
+        if shard_name not in self._shards:
+            if self.create:
+                collection = self.client.get_or_create_collection(name=shard_name, metadata={"hnsw:space": "cosine"})
+            else:
+                try:
+                    collection = self.client.get_collection(name=shard_name)
+                except ValueError:
+                    collection = None
+            with self._lock:
+                self._shards.setdefault(shard_name, collection)
+        return self._shards[shard_name]
+
+    def for_source(self, source: str):
+        """Return the shard holding the chunks of 'source', or None if it does not exist."""
+        return self.shard(self.layout.shard_for(source))
+
+    def collections(self, shard_names: list = None) -> list:
+        """Return (shard name, collection) for the existing shards, all of them by default."""
+        names = self.layout.shards if shard_names is None else shard_names
+        return [(name, collection) for name, collection in ((name, self.shard(name)) for name in names)
+                if collection is not None]
+
+    def upsert(self, ids: list, embeddings, documents: list, metadatas: list):
+        groups = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.layout.shard_for(metadata["source"]), []).append(i)
+        for shard_name, indices in groups.items():
+            self.shard(shard_name).upsert(
+                ids=[ids[i] for i in indices], embeddings=[embeddings[i] for i in indices],
+                documents=[documents[i] for i in indices], metadatas=[metadatas[i] for i in indices],
+            )
+
+    def delete(self, ids: list):
+        """Delete chunks by ID from every shard; use for_source() when the file is known."""
+        for _, collection in self.collections():
+            collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return sum(collection.count() for _, collection in self.collections())
+
+    def query(self, query_embeddings, n_results: int = 10, include: list = None, **kwargs) -> dict:
+        """
+        Search every shard for the n_results nearest chunks of each query, at the same time,
+        and keep the overall n_results nearest. Returns the same structure as Collection.query().
+        """
+        include = list(include or ["documents", "metadatas", "distances"])
+        if "distances" not in include:
+            include.append("distances") # Needed to merge the shards' results
+
+        def query_shard(shard_name, collection):
+            with span("rag.shard_query", shard=shard_name):
+                return collection.query(query_embeddings=query_embeddings, n_results=n_results, include=include, **kwargs)
+
+        query_shard = tracer.wrap(query_shard)
+        futures = [_query_executor.submit(query_shard, name, collection) for name, collection in self.collections()]
+        results = [future.result() for future in futures]
+
+        fields = ["ids"] + include
+        merged = {field: [] for field in fields}
+        for i in range(len(query_embeddings)):
+            candidates = [(result["distances"][i][j], shard, j)
+                          for shard, result in enumerate(results) for j in range(len(result["ids"][i]))]
+            nearest = heapq.nsmallest(n_results, candidates)
+            for field in fields:
+                merged[field].append([results[shard][field][i][j] for _, shard, j in nearest])
+        return merged
+
+def open_collection(client, collection_name: str, catalog_path: str = SHARD_CATALOG_PATH):
+    """
+    Return a collection by its logical name: a ShardedCollection if the catalog has a layout
+    for it, else the Chroma collection itself (raises ValueError if it does not exist).
+    """
+    layout = ShardCatalog(catalog_path).get(collection_name)
+    if layout is None:
+        return client.get_collection(name=collection_name)
+    return ShardedCollection(client, layout)
+
+def physical_collections(collection) -> list:
+    """Return the Chroma collections behind a collection returned by open_collection()."""
+    if isinstance(collection, ShardedCollection):
+        return [shard for _, shard in collection.collections()]
+    return [collection]
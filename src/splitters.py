@@ -0,0 +1,281 @@
+import os
+import re
+import ast
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+DEFAULT_CHUNK_SIZE = 1200 # Characters per chunk of the character splitter
+DEFAULT_CHUNK_OVERLAP = 200 # Overlap of the character splitter used for prose and unknown types
+OVERSIZE_OVERLAP = 100 # Overlap when a single unit (a huge function or section) must be cut
+# Whole units are packed into chunks of up to this multiple of the chunk size: one 1400-character
+# function embeds better than two overlapping halves, and it still fits the embedding model's window.
+UNIT_SLACK = 1.25
+MAX_SYMBOLS = 8 # Symbol names stored per chunk
+
+# --- Segmenters ---
+# Each returns contiguous (start, end, symbol) character ranges covering the whole text, one per
+# unit (a function, a class, a module, a section) or stretch of code between units (symbol None),
+# or None when the text cannot be parsed and should go to the character splitter instead.
+
+def _line_starts(text: str) -> list:
+    starts = [0]
+    position = text.find("\n")
+    while position >= 0:
+        starts.append(position + 1)
+        position = text.find("\n", position + 1)
+    return starts
+
+def _python_segments(body: list, text: str, lines: list, start: int, end: int, prefix: str, max_chars: int) -> list:
+    segments, position = [], start
+    outer = prefix.rstrip(".") or None
+    for node in body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        # Comment lines directly above a definition belong to it.
+        while first_line > 1 and text[lines[first_line - 2]:lines[first_line - 1]].lstrip().startswith("#"):
+            first_line -= 1
+        node_start = max(lines[first_line - 1], position)
+        node_end = lines[node.end_lineno] if node.end_lineno < len(lines) else len(text)
+        if node_start > position:
+            segments.append((position, node_start, outer))
+        name = prefix + node.name
+        if isinstance(node, ast.ClassDef) and node_end - node_start > max_chars:
+            # Too big for one chunk: its header and attributes, then each method on its own.
+            segments.extend(_python_segments(node.body, text, lines, node_start, node_end, name + ".", max_chars))
+        else:
+            segments.append((node_start, node_end, name))
+        position = node_end
+    if position < end:
+        segments.append((position, end, outer))
+    return segments
+
+def split_python(text: str, max_chars: int):
+    """Top-level functions and classes (methods, for classes larger than a chunk) from the AST."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    return _python_segments(tree.body, text, _line_starts(text), 0, len(text), "", max_chars)
+
+# Comments, string and character literals and preprocessor lines are skipped as a whole,
+# so braces and semicolons inside them do not count.
+_C_TOKENS = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|^[ \t]*#(?:\\\n|[^\n])*|[{};]', re.M | re.S)
+_C_COMMENTS = re.compile(r'//[^\n]*|/\*.*?\*/', re.S)
+_C_CONTAINER = re.compile(r'\b(namespace|extern\s*"C(?:\+\+)?"|class|struct|union|enum)\b(?:\s+(?:class\s+)?([A-Za-z_]\w*))?')
+_C_CALLABLE = re.compile(r'(~?[A-Za-z_][\w:]*(?:\s*<[^(){};]*>)?|operator\s*[^\s(]+)\s*\(')
+_C_NOT_NAMES = {"if", "for", "while", "switch", "return", "sizeof", "__attribute__", "__declspec", "alignas", "decltype"}
+
+def _c_block(header: str):
+    """Classify the declaration before a top-level '{': ('function'|'container'|'type'|'other', name)."""
+    header = _C_COMMENTS.sub(" ", header).strip()
+    if header.endswith(")") or re.search(r"\)\s*(const|override|final|noexcept|->[^;]*|:[^;]*)\s*$", header):
+        for match in _C_CALLABLE.finditer(header):
+            if match.group(1) not in _C_NOT_NAMES:
+                return "function", match.group(1).replace(" ", "")
+    container = _C_CONTAINER.search(header)
+    if container and "=" not in header[:container.start()]:
+        keyword = container.group(1).split()[0]
+        name = container.group(2) or ("extern" if keyword == "extern" else None)
+        return ("container" if keyword in ("namespace", "extern") else "type"), name
+    return "other", None
+
+def _c_segments(text: str, start: int, end: int, prefix: str, max_chars: int):
+    segments, boundary, depth, block = [], start, 0, None # block: (kind, name, open brace, close brace)
+
+    def close_unit(unit_end):
+        kind, name, brace, close = block
+        scoped = name and name != "extern" # extern "C" blocks add no scope
+        symbol = prefix + name if scoped else (prefix.rstrip(":") or None)
+        if kind in ("container", "type") and unit_end - boundary > max_chars:
+            # A namespace, extern "C" block or class larger than a chunk: split its body like a top level.
+            inner = _c_segments(text, brace + 1, close, prefix + name + "::" if scoped else prefix, max_chars)
+            if inner is not None:
+                return [(boundary, brace + 1, symbol)] + inner + [(close, unit_end, symbol)]
+        return [(boundary, unit_end, symbol)]
+
+    for match in _C_TOKENS.finditer(text, start, end):
+        token = match.group()
+        if token == "{":
+            if depth == 0:
+                if block is not None: # A type's block was not followed by ';' (e.g. 'struct s {...} f() {')
+                    segments.extend(close_unit(block[3] + 1))
+                    boundary = block[3] + 1
+                kind, name = _c_block(text[boundary:match.start()])
+                block = [kind, name, match.start(), None]
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0 and block is not None:
+                block[3] = match.end() - 1
+                if block[0] in ("function", "container"):
+                    # Function and namespace bodies end at their brace; types and initializers at the next ';'.
+                    segments.extend(close_unit(match.end()))
+                    boundary, block = match.end(), None
+        elif depth == 0 and (token == ";" or token.lstrip().startswith("#")):
+            if block is not None and block[3] is not None:
+                segments.extend(close_unit(match.end()))
+                block = None
+            else:
+                segments.append((boundary, match.end(), None))
+            boundary = match.end()
+    if depth != 0:
+        return None
+    if block is not None and block[3] is not None:
+        segments.extend(close_unit(block[3] + 1))
+        boundary = block[3] + 1
+    if boundary < end:
+        segments.append((boundary, end, None))
+    return segments
+
+def split_c(text: str, max_chars: int):
+    """Top-level functions, structs/classes/enums and statements, found by brace matching."""
+    return _c_segments(text, 0, len(text), "", max_chars)
+
+_VERILOG_UNIT = re.compile(
+    r'^[ \t]*(?:virtual[ \t]+)?(module|macromodule|interface|package|program|class|primitive)\b'
+    r'[ \t]+(?:(?:automatic|static)[ \t]+)?([A-Za-z_]\w*)', re.M)
+
+def split_verilog(text: str, max_chars: int):
+    """module ... endmodule (and interfaces, packages, programs, classes), with the comments above them."""
+    segments, position = [], 0
+    for match in _VERILOG_UNIT.finditer(text):
+        if match.start() < position:
+            continue # Nested in the previous unit (e.g. a class in a package)
+        keyword = "module" if match.group(1) == "macromodule" else match.group(1)
+        # The first end<keyword> outside comments and strings closes the unit.
+        end_pattern = re.compile(rf'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\bend{keyword}\b[^\n]*\n?', re.S)
+        end_match = next((m for m in end_pattern.finditer(text, match.end()) if m.group().startswith("end")), None)
+        if end_match is None:
+            break # Unterminated; the rest stays in the trailing segment
+        segments.append((position, end_match.end(), match.group(2)))
+        position = end_match.end()
+    if not segments:
+        return None
+    if position < len(text):
+        segments.append((position, len(text), None))
+    return segments
+
+def _section_segments(text: str, headings: list):
+    """Sections from [(offset, level, title)] headings; a section's symbol is its heading path."""
+    if not headings:
+        return None
+    segments, path = [], []
+    if headings[0][0] > 0:
+        segments.append((0, headings[0][0], None))
+    for i, (offset, level, title) in enumerate(headings):
+        path = [entry for entry in path if entry[0] < level] + [(level, title)]
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        segments.append((offset, end, " > ".join(entry[1] for entry in path)))
+    return segments
+
+def split_markdown(text: str, max_chars: int):
+    """Heading sections ('#' to '######'), ignoring '#' lines inside fenced code blocks."""
+    headings, fence, offset = [], None, 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.lstrip()
+        if stripped.startswith(("```", "~~~")):
+            marker = stripped[:3]
+            fence = None if fence == marker else (fence or marker)
+        elif fence is None:
+            match = re.match(r"(#{1,6})[ \t]+(.+?)[ \t#]*$", line.rstrip("\n"))
+            if match:
+                headings.append((offset, len(match.group(1)), match.group(2)))
+        offset += len(line)
+    return _section_segments(text, headings)
+
+_RST_UNDERLINE = re.compile(r'^([=\-~^"\'`#*+:.])\1{2,}[ \t]*$')
+
+def split_rst(text: str, max_chars: int):
+    """reStructuredText sections: a title underlined (and optionally overlined) with punctuation."""
+    lines = text.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    headings, styles = [], [] # Heading levels follow the order in which underline styles first appear
+    for i in range(1, len(lines)):
+        title, underline = lines[i - 1].strip(), lines[i].strip()
+        if not title or not _RST_UNDERLINE.match(underline) or len(underline) < len(title) or _RST_UNDERLINE.match(title):
+            continue
+        overlined = i >= 2 and lines[i - 2].strip() == underline
+        style = (underline[0], overlined)
+        if style not in styles:
+            styles.append(style)
+        headings.append((offsets[i - 2] if overlined else offsets[i - 1], styles.index(style) + 1, title))
+    return _section_segments(text, headings)
+
+# Map of file extension to the segmenter used for it; other types use the character splitter.
+SPLITTER_REGISTRY = {
+    ".py": split_python,
+    ".c": split_c, ".h": split_c, ".cpp": split_c, ".hpp": split_c,
+    ".v": split_verilog, ".sv": split_verilog, ".svh": split_verilog,
+    ".md": split_markdown, ".rst": split_rst,
+}
+
+def get_splitter(path: str):
+    """Return the segmenter registered for a file's extension, or None."""
+    return SPLITTER_REGISTRY.get(os.path.splitext(path)[1].lower())
+
+class LanguageAwareSplitter:
+    """
+    Splits documents at the boundaries of their language's units, so functions, modules and
+    sections are kept whole. Adjacent small units are packed together, without overlap, up to
+    chunk_size * UNIT_SLACK; a unit larger than that is cut by the character splitter with a
+    small overlap.
+    Every chunk carries 'start_index' and, for code and sections, the 'symbols' it contains.
+    File types without a segmenter (and files that fail to parse) use the plain character splitter.
+    """
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_overlap: int = DEFAULT_CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.max_unit_chars = int(chunk_size * UNIT_SLACK)
+        self.fallback = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+        self.oversize = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=OVERSIZE_OVERLAP, add_start_index=True)
+
+    def split_documents(self, documents: list) -> list:
+        chunks = []
+        for document in documents:
+            segmenter = get_splitter(document.metadata.get("source", ""))
+            segments = segmenter(document.page_content, self.max_unit_chars) if segmenter else None
+            if segments is None:
+                chunks.extend(self.fallback.split_documents([document]))
+            else:
+                chunks.extend(self._pack(document, segments))
+        return chunks
+
+    def _chunk(self, document, start: int, text: str, symbols: list):
+        metadata = dict(document.metadata, start_index=start)
+        if symbols:
+            metadata["symbols"] = ", ".join(symbols[:MAX_SYMBOLS])
+        return Document(page_content=text, metadata=metadata)
+
+    def _pack(self, document, segments: list) -> list:
+        text = document.page_content
+        chunks, start, end, symbols = [], None, None, []
+
+        def flush():
+            if start is not None and text[start:end].strip():
+                chunks.append(self._chunk(document, start, text[start:end], symbols))
+
+        for seg_start, seg_end, symbol in segments:
+            if seg_end - seg_start > self.max_unit_chars:
+                flush()
+                start, symbols = None, []
+                cursor = seg_start
+                for piece in self.oversize.split_text(text[seg_start:seg_end]):
+                    offset = text.find(piece, cursor)
+                    cursor = offset + 1
+                    chunks.append(self._chunk(document, offset, piece, [symbol] if symbol else []))
+                continue
+            if start is not None and seg_end - start > self.max_unit_chars:
+                flush()
+                start, symbols = None, []
+            if start is None:
+                start = seg_start
+            end = seg_end
+            if symbol and symbol not in symbols:
+                symbols.append(symbol)
+        flush()
+        return chunks
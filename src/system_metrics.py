@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+
+# --- CONFIGURATION ---
+PROC_DIR = "/proc"
+CPU_SAMPLE_INTERVAL = 0.2 # Seconds between the two /proc/stat reads when no sampler is running
+SAMPLER_INTERVAL = 1.0 # Seconds between background samples
+SAMPLER_WINDOW = 60 # Samples kept in the ring buffer (one minute at the default interval)
+CPU_AVERAGE_SECONDS = 5.0 # CPU usage reported by the sampler is averaged over this many seconds
+METRICS_CACHE_TTL = 1.0 # Seconds a computed reading is served from the cache
+# Filesystems that report the size of a real (or network) volume; pseudo filesystems are skipped.
+DISK_FS_TYPES = {
+    "ext2", "ext3", "ext4", "xfs", "btrfs", "zfs", "f2fs", "jfs", "reiserfs", "vfat", "exfat",
+    "ntfs", "ntfs3", "fuseblk", "hfsplus", "apfs", "nfs", "nfs4", "cifs", "smb3", "overlay",
+}
+CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+def format_bytes(size: float) -> str:
+    """Human-readable size in powers of 1024, like 'df -h' and 'free -h'."""
+    for unit in ("B", "K", "M", "G", "T"):
+        if abs(size) < 1024 or unit == "T":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{int(size)}B"
+        size /= 1024
+    return f"{size:.1f}P"
+
+# --- Raw /proc Readers ---
+
+def read_meminfo(proc_dir: str = PROC_DIR) -> dict:
+    """Return /proc/meminfo as a dict of byte counts."""
+    info = {}
+    with open(os.path.join(proc_dir, "meminfo"), "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            parts = value.split()
+            if parts:
+                info[key] = int(parts[0]) * (1024 if len(parts) > 1 and parts[1] == "kB" else 1)
+    return info
+
+def read_cpu_times(proc_dir: str = PROC_DIR) -> dict:
+    """
+    Return the cumulative CPU times from /proc/stat: {'cpu': {...}, 'cpu0': {...}, ...},
+    each mapping CPU_FIELDS to clock ticks.
+    """
+    times = {}
+    with open(os.path.join(proc_dir, "stat"), "r") as f:
+        for line in f:
+            if not line.startswith("cpu"):
+                break
+            parts = line.split()
+            values = [int(v) for v in parts[1:len(CPU_FIELDS) + 1]]
+            values += [0] * (len(CPU_FIELDS) - len(values))
+            times[parts[0]] = dict(zip(CPU_FIELDS, values))
+    return times
+
+def read_loadavg(proc_dir: str = PROC_DIR) -> dict:
+    """Return the load averages and task counts from /proc/loadavg."""
+    with open(os.path.join(proc_dir, "loadavg"), "r") as f:
+        load1, load5, load15, tasks = f.read().split()[:4]
+    running, total = tasks.split("/")
+    return {"load1": float(load1), "load5": float(load5), "load15": float(load15),
+            "tasks_running": int(running), "tasks_total": int(total)}
+
+# /proc/mounts escapes spaces, tabs, newlines and backslashes in paths as \NNN (octal).
+_MOUNT_ESCAPE = re.compile(rb"\\([0-7]{3})")
+
+def _unescape_mount_field(field: bytes) -> str:
+    # Unescape at the byte level, then decode like any file name (non-ASCII names are raw UTF-8).
+    return os.fsdecode(_MOUNT_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), field))
+
+def read_mounts(proc_dir: str = PROC_DIR) -> list:
+    """Return (device, mount point, fs type) of the mounted real filesystems, one per device."""
+    mounts, seen = [], set()
+    with open(os.path.join(proc_dir, "mounts"), "rb") as f:
+        for line in f:
+            parts = [_unescape_mount_field(part) for part in line.split()[:3]]
+            if len(parts) < 3 or parts[2] not in DISK_FS_TYPES or parts[0] in seen:
+                continue
+            seen.add(parts[0])
+            mounts.append((parts[0], parts[1], parts[2]))
+    return mounts
+
+# --- Structured Readings ---
+
+def memory_usage(proc_dir: str = PROC_DIR) -> dict:
+    """RAM and swap usage in bytes, computed the same way as 'free'."""
+    info = read_meminfo(proc_dir)
+    total = info.get("MemTotal", 0)
+    free = info.get("MemFree", 0)
+    buffers = info.get("Buffers", 0)
+    cached = info.get("Cached", 0) + info.get("SReclaimable", 0)
+    swap_total = info.get("SwapTotal", 0)
+    swap_free = info.get("SwapFree", 0)
+    return {
+        "total": total,
+        "used": max(total - free - buffers - cached, 0),
+        "free": free,
+        "shared": info.get("Shmem", 0),
+        "buff_cache": buffers + cached,
+        "available": info.get("MemAvailable", free),
+        "swap_total": swap_total,
+        "swap_used": swap_total - swap_free,
+        "swap_free": swap_free,
+    }
+
+def disk_usage(proc_dir: str = PROC_DIR) -> list:
+    """Size, used and available bytes of every mounted real filesystem, as with 'df'."""
+    disks = []
+    for device, mount_point, fs_type in read_mounts(proc_dir):
+        try:
+            st = os.statvfs(mount_point)
+        except OSError:
+            continue
+        total = st.f_blocks * st.f_frsize
+        available = st.f_bavail * st.f_frsize
+        used = total - st.f_bfree * st.f_frsize
+        disks.append({
+            "device": device, "mount_point": mount_point, "fs_type": fs_type,
+            "total": total, "used": used, "available": available,
+            # Like df, the percentage ignores blocks reserved for root.
+            "percent": round(100.0 * used / (used + available), 1) if used + available else 0.0,
+        })
+    return disks
+
+def cpu_percentages(before: dict, after: dict) -> dict:
+    """Percentage of time spent in each CPU state between two read_cpu_times() readings."""
+    usage = {}
+    for cpu, end in after.items():
+        start = before.get(cpu)
+        if start is None:
+            continue
+        deltas = {field: max(end[field] - start[field], 0) for field in CPU_FIELDS}
+        elapsed = sum(deltas.values())
+        if not elapsed:
+            continue
+        usage[cpu] = {field: round(100.0 * delta / elapsed, 1) for field, delta in deltas.items()}
+        usage[cpu]["busy"] = round(100.0 - usage[cpu]["idle"] - usage[cpu]["iowait"], 1)
+    return usage
+
+def cpu_usage(interval: float = CPU_SAMPLE_INTERVAL, proc_dir: str = PROC_DIR) -> dict:
+    """
+    CPU usage over a short interval plus the load averages. Served from the background
+    sampler (averaged over CPU_AVERAGE_SECONDS, without blocking) when one is running.
+    """
+    sampler = get_sampler()
+    if sampler is not None and sampler.is_running():
+        reading = sampler.cpu_usage()
+        if reading is not None:
+            return reading
+
+    before = read_cpu_times(proc_dir)
+    time.sleep(interval)
+    after = read_cpu_times(proc_dir)
+    return {"interval": interval, "cpus": cpu_percentages(before, after), **read_loadavg(proc_dir)}
+
+# --- Text Views ---
+
+def format_memory(memory: dict) -> str:
+    rows = [
+        f"{'':<6}{'total':>10}{'used':>10}{'free':>10}{'shared':>10}{'buff/cache':>12}{'available':>11}",
+        f"{'Mem:':<6}" + "".join(f"{format_bytes(memory[key]):>{width}}" for key, width in (
+            ("total", 10), ("used", 10), ("free", 10), ("shared", 10), ("buff_cache", 12), ("available", 11))),
+        f"{'Swap:':<6}" + "".join(f"{format_bytes(memory[key]):>10}" for key in ("swap_total", "swap_used", "swap_free")),
+    ]
+    return "\n".join(rows)
+
+def format_disks(disks: list) -> str:
+    rows = [f"{'Filesystem':<24}{'Type':<8}{'Size':>8}{'Used':>8}{'Avail':>8}{'Use%':>6}  Mounted on"]
+    for disk in disks:
+        rows.append(f"{disk['device']:<24}{disk['fs_type']:<8}{format_bytes(disk['total']):>8}"
+                    f"{format_bytes(disk['used']):>8}{format_bytes(disk['available']):>8}"
+                    f"{disk['percent']:>5.0f}%  {disk['mount_point']}")
+    return "\n".join(rows)
+
+def format_cpu(cpu: dict) -> str:
+    total = cpu["cpus"].get("cpu", {})
+    lines = [
+        f"load average: {cpu['load1']:.2f}, {cpu['load5']:.2f}, {cpu['load15']:.2f}   "
+        f"Tasks: {cpu['tasks_running']} running, {cpu['tasks_total']} total",
+        (f"%Cpu(s): {total.get('user', 0.0):.1f} us, {total.get('system', 0.0):.1f} sy, "
+         f"{total.get('nice', 0.0):.1f} ni, {total.get('idle', 0.0):.1f} id, {total.get('iowait', 0.0):.1f} wa, "
+         f"{total.get('irq', 0.0) + total.get('softirq', 0.0):.1f} hi+si, {total.get('steal', 0.0):.1f} st "
+         f"(averaged over {cpu['interval']:.1f}s)"),
+    ]
+    per_cpu = [f"{name}: {usage['busy']:.0f}%" for name, usage in cpu["cpus"].items() if name != "cpu"]
+    if per_cpu:
+        lines.append("Per CPU busy: " + ", ".join(per_cpu))
+    return "\n".join(lines)
+
+# --- Background Sampler ---
+
+class MetricsSampler:
+    """
+    Daemon thread that reads /proc every 'interval' seconds into a ring buffer of the last
+    'window' samples, so CPU usage is a real average over recent seconds instead of a single
+    blocking measurement. Computed readings are cached for 'cache_ttl' seconds, which makes
+    repeated reads a dictionary lookup.
+    """
+    def __init__(self, interval: float = SAMPLER_INTERVAL, window: int = SAMPLER_WINDOW,
+                 cache_ttl: float = METRICS_CACHE_TTL, proc_dir: str = PROC_DIR):
+        self.interval = interval
+        self.cache_ttl = cache_ttl
+        self.proc_dir = proc_dir
+        self.samples = deque(maxlen=window) # (monotonic time, cpu times, loadavg)
+        self._cache = {} # key -> (expires at, reading)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.is_running():
+            return self
+        self._stop.clear()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="ark-metrics-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample(self):
+        sample = (time.monotonic(), read_cpu_times(self.proc_dir), read_loadavg(self.proc_dir))
+        with self._lock:
+            self.samples.append(sample)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except OSError:
+                pass # A transient /proc read error only costs one sample
+
+    def _cached(self, key: str, compute):
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        reading = compute()
+        if reading is not None:
+            self._cache[key] = (now + self.cache_ttl, reading)
+        return reading
+
+    def cpu_usage(self, seconds: float = CPU_AVERAGE_SECONDS):
+        """CPU usage averaged over about the last 'seconds', or None until two samples exist."""
+        def compute():
+            with self._lock:
+                samples = list(self.samples)
+            if len(samples) < 2:
+                return None
+            end = samples[-1]
+            start = next((s for s in samples if end[0] - s[0] <= seconds), samples[0])
+            if start is end:
+                start = samples[-2]
+            return {"interval": end[0] - start[0], "cpus": cpu_percentages(start[1], end[1]), **end[2]}
+        return self._cached(f"cpu:{seconds}", compute)
+
+    def history(self) -> list:
+        """Overall CPU busy percentage between consecutive samples, oldest first."""
+        with self._lock:
+            samples = list(self.samples)
+        return [(b[0], cpu_percentages(a[1], b[1]).get("cpu", {}).get("busy", 0.0))
+                for a, b in zip(samples, samples[1:])]
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def get_sampler():
+    """Return the process-wide sampler, or None if start_sampler() was never called."""
+    return _sampler
+
+def start_sampler(interval: float = SAMPLER_INTERVAL, window: int = SAMPLER_WINDOW) -> MetricsSampler:
+    """Start (once) the process-wide background sampler used by cpu_usage()."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MetricsSampler(interval=interval, window=window)
+        return _sampler.start()
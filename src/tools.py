@@ -1,3 +1,5 @@
+import re
+import json
 import subprocess
 try:
     from langchain.tools import tool
@@ -11,54 +13,61 @@ except Exception:
             return _decorator
         return func
 
-from rag_utils import _rag_utils_instance
-from common import normalize_path
+from rag_utils import get_rag_utils, retrieval_report
+from common import normalize_path, suggestion_hint
+import system_metrics
+from dir_size import get_dir_size_index, format_size_report
+from path_index import get_path_index, extract_path_query
+from file_window import read_window
 
 # --- Tool Definitions ---
 
+def _metric_view(data, text: str, output_format: str) -> str:
+    """Return a metric reading as its text view, or as JSON when output_format is 'json'."""
+    return json.dumps(data) if output_format == "json" else text
+
 @tool
-def get_disk_usage():
+def get_disk_usage(output_format: str = "text"):
     """
-    Returns the disk usage of the system by running 'df -h'.
+    Returns the disk usage (size, used, available, use%) of every mounted filesystem, like 'df -h'.
     Use this for questions about storage space, available disk, or filesystem usage.
     This is the PREFERRED tool for checking disk usage.
-    It does not take any arguments.
+    Leave the input empty for a readable table, or give 'json' for the same figures as JSON.
     """
-    print("\n>>> TOOL: Running 'df -h' command...")
+    print("\n>>> TOOL: Reading disk usage...")
     try:
-        result = subprocess.run(['df', '-h'], capture_output=True, text=True, check=True)
-        return result.stdout
+        disks = system_metrics.disk_usage()
+        return _metric_view(disks, system_metrics.format_disks(disks), output_format)
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
 @tool
-def get_ram_usage():
+def get_ram_usage(output_format: str = "text"):
     """
-    Returns the current RAM (memory) usage, total size, and free space by running 'free -h'.
+    Returns the current RAM (memory) usage, total size, and free space, like 'free -h'.
     This is the PREFERRED tool for any questions about memory or RAM, including total size,
     current usage, or available space.
-    It does not take any arguments.
+    Leave the input empty for a readable table, or give 'json' for the same figures as JSON.
     """
-    print("\n>>> TOOL: Running 'free -h' command...")
+    print("\n>>> TOOL: Reading memory usage...")
     try:
-        result = subprocess.run(['free', '-h'], capture_output=True, text=True, check=True)
-        return result.stdout
+        memory = system_metrics.memory_usage()
+        return _metric_view(memory, system_metrics.format_memory(memory), output_format)
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
 @tool
-def get_cpu_usage():
+def get_cpu_usage(output_format: str = "text"):
     """
-    Returns the current CPU usage of the system by running 'top -bn1'.
+    Returns the current CPU usage (user/system/idle/iowait percentages), load averages and task counts.
     Use this for questions about CPU load, idle percentage, or process activity.
     This is the PREFERRED tool for checking CPU usage.
-    It does not take any arguments.
+    Leave the input empty for a readable table, or give 'json' for the same figures as JSON.
     """
-    print("\n>>> TOOL: Running 'top -bn1' command...")
+    print("\n>>> TOOL: Reading CPU usage...")
     try:
-        result = subprocess.run(['top', '-bn1'], capture_output=True, text=True, check=True)
-        # Return only the relevant header and CPU line for brevity
-        return "\n".join(result.stdout.splitlines()[:3])
+        cpu = system_metrics.cpu_usage()
+        return _metric_view(cpu, system_metrics.format_cpu(cpu), output_format)
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
@@ -104,19 +113,20 @@ def run_shell_command(command: str) -> str:
 @tool
 def get_directory_size(path: str) -> str:
     """
-    Returns the total disk usage size of a specific directory by running 'du -sh'.
-    Use this to find out how much space a single folder is taking up.
+    Returns the total disk usage size of a specific directory (like 'du -sh') and its largest items.
+    Use this to find out how much space a single folder is taking up, or what is taking up the space.
     This is the PREFERRED tool for checking a directory's size.
     Input should be the directory path (e.g., '~/Desktop' or '/home/user/Documents').
     """
-    print(f"\n>>> TOOL: Running 'du -sh {path}' command...")
+    print(f"\n>>> TOOL: Measuring size of '{path}'...")
     try:
         import os
         expanded_path = os.path.expanduser(path)
-        result = subprocess.run(['du', '-sh', expanded_path], capture_output=True, text=True, check=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error: Could not get size of directory '{path}'. {e.stderr}"
+        index = get_dir_size_index()
+        result = index.measure(expanded_path)
+        return format_size_report(result, index.largest_children(expanded_path))
+    except (FileNotFoundError, NotADirectoryError) as e:
+        return f"Error: Could not get size of directory '{path}'. {e}"
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
@@ -135,36 +145,35 @@ def list_directory(path: str) -> str:
         result = subprocess.run(['ls', '-lh', expanded_path], capture_output=True, text=True, check=True)
         return result.stdout
     except subprocess.CalledProcessError as e:
-        return f"Error: Could not list directory '{path}'. {e.stderr}"
+        return f"Error: Could not list directory '{path}'. {e.stderr.strip()}{suggestion_hint(path)}"
     except Exception as e:
         return f"An unexpected error occurred: {e}"
 
 @tool
-def read_file(path: str) -> str:
+def read_file(path: str, offset: int = None, length: int = None, lines: str = None,
+              search: str = None, context: int = 0) -> str:
     """
-    Reads and returns the first 4000 characters of a text file's content.
-    Use this to understand what a specific file is about after finding it with 'list_directory'.
-    Input should be the full path to the file (e.g., '~/Documents/notes.txt').
+    Reads a text file: the first 4000 characters by default, or a chosen part of it.
+    Use this to understand what a specific file is about after finding it with 'list_directory',
+    and to page through or search large files such as logs instead of using shell commands.
+    Input is the path to the file (e.g., '~/Documents/notes.txt'), optionally followed by options:
+    '~/app.log | lines=120-180' (a line range), '~/app.log | lines=-50' (the last 50 lines),
+    '~/app.log | offset=40000' (a byte offset), '~/app.log | search=ERROR|timed out' (a regex,
+    with '| context=2' for surrounding lines and '| lines=...' to limit it to a range).
     """
     print(f"\n>>> TOOL: Reading file: '{path}'")
     try:
         # Normalize and expand path
         full_path = normalize_path(path)
-
-        # Basic check to avoid reading binary files
-        import mimetypes
-        mime_type, _ = mimetypes.guess_type(full_path)
-        if mime_type and not mime_type.startswith('text/'):
-            return f"Error: Cannot read file '{path}'. It appears to be a binary file ({mime_type})."
-
-        with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read(4000) # Read only the first 4000 characters
-
-        return content if content else "File is empty."
+        return read_window(full_path, offset, length, lines, search, context)
     except FileNotFoundError:
-        return f"Error: File not found at '{path}'."
+        return f"Error: File not found at '{path}'.{suggestion_hint(path)}"
     except IsADirectoryError:
         return f"Error: Path '{path}' is a directory, not a file. Use 'list_directory' instead."
+    except re.error as e:
+        return f"Error: Invalid search pattern '{search}': {e}"
+    except ValueError as e:
+        return f"Error: Cannot read file '{path}'. {e}"
     except Exception as e:
         return f"An unexpected error occurred while reading file '{path}': {e}"
 
@@ -187,25 +196,40 @@ def query_system_knowledge(query: str) -> str:
     QUESTION: {question}
     ANSWER:
     """
+    suggestions = []
     try:
         # If the query is about finding a path, use a more specific prompt.
         if any(kw in query.lower() for kw in ["path to", "find folder", "directory of", "where is"]):
+            # Answer directly from the path index when exactly one path has this name (or ends
+            # with this partial path); names that only contain it are passed on as suggestions.
+            index = get_path_index()
+            name = extract_path_query(query) if index is not None else ""
+            if name:
+                match = index.resolve(name)
+                if match:
+                    print(f">>> TOOL: Resolved '{name}' from the path index.")
+                    return f"The full path is: {match}"
+                suggestions = index.lookup(name, limit=5)
             prompt_template = """
             Based ONLY on the following file system structure, find the full, correct path for the user's query.
             CONTEXT: {context}
             QUESTION: {question}
             ANSWER:"""
 
-        chain = _rag_utils_instance.create_rag_chain("ark_system_knowledge", prompt_template)
-        return chain.invoke({"question": query})
+        chain = get_rag_utils().get_rag_chain("ark_system_knowledge", prompt_template)
+        stats = {}
+        answer = chain.invoke({"question": query, "stats": stats})
+        print(f">>> TOOL: Retrieval {retrieval_report(stats)}")
+        if suggestions:
+            answer += f"\nIndexed paths with similar names: {', '.join(suggestions)}"
+        return answer
     except ValueError as e:
         # Provide a specific, actionable error message if the collection doesn't exist.
         if "does not exist" in str(e):
             # Return a structured, actionable error that the agent can parse and act on.
             return ("ACTION_REQUIRED: Collection 'ark_system_knowledge' not found. "
-                    "Run the following commands sequentially: "
-                    "1. `./src/scripts/gather_system_info.sh` then "
-                    "2. `python3 src/ingest.py --path data/system_info --collection ark_system_knowledge`")
+                    "Run the following command (it collects the system information and ingests it): "
+                    "`./src/scripts/gather_system_info.sh`")
         return f"Error querying system knowledge: {str(e)}"
 
 @tool
@@ -226,8 +250,11 @@ def query_project_knowledge(query: str) -> str:
     ANSWER:
     """
     try:
-        chain = _rag_utils_instance.create_rag_chain("ark_project_knowledge", prompt_template)
-        return chain.invoke({"question": query})
+        chain = get_rag_utils().get_rag_chain("ark_project_knowledge", prompt_template)
+        stats = {}
+        answer = chain.invoke({"question": query, "stats": stats})
+        print(f">>> TOOL: Retrieval {retrieval_report(stats)}")
+        return answer
     except ValueError as e:
         # Provide a specific, actionable error message if the collection doesn't exist.
         if "does not exist" in str(e):
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from collections import deque
+
+# --- CONFIGURATION ---
+# ARK_TRACE=1 records spans in memory; ARK_TRACE_FILE=<path> also appends every finished span
+# to a JSON lines file; ARK_METRICS_FILE=<path> writes a Prometheus text snapshot at exit.
+TRACE_ENV = "ARK_TRACE"
+TRACE_FILE_ENV = "ARK_TRACE_FILE"
+METRICS_FILE_ENV = "ARK_METRICS_FILE"
+RECENT_SPANS = 10000 # Finished spans kept in memory for export
+# Histogram bucket bounds in seconds, from fast lookups to long generations and du-style tools.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Span:
+    """
+    One timed operation. Use as a context manager, or call end() explicitly.
+    Attributes (e.g. a file path, a chunk count or the time to first token) are set with set().
+    """
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_id", "start", "_start_perf", "duration")
+
+    def __init__(self, tracer, name: str, attributes: dict, trace_id: str, span_id: str, parent_id):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+        return self
+
+    def elapsed(self) -> float:
+        """Seconds since the span started."""
+        return time.perf_counter() - self._start_perf
+
+    def end(self, error: BaseException = None):
+        if self.duration is not None:
+            return
+        self.duration = self.elapsed()
+        if error is not None:
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.tracer._finish(self)
+
+    def __enter__(self):
+        self.tracer._push(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._pop(self)
+        self.end(exc)
+        return False
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled, so instrumented code costs one call."""
+    __slots__ = ()
+
+    def set(self, key, value):
+        return self
+
+    def elapsed(self) -> float:
+        return 0.0
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Records spans, keeps per-name latency histograms and exports both.
+
+    Spans started inside another span on the same thread become its children; wrap() carries
+    the current span into worker threads (e.g. the agent's concurrent tools).
+    """
+    def __init__(self):
+        self.enabled = False
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self._histograms = {} # name -> [bucket counts..., +Inf count, sum]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+        self._ids = 0
+
+    def configure(self, enabled: bool = True, jsonl_path: str = None):
+        with self._lock:
+            self.enabled = enabled
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if jsonl_path:
+                self._file = open(jsonl_path, "a", encoding="utf-8", buffering=1)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span: Span):
+        self._stack().append(span)
+
+    def _pop(self, span: Span):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    def _next_id(self) -> str:
+        with self._lock:
+            self._ids += 1
+            return f"{os.getpid():x}-{self._ids:x}"
+
+    def span(self, name: str, **attributes):
+        """Start a span (a no-op while tracing is disabled)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span_id = self._next_id()
+        return Span(self, name, attributes, parent.trace_id if parent else span_id, span_id,
+                    parent.span_id if parent else None)
+
+    def wrap(self, func):
+        """Return func bound to the current span, so spans it starts in another thread become children."""
+        if not self.enabled:
+            return func
+        parent_stack = list(self._stack())
+
+        def wrapped(*args, **kwargs):
+            stack = self._stack()
+            saved = list(stack)
+            stack[:] = parent_stack
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack[:] = saved
+        return wrapped
+
+    @staticmethod
+    def _to_json(span: Span) -> str:
+        return json.dumps({
+            "name": span.name, "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+            "start": span.start, "duration_ms": round(span.duration * 1000, 3), "attributes": span.attributes,
+        }, default=str)
+
+    def _finish(self, span: Span):
+        record = self._to_json(span) if self._file is not None else None
+        with self._lock:
+            self.recent.append(span)
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [0] * (len(BUCKETS) + 2)
+            histogram[bisect.bisect_left(BUCKETS, span.duration)] += 1
+            histogram[-1] += span.duration
+            if record is not None:
+                self._file.write(record + "\n")
+
+    def export_jsonl(self, path: str):
+        """Write the recently finished spans to a JSON lines file."""
+        with self._lock:
+            spans = list(self.recent)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(self._to_json(span) + "\n")
+
+    def prometheus_snapshot(self) -> str:
+        """Span latency histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP ark_span_duration_seconds Duration of traced ARK operations.",
+            "# TYPE ark_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {name: list(values) for name, values in self._histograms.items()}
+        for name in sorted(histograms):
+            values = histograms[name]
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values):
+                cumulative += count
+                lines.append(f'ark_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            cumulative += values[len(BUCKETS)]
+            lines.append(f'ark_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {cumulative}')
+            lines.append(f'ark_span_duration_seconds_sum{{span="{name}"}} {values[-1]:.6f}')
+            lines.append(f'ark_span_duration_seconds_count{{span="{name}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """{span name: (count, mean seconds)} of everything recorded so far."""
+        with self._lock:
+            return {name: (sum(values[:-1]), values[-1] / max(sum(values[:-1]), 1))
+                    for name, values in self._histograms.items()}
+
+tracer = Tracer()
+
+def span(name: str, **attributes):
+    """Start a span on the process-wide tracer; use as 'with span("rag.query", collection=name):'."""
+    return tracer.span(name, **attributes) if tracer.enabled else NOOP_SPAN
+
+def llm_callbacks() -> list:
+    """
+    LangChain callbacks that trace LLM calls as 'llm.generate' spans with the time to first token,
+    or an empty list while tracing is disabled. Pass them as OllamaLLM(callbacks=...).
+    """
+    if not tracer.enabled:
+        return []
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self.spans = {}
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self.spans[run_id] = tracer.span("llm.generate", prompt_chars=sum(len(p) for p in prompts))
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            span = self.spans.get(run_id)
+            if span is not None and "ttft_ms" not in span.attributes:
+                span.set("ttft_ms", round(span.elapsed() * 1000, 3))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            span = self.spans.pop(run_id, None)
+            if span is not None:
+                span.end()
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            span = self.spans.pop(run_id, None)
+            if span is not None:
+                span.end(error)
+
+    return [TracingCallbackHandler()]
+
+def configure_from_env():
+    """Enable tracing according to ARK_TRACE / ARK_TRACE_FILE / ARK_METRICS_FILE."""
+    jsonl_path = os.environ.get(TRACE_FILE_ENV)
+    metrics_path = os.environ.get(METRICS_FILE_ENV)
+    if os.environ.get(TRACE_ENV, "") not in ("", "0") or jsonl_path or metrics_path:
+        tracer.configure(True, jsonl_path)
+    if metrics_path:
+        def write_metrics():
+            with open(metrics_path, "w", encoding="utf-8") as f:
+                f.write(tracer.prometheus_snapshot())
+        atexit.register(write_metrics)
+
+configure_from_env()
@@ -0,0 +1,173 @@
+import os
+import random
+
+import pytest
+
+from shards import ShardCatalog, ShardLayout, ShardedCollection, _shard_name, is_valid_collection_name, open_collection
+
+class FakeCollection:
+    """Brute-force stand-in for a Chroma collection with squared-L2 distances."""
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for row in zip(ids, embeddings, documents, metadatas):
+            self.rows[row[0]] = row[1:]
+
+    def delete(self, ids):
+        for id in ids:
+            self.rows.pop(id, None)
+
+    def count(self):
+        return len(self.rows)
+
+    def query(self, query_embeddings, n_results, include):
+        result = {"ids": []}
+        result.update({field: [] for field in include})
+        for query in query_embeddings:
+            scored = sorted((sum((a - b) ** 2 for a, b in zip(query, row[0])), id) for id, row in self.rows.items())
+            scored = scored[:n_results]
+            result["ids"].append([id for _, id in scored])
+            for field in include:
+                if field == "distances":
+                    result[field].append([distance for distance, _ in scored])
+                else:
+                    index = {"embeddings": 0, "documents": 1, "metadatas": 2}[field]
+                    result[field].append([self.rows[id][index] for _, id in scored])
+        return result
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None):
+        assert is_valid_collection_name(name)
+        return self.collections.setdefault(name, FakeCollection())
+
+    def get_collection(self, name):
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.collections[name]
+
+ROOT = os.path.join(os.sep, "repo")
+
+def path(*parts):
+    return os.path.join(ROOT, *parts)
+
+def populate(layout, sources, per_source=5, seed=0):
+    rng = random.Random(seed)
+    flat = FakeCollection()
+    sharded = ShardedCollection(FakeClient(), layout, create=True)
+    ids, embeddings, documents, metadatas = [], [], [], []
+    for source in sources:
+        for i in range(per_source):
+            ids.append(f"{source}:{i}")
+            embeddings.append([rng.random() for _ in range(4)])
+            documents.append(f"chunk {i} of {source}")
+            metadatas.append({"source": source})
+    flat.upsert(ids, embeddings, documents, metadatas)
+    sharded.upsert(ids, embeddings, documents, metadatas)
+    return flat, sharded
+
+SOURCES = [path("src", "a.py"), path("src", "lib", "b.py"), path("docs", "c.md"), path("README.md"),
+           os.path.join(os.sep, "elsewhere", "d.txt")]
+
+@pytest.mark.parametrize("strategy", ["directory", "hash"])
+def test_query_merges_shards_like_one_collection(strategy):
+    layout = ShardLayout("ark", strategy, count=4, root=ROOT)
+    flat, sharded = populate(layout, SOURCES)
+    assert sharded.count() == flat.count() == 25
+    assert len(sharded.collections()) > 1
+
+    queries = [[0.1, 0.2, 0.3, 0.4], [0.9, 0.9, 0.0, 0.5]]
+    for n_results in (1, 7, 100):
+        expected = flat.query(queries, n_results=n_results, include=["documents", "metadatas", "distances"])
+        assert sharded.query(queries, n_results=n_results) == expected
+
+def test_query_adds_distances_to_include():
+    layout = ShardLayout("ark", "hash", count=3)
+    flat, sharded = populate(layout, SOURCES)
+    result = sharded.query([[0.5] * 4], n_results=3, include=["documents"])
+    assert result["documents"] == flat.query([[0.5] * 4], n_results=3, include=["documents"])["documents"]
+    assert "distances" in result
+
+def test_chunks_of_a_file_share_a_shard():
+    layout = ShardLayout("ark", "directory", root=ROOT)
+    _, sharded = populate(layout, SOURCES)
+    for source in SOURCES:
+        shard = sharded.for_source(source)
+        assert {metadata["source"] for _, _, metadata in shard.rows.values()} >= {source}
+        assert sum(1 for _, _, metadata in shard.rows.values() if metadata["source"] == source) == 5
+    assert sorted(layout.shards) == ["ark__d-docs", "ark__d-src", "ark__files"]
+
+def test_missing_shards_are_empty_when_reading():
+    layout = ShardLayout("ark", "hash", count=4)
+    sharded = ShardedCollection(FakeClient(), layout)
+    assert sharded.count() == 0
+    assert sharded.query([[0.0] * 4], n_results=5) == {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+@pytest.mark.parametrize("kind, target, expected", [
+    ("file", path("src", "a.py"), ["ark__d-src"]),
+    ("file", path("README.md"), ["ark__files"]),
+    ("file", os.path.join(os.sep, "elsewhere", "d.txt"), ["ark__files"]),
+    ("directory", path("src"), ["ark__d-src"]),
+    ("directory", path("src", "lib"), ["ark__d-src"]),
+    ("directory", path("build"), []),
+    ("file or directory", path("docs"), ["ark__d-docs", "ark__files"]),
+    ("file or directory", path("docs", "c.md"), ["ark__d-docs"]),
+    ("directory", ROOT, ["ark__d-src", "ark__d-docs", "ark__files"]),
+    ("directory", os.sep, ["ark__d-src", "ark__d-docs", "ark__files"]),
+    ("glob", path("src", "*.py"), ["ark__d-src"]),
+    ("glob", path("s*"), ["ark__d-src", "ark__d-docs", "ark__files"]),
+    ("glob", path("*.md"), ["ark__d-src", "ark__d-docs", "ark__files"]),
+    ("glob", os.path.join(os.sep, "elsewhere", "*.txt"), ["ark__files"]),
+])
+def test_directory_shards_for_target(kind, target, expected):
+    layout = ShardLayout("ark", "directory", root=ROOT)
+    for source in SOURCES:
+        layout.shard_for(source)
+    assert layout.shards_for_target(kind, target) == expected
+
+def test_hash_shards_for_target():
+    layout = ShardLayout("ark", "hash", count=4)
+    source = path("src", "a.py")
+    assert layout.shards_for_target("file", source) == [layout.shard_for(source)]
+    for kind, target in [("directory", path("src")), ("file or directory", path("src")), ("glob", path("*.py"))]:
+        assert layout.shards_for_target(kind, target) == layout.shards
+
+@pytest.mark.parametrize("key", ["d-src", "d-my dir", "d-..hidden", "d-a..b", "d-" + "x" * 80, "d-ünïcode", "files"])
+def test_shard_names_are_valid(key):
+    name = _shard_name("ark_project_knowledge", key)
+    assert is_valid_collection_name(name)
+    assert name.startswith("ark_project_knowledge__")
+
+def test_slugged_shard_names_stay_distinct():
+    assert _shard_name("ark", "d-a b") != _shard_name("ark", "d-a_b")
+    assert _shard_name("ark", "d-" + "x" * 80) != _shard_name("ark", "d-" + "x" * 81)
+
+def test_invalid_collection_names():
+    assert not is_valid_collection_name("a..b")
+    assert not is_valid_collection_name("ab")
+    assert not is_valid_collection_name("-abc")
+    assert not is_valid_collection_name("x" * 64)
+    with pytest.raises(ValueError):
+        ShardLayout("x" * 60, "hash")
+    with pytest.raises(ValueError):
+        ShardLayout("ark", "random")
+
+def test_catalog_round_trip(tmp_path):
+    catalog_path = str(tmp_path / "db" / "shards.json")
+    catalog = ShardCatalog(catalog_path)
+    layout = ShardLayout("ark", "directory", root=ROOT)
+    layout.shard_for(path("src", "a.py"))
+    catalog.put(layout)
+    catalog.save()
+
+    loaded = ShardCatalog(catalog_path).get("ark")
+    assert loaded.to_dict() == layout.to_dict()
+    assert ShardCatalog(catalog_path).get("other") is None
+
+    client = FakeClient()
+    client.get_or_create_collection("other")
+    assert isinstance(open_collection(client, "ark", catalog_path), ShardedCollection)
+    assert open_collection(client, "other", catalog_path) is client.collections["other"]
@@ -0,0 +1,193 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+import splitters
+from splitters import LanguageAwareSplitter
+
+PYTHON_SOURCE = '''import os
+
+# Helper comment
+def first(a):
+    return a + 1
+
+@decorator
+def second():
+    pass
+
+class Big:
+    """A class larger than a chunk."""
+    value = 1
+
+    def method_one(self):
+        return "%s"
+
+    def method_two(self):
+        return 2
+
+TRAILER = True
+''' % ("x" * 200)
+
+C_SOURCE = '''#include <stdio.h>
+
+/* Adds two numbers. */
+static int add(int a, int b)
+{
+    const char *s = "}";
+    return a + b;
+}
+
+struct point {
+    int x, y;
+};
+
+int main(void) { return add(1, 2); }
+'''
+
+VERILOG_SOURCE = '''// Top of file
+`timescale 1ns/1ps
+
+// A counter
+module counter(input clk, output reg [3:0] q);
+    // endmodule in a comment does not end the unit
+    always @(posedge clk) q <= q + 1;
+endmodule
+
+package pkg;
+    class item;
+    endclass
+endpackage
+'''
+
+MARKDOWN_SOURCE = '''Preamble text.
+
+# Title
+
+Intro.
+
+## Section
+
+```
+# not a heading
+```
+
+### Sub
+
+Text.
+'''
+
+RST_SOURCE = '''=====
+Title
+=====
+
+Intro.
+
+Section
+-------
+
+Body.
+
+Another
+-------
+
+More.
+'''
+
+def assert_contiguous(segments, text):
+    assert segments, "expected segments"
+    assert segments[0][0] == 0
+    assert segments[-1][1] == len(text)
+    for (_, end, _), (start, _, _) in zip(segments, segments[1:]):
+        assert end == start
+    assert all(start < end for start, end, _ in segments)
+
+@pytest.mark.parametrize("segmenter, text", [
+    (splitters.split_python, PYTHON_SOURCE),
+    (splitters.split_c, C_SOURCE),
+    (splitters.split_verilog, VERILOG_SOURCE),
+    (splitters.split_markdown, MARKDOWN_SOURCE),
+    (splitters.split_rst, RST_SOURCE),
+])
+@pytest.mark.parametrize("max_chars", [50, 10000])
+def test_segments_are_contiguous(segmenter, text, max_chars):
+    assert_contiguous(segmenter(text, max_chars), text)
+
+def test_python_units_and_large_class_methods():
+    segments = splitters.split_python(PYTHON_SOURCE, 150)
+    units = {}
+    for start, end, symbol in segments:
+        units.setdefault(symbol, PYTHON_SOURCE[start:end].strip())
+    assert units["first"].startswith("# Helper comment\ndef first(a):")
+    assert units["second"].startswith("@decorator\ndef second():")
+    assert units["Big.method_one"].startswith("def method_one(self):")
+    assert units["Big.method_two"] == "def method_two(self):\n        return 2"
+    assert units["Big"].startswith("class Big:") and "def method_one" not in units["Big"]
+    # A class that fits stays whole.
+    assert "Big" in [symbol for _, _, symbol in splitters.split_python(PYTHON_SOURCE, 10000)]
+
+def test_python_syntax_error_falls_back():
+    assert splitters.split_python("def broken(:\n", 100) is None
+
+def test_c_braces_in_strings_do_not_end_a_function():
+    segments = splitters.split_c(C_SOURCE, 10000)
+    add = next(C_SOURCE[start:end] for start, end, symbol in segments if symbol == "add")
+    assert add.rstrip().endswith("return a + b;\n}")
+    assert "/* Adds two numbers. */" in add
+
+def test_verilog_end_keyword_in_comment_is_ignored():
+    segments = splitters.split_verilog(VERILOG_SOURCE, 10000)
+    counter = next(VERILOG_SOURCE[start:end] for start, end, symbol in segments if symbol == "counter")
+    assert counter.rstrip().endswith("endmodule")
+    assert "always @(posedge clk)" in counter
+    assert [symbol for _, _, symbol in segments] == ["counter", "pkg"]
+
+def test_markdown_heading_paths_skip_fenced_code():
+    symbols = [symbol for _, _, symbol in splitters.split_markdown(MARKDOWN_SOURCE, 10000)]
+    assert symbols == [None, "Title", "Title > Section", "Title > Section > Sub"]
+
+def test_rst_levels_follow_underline_styles():
+    symbols = [symbol for _, _, symbol in splitters.split_rst(RST_SOURCE, 10000)]
+    assert symbols == ["Title", "Title > Section", "Title > Another"]
+
+def test_no_units_falls_back():
+    assert splitters.split_markdown("no headings here\n", 100) is None
+    assert splitters.split_verilog("wire a;\n", 100) is None
+
+def test_chunks_point_back_into_the_source():
+    body = "\n".join(f"    total += {i}  # line {i}" for i in range(200))
+    text = f"import os\n\ndef small():\n    return 1\n\ndef huge():\n    total = 0\n{body}\n    return total\n\nEND = 1\n"
+    splitter = LanguageAwareSplitter(chunk_size=300)
+    chunks = splitter.split_documents([Document(page_content=text, metadata={"source": "/repo/mod.py"})])
+
+    huge = [chunk for chunk in chunks if chunk.metadata.get("symbols") == "huge"]
+    assert len(huge) > 1, "the oversize function should be cut into several chunks"
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content
+        assert chunk.metadata["source"] == "/repo/mod.py"
+    # Every character of the huge function is in one of its pieces.
+    covered = set()
+    for chunk in huge:
+        covered.update(range(chunk.metadata["start_index"], chunk.metadata["start_index"] + len(chunk.page_content)))
+    function_start, function_end = text.index("def huge"), text.index("\nEND")
+    assert set(range(function_start, function_end)) - covered <= {i for i in range(function_start, function_end) if text[i].isspace()}
+
+def test_small_units_are_packed_without_overlap():
+    text = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(20))
+    splitter = LanguageAwareSplitter(chunk_size=120)
+    chunks = splitter.split_documents([Document(page_content=text, metadata={"source": "a.py"})])
+    assert "".join(chunk.page_content for chunk in chunks) == text
+    assert all(len(chunk.page_content) <= splitter.max_unit_chars for chunk in chunks)
+    assert chunks[0].metadata["symbols"].startswith("f0, f1")
+
+def test_unknown_type_uses_character_splitter():
+    text = "word " * 500
+    chunks = LanguageAwareSplitter(chunk_size=400, chunk_overlap=50).split_documents([Document(page_content=text, metadata={"source": "notes.txt"})])
+    assert len(chunks) > 1
+    assert all("symbols" not in chunk.metadata for chunk in chunks)
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content